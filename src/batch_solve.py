@@ -0,0 +1,108 @@
+# headless entry point: solves stored sketches on a process pool, no Tk involved
+#
+#   python src/batch_solve.py sketches/ --output results.jsonl --solver SLSQP --solved-dir solved/
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+import time
+from constraints.constraints import Constraints
+from geometry import Geometry
+from sketch.sketch_file import SKETCH_BINARY_EXTENSION, load_sketch, save_sketch
+from solver.solver import SOLVER_TYPE, Solver
+
+SKETCH_FILE_EXTENSIONS = ('.json', SKETCH_BINARY_EXTENSION)
+
+def find_sketches(paths):
+    sketches = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                sketches += [os.path.join(root, file) for file in sorted(files) if file.endswith(SKETCH_FILE_EXTENSIONS)]
+        else:
+            sketches.append(path)
+
+    return sketches
+
+def solve_sketch(path, solver_type, solved_dir, reject_over_constrained):
+    result = {'sketch': path}
+
+    start = time.perf_counter()
+
+    try:
+        geometry, constraints = Geometry(array_backed = True), Constraints()
+        load_sketch(path, geometry, constraints)
+
+        solver = Solver(geometry, lambda: None, constraints)
+        solver.set_solver_type(solver_type)
+
+        # structural check is cheap compared to the solve
+        analysis = solver.analyze()
+        result.update({
+            'degrees_of_freedom': analysis.degrees_of_freedom,
+            'redundant_equations': analysis.redundant_equations,
+        })
+
+        if reject_over_constrained and analysis.redundant_equations > 0:
+            result.update({'success': False, 'error': f'over-constrained: {len(analysis.over_constrained_constraints)} constraints in the over-determined part'})
+            result['wall_time'] = time.perf_counter() - start
+            return result
+
+        solver.solve(None)
+
+        result.update({
+            'success': solver.success,
+            'iterations': solver.iterations,
+            'residual_norm': solver.residual_norm,
+        })
+
+        if not solved_dir is None:
+            save_sketch(os.path.join(solved_dir, os.path.basename(path)), geometry, constraints)
+    except Exception as e:
+        result.update({'success': False, 'error': str(e)})
+
+    result['wall_time'] = time.perf_counter() - start
+
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Solve stored sketches without the GUI.')
+    parser.add_argument('paths', nargs = '+', help = 'sketch files or directories with them')
+    parser.add_argument('--output', default = '-', help = 'file for the results, one JSON object per line (default: stdout)')
+    parser.add_argument('--solver', default = SOLVER_TYPE.IPOPT.name, choices = [solver_type.name for solver_type in SOLVER_TYPE])
+    parser.add_argument('--workers', type = int, default = os.cpu_count(), help = 'number of processes (default: all cores)')
+    parser.add_argument('--solved-dir', help = 'directory to save the solved sketches to')
+    parser.add_argument('--reject-over-constrained', action = 'store_true', help = 'do not solve sketches with structurally redundant constraints')
+    arguments = parser.parse_args()
+
+    sketches = find_sketches(arguments.paths)
+    solver_type = SOLVER_TYPE[arguments.solver]
+
+    if not arguments.solved_dir is None:
+        os.makedirs(arguments.solved_dir, exist_ok = True)
+
+    output = sys.stdout if arguments.output == '-' else open(arguments.output, 'w')
+
+    failed = 0
+
+    # results are written as soon as every sketch is done, not in the order of the input
+    with ProcessPoolExecutor(max_workers = arguments.workers) as executor:
+        futures = [executor.submit(solve_sketch, path, solver_type, arguments.solved_dir, arguments.reject_over_constrained) for path in sketches]
+        for future in as_completed(futures):
+            result = future.result()
+            failed += not result['success']
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+
+    if output is not sys.stdout:
+        output.close()
+
+    print (f'{len(sketches)} sketches, {failed} failed', file = sys.stderr)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# headless scaling benchmark of Solver.solve on the parametric generators of examples/examples.py
+#
+#   python src/benchmark.py --sizes 10 40 160 --output report.json
+#   python src/benchmark.py --sizes 10 40 160 --baseline old_report.json
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import numpy as np
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from examples.examples import generators
+from geometry import Geometry
+from solver.solver import SOLVER_TYPE, Solver
+
+REPORT_VERSION = 1
+
+DEFAULT_SIZES = [10, 20, 40, 80]
+DRAG_FRAMES = 30
+DRAG_RADIUS = 20
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+def timings(values):
+    return {
+        'mean': float(np.mean(values)) if values else 0.0,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values, default = 0.0),
+    }
+
+def drag_point(geometry, solver):
+    # the last free point of the sketch: the far end of a chain, the last rectangle, etc.
+    for entity in reversed(geometry.segments + geometry.arcs):
+        for point in reversed(entity.points()):
+            if not solver.is_fixed_entity(point):
+                return point
+    return None
+
+def run_case(generator, num, solver_type):
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    generator(geometry, constraints, num)
+
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(solver_type)
+
+    start = time.perf_counter()
+    solver.solve(None)
+    first_solve = time.perf_counter() - start
+
+    result = {
+        'generator': generator.__name__,
+        'num': num,
+        'solver': solver_type.name,
+        'entities': len(geometry.segments) + len(geometry.arcs),
+        'constraints': len(constraints),
+        'variables': solver.number_of_variables,
+        'first_solve': first_solve,
+        'first_solve_iterations': solver.iterations,
+        'first_solve_success': solver.success,
+        'first_solve_residual_norm': solver.residual_norm,
+    }
+
+    # nothing changed: measures the bookkeeping around the solve
+    start = time.perf_counter()
+    solver.solve(None)
+    result['resolve'] = time.perf_counter() - start
+
+    # scripted drag: the point goes around a circle
+    point = drag_point(geometry, solver)
+    frames, iterations, failures = [], [], 0
+
+    if not point is None:
+        x, y = point.x, point.y
+        for i in range(1, DRAG_FRAMES + 1):
+            angle = 2 * math.pi * i / DRAG_FRAMES
+            point.x, point.y = x + DRAG_RADIUS * math.sin(angle), y + DRAG_RADIUS * (1 - math.cos(angle))
+            start = time.perf_counter()
+            solver.solve(point)
+            frames.append(time.perf_counter() - start)
+            iterations.append(solver.iterations)
+            failures += not solver.success
+
+    result['drag'] = dict(timings(frames), frames = len(frames), iterations = float(np.mean(iterations)) if iterations else 0.0, failures = failures)
+    result['final_residual_norm'] = solver.residual_norm
+
+    # a new constraint checked the way the editor checks it before solving: LENGTH of the last segment as it is
+    segment = geometry.segments[-1]
+    added = constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, segment.length()])
+    solver.constraints_added(added)
+
+    start = time.perf_counter()
+    solver.find_dependent_constraints(added)
+    result['dependency_check'] = time.perf_counter() - start
+
+    for constraint in added:
+        constraints.remove(constraint)
+        solver.constraint_removed(constraint)
+
+    return result
+
+def environment():
+    versions = {}
+    for module in ('numpy', 'scipy', 'casadi'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return dict(versions, python = platform.python_version(), machine = platform.machine(), system = platform.system())
+
+def compare(results, baseline, tolerance):
+    # cases that became slower than baseline * (1 + tolerance) in the first solve, the mean drag frame or the
+    # dependency check
+    key = lambda result: (result['generator'], result['num'], result['solver'])
+    baseline = {key(result): result for result in baseline['results']}
+    regressions = []
+
+    for result in results:
+        old = baseline.get(key(result))
+        if old is None:
+            continue
+        for name, new_time, old_time in (('first_solve', result['first_solve'], old['first_solve']), ('drag', result['drag']['mean'], old['drag']['mean']),
+                                         ('dependency_check', result['dependency_check'], old.get('dependency_check', 0.0))):
+            if old_time > 0 and new_time > old_time * (1 + tolerance):
+                regressions.append(f'{"/".join(map(str, key(result)))} {name}: {old_time * 1000:.2f}ms -> {new_time * 1000:.2f}ms')
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Time Solver.solve on generated sketches of increasing size.')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = DEFAULT_SIZES)
+    parser.add_argument('--generators', nargs = '+', choices = [generator.__name__ for generator in generators], default = [generator.__name__ for generator in generators])
+    parser.add_argument('--solvers', nargs = '+', choices = [solver_type.name for solver_type in SOLVER_TYPE], default = [solver_type.name for solver_type in SOLVER_TYPE])
+    parser.add_argument('--output', help = 'JSON report file')
+    parser.add_argument('--baseline', help = 'JSON report of a previous run to compare with')
+    parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed relative slowdown against the baseline')
+    arguments = parser.parse_args()
+
+    results = []
+
+    for generator in generators:
+        if not generator.__name__ in arguments.generators:
+            continue
+        for solver_name in arguments.solvers:
+            for num in arguments.sizes:
+                result = run_case(generator, num, SOLVER_TYPE[solver_name])
+                results.append(result)
+                print (f'{result["generator"]:15} {result["solver"]:6} n={num:<5} vars={result["variables"]:<6} '
+                    f'first {result["first_solve"] * 1000:9.1f}ms  drag mean {result["drag"]["mean"] * 1000:7.2f}ms '
+                    f'p95 {result["drag"]["p95"] * 1000:7.2f}ms  its {result["drag"]["iterations"]:.1f}  residual {result["final_residual_norm"]:.1e}  '
+                    f'dependencies {result["dependency_check"] * 1000:7.2f}ms', file = sys.stderr)
+
+    report = {'version': REPORT_VERSION, 'environment': environment(), 'drag_frames': DRAG_FRAMES, 'results': results}
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent = 1)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file), arguments.tolerance)
+        for regression in regressions:
+            print (f'regression: {regression}', file = sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,6 @@
 class Constraint:
     def __init__(self, entities, type):
         self.entities = entities
-        self.type = type
\ No newline at end of file
+        self.type = type
+    def __repr__(self):
+        return f'{self.type.name}({", ".join(entity.__class__.__name__ if hasattr(entity, "points") else str(entity) for entity in self.entities)})'
@@ -48,5 +48,11 @@ def tangency(entity1, entity2):
     else:
         assert False
 
+def tangency_at_end(arc: Arc, end, other_end):
+    # a segment from an end of the arc: tangent there means perpendicular to the radius. The distance to the
+    # line is at its maximum when satisfied, so the general form has a zero gradient at every solution
+    vector = Vector.from_two_points(end, other_end)
+    return [dot(vector, Vector.from_two_points(arc.center(), end)) / vector.length()]
+
 def concentricity(arc1: Arc, arc2: Arc):
     return [distance_p2p(arc1.center(), arc2.center())]
\ No newline at end of file
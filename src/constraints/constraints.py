@@ -1,4 +1,5 @@
 from collections import Counter
+import itertools
 from enum import Enum, auto
 from constraints.constraint import Constraint
 from constraints.constraint_equations import *
@@ -60,14 +61,144 @@ CONSTRAINT_FUNCTION = {
     CONSTRAINT_TYPE.LENGTH:                    length,
 }
 
+# coordinates merged by the constraints solved by substitution: 0 is x, 1 is y
+SUBSTITUTION_OFFSETS = {
+    CONSTRAINT_TYPE.COINCIDENCE:    (0, 1),
+    CONSTRAINT_TYPE.HORIZONTALITY:  (1,),
+    CONSTRAINT_TYPE.VERTICALITY:    (0,),
+}
+
 class Constraints(list):
+    # List of constraints with indices that every mutation of the list keeps up to date:
+    # entity (point, segment, arc) -> constraints on it, type -> constraints of the type and
+    # point -> segments and arcs of the constraints that own it. Constraints are kept in the
+    # order of the list, as dict keys. Changes that reorder the list (clear, insertion in the
+    # middle) drop the indices, the next query builds them again; a loaded sketch pays for
+    # its indices when they are first needed, not in the load.
     def __init__(self, *args):
-        list.__init__(self, *args)
+        list.__init__(self)
 
         self.inactive_constraints = 0
         self.solved_by_substitution_constraints = 0
         self.fixed_constraints = 0
 
+        self.indexed = True
+        self.entity_to_constraints = {}
+        self.type_to_constraints = {}
+        # point -> {segment or arc: number of constraints on it}
+        self.point_to_entities = {}
+
+        self.extend(*args)
+
+    # indices
+
+    def add_to_indices(self, constraint):
+        if not self.indexed:
+            return
+
+        self.type_to_constraints.setdefault(constraint.type, {})[constraint] = None
+
+        for entity in constraint.entities:
+            if not isinstance(entity, (Point, Segment, Arc)):
+                continue
+            self.entity_to_constraints.setdefault(entity, {})[constraint] = None
+            if not isinstance(entity, Point):
+                for point in entity.points():
+                    entities = self.point_to_entities.setdefault(point, {})
+                    entities[entity] = entities.get(entity, 0) + 1
+
+    def remove_from_indices(self, constraint):
+        if not self.indexed:
+            return
+
+        self.type_to_constraints[constraint.type].pop(constraint, None)
+
+        for entity in constraint.entities:
+            if not isinstance(entity, (Point, Segment, Arc)):
+                continue
+            constraints = self.entity_to_constraints[entity]
+            constraints.pop(constraint, None)
+            if not constraints:
+                del self.entity_to_constraints[entity]
+            if not isinstance(entity, Point):
+                for point in entity.points():
+                    entities = self.point_to_entities[point]
+                    entities[entity] -= 1
+                    if not entities[entity]:
+                        del entities[entity]
+                    if not entities:
+                        del self.point_to_entities[point]
+
+    def rebuild_indices(self):
+        self.indexed = False
+        self.entity_to_constraints, self.type_to_constraints, self.point_to_entities = {}, {}, {}
+
+    def build_indices(self):
+        self.indexed = True
+        for constraint in self:
+            self.add_to_indices(constraint)
+
+    def constraints_of(self, entity):
+        if not self.indexed:
+            self.build_indices()
+        return list(self.entity_to_constraints.get(entity, ()))
+
+    def constraints_of_type(self, type):
+        if not self.indexed:
+            self.build_indices()
+        return list(self.type_to_constraints.get(type, ()))
+
+    def entities_of(self, point):
+        if not self.indexed:
+            self.build_indices()
+        return list(self.point_to_entities.get(point, ()))
+
+    # list mutations
+
+    def append(self, constraint):
+        list.append(self, constraint)
+        self.add_to_indices(constraint)
+
+    def extend(self, constraints = ()):
+        constraints = list(constraints)
+        list.extend(self, constraints)
+        if self.indexed:
+            for constraint in constraints:
+                self.add_to_indices(constraint)
+
+    def __iadd__(self, constraints):
+        self.extend(constraints)
+        return self
+
+    def insert(self, index, constraint):
+        # the indices keep the order of the list, only an insertion at the end can update them in place
+        if index >= len(self):
+            self.append(constraint)
+            return
+        list.insert(self, index, constraint)
+        self.rebuild_indices()
+
+    def remove(self, constraint):
+        list.remove(self, constraint)
+        self.remove_from_indices(constraint)
+
+    def pop(self, index = -1):
+        constraint = list.pop(self, index)
+        self.remove_from_indices(constraint)
+        return constraint
+
+    def clear(self):
+        list.clear(self)
+        self.rebuild_indices()
+
+    def __setitem__(self, index, value):
+        list.__setitem__(self, index, value)
+        self.rebuild_indices()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.rebuild_indices()
+
     def add_constraint(self, type, entities):
         new_constraints = []
 
@@ -91,7 +222,8 @@ class Constraints(list):
     def get_useless_constraints(self, entities_to_be_removed):
         useless_constraints = set()
 
-        for constraint in self:
+        # only the constraints on the removed entities can lose their entities
+        for constraint in set(itertools.chain.from_iterable(map(self.constraints_of, entities_to_be_removed))):
             if not constraint.type in Constraints.get_available_constraints(set(constraint.entities) - set(entities_to_be_removed)):
                 useless_constraints.add(constraint)
 
@@ -107,11 +107,15 @@ def Rect(geometry, constraints):
     ]
 
 def Chain(geometry, constraints):
+    chain(geometry, constraints, 15)
+
+# parametric generators, used by the benchmark; num is the number of repeated elements
+
+def chain(geometry, constraints, num_links):
     clear_geometry_and_constraints(geometry, constraints)
 
     x, y = 300, 300
     link_length = 100
-    num_links = 15
     
     directions = [(1, 0), (0, -1), (-1, 0), (0, 1)]
     current_dir_idx = 0
@@ -155,10 +159,120 @@ def Chain(geometry, constraints):
         constraints.append(Constraint([prev_seg, next_seg], CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS))
         constraints.append(Constraint([prev_seg.p2, next_seg.p1], CONSTRAINT_TYPE.COINCIDENCE))
 
+def rectangle_grid(geometry, constraints, num_rectangles):
+    # rectangles in rows of 10, every one is attached to its left and upper neighbours
+    clear_geometry_and_constraints(geometry, constraints)
+
+    size, columns = 60, 10
+    corners = {}
+
+    for i in range(num_rectangles):
+        row, column = divmod(i, columns)
+        x, y = 100 + column * size, 100 + row * size
+        # slightly distorted, so there is something to solve
+        points = [(x, y), (x + size + 5, y + 3), (x + size, y + size + 4), (x - 2, y + size)]
+        sides = [Segment(Point(*points[k]), Point(*points[(k + 1) % 4])) for k in range(4)]
+        geometry.segments += sides
+
+        for k in range(4):
+            constraints.append(Constraint([sides[k].p2, sides[(k + 1) % 4].p1], CONSTRAINT_TYPE.COINCIDENCE))
+
+        constraints += [
+            Constraint([sides[0]], CONSTRAINT_TYPE.HORIZONTALITY),
+            Constraint([sides[2]], CONSTRAINT_TYPE.HORIZONTALITY),
+            Constraint([sides[1]], CONSTRAINT_TYPE.VERTICALITY),
+            Constraint([sides[3]], CONSTRAINT_TYPE.VERTICALITY),
+            Constraint([sides[0], size], CONSTRAINT_TYPE.LENGTH),
+            Constraint([sides[0], sides[1]], CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS),
+        ]
+
+        # top left corner to the top right corner of the left neighbour, or to the bottom left one of the upper
+        if column > 0:
+            constraints.append(Constraint([sides[0].p1, corners[(row, column - 1)][0].p2], CONSTRAINT_TYPE.COINCIDENCE))
+        elif row > 0:
+            constraints.append(Constraint([sides[0].p1, corners[(row - 1, column)][3].p1], CONSTRAINT_TYPE.COINCIDENCE))
+        else:
+            constraints.append(Constraint([sides[0].p1], CONSTRAINT_TYPE.FIXED))
+
+        corners[(row, column)] = sides
+
+def tangent_slots(geometry, constraints, num_slots):
+    # Slot repeated in a row, all of them with the radius of the first one
+    clear_geometry_and_constraints(geometry, constraints)
+
+    for i in range(num_slots):
+        x = 100 + i * 150
+
+        segments = [
+            Segment(Point(x, 200), Point(x, 300)),
+            Segment(Point(x + 100, 300), Point(x + 100, 200)),
+        ]
+
+        arcs = [
+            Arc(Point(x, 200), Point(x + 100, 200), Point(x + 50, 150)),
+            Arc(Point(x + 100, 300), Point(x, 300), Point(x + 50, 350)),
+        ]
+
+        constraints += [
+            Constraint([segments[0], arcs[0]], CONSTRAINT_TYPE.TANGENCY),
+            Constraint([segments[0], arcs[1]], CONSTRAINT_TYPE.TANGENCY),
+            Constraint([segments[1], arcs[0]], CONSTRAINT_TYPE.TANGENCY),
+            Constraint([segments[1], arcs[1]], CONSTRAINT_TYPE.TANGENCY),
+
+            Constraint([segments[0].p1, arcs[0].p1], CONSTRAINT_TYPE.COINCIDENCE),
+            Constraint([segments[0].p2, arcs[1].p2], CONSTRAINT_TYPE.COINCIDENCE),
+            Constraint([segments[1].p1, arcs[1].p1], CONSTRAINT_TYPE.COINCIDENCE),
+            Constraint([segments[1].p2, arcs[0].p2], CONSTRAINT_TYPE.COINCIDENCE),
+        ]
+
+        if i > 0:
+            constraints.append(Constraint([geometry.arcs[0], arcs[0]], CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS))
+
+        geometry.segments += segments
+        geometry.arcs += arcs
+
+def mixed_profile(geometry, constraints, num_elements):
+    # open profile of segments and arcs one after another, each arc is tangent to its neighbours
+    clear_geometry_and_constraints(geometry, constraints)
+
+    x, y = 100, 300
+    previous = None
+
+    for i in range(num_elements):
+        if i % 2 == 0:
+            entity = Segment(Point(x, y), Point(x + 80, y))
+            geometry.segments.append(entity)
+            x += 80
+        else:
+            entity = Arc(Point(x, y), Point(x + 80, y), Point(x + 40, y - 30))
+            geometry.arcs.append(entity)
+            x += 80
+
+        if previous is None:
+            constraints.append(Constraint([entity.p1], CONSTRAINT_TYPE.FIXED))
+        else:
+            p1 = entity.p1 if isinstance(entity, Segment) or entity.p1.x < entity.p2.x else entity.p2
+            p2 = previous.p2 if isinstance(previous, Segment) or previous.p1.x < previous.p2.x else previous.p1
+            constraints.append(Constraint([p2, p1], CONSTRAINT_TYPE.COINCIDENCE))
+            if isinstance(entity, Arc) or isinstance(previous, Arc):
+                constraints.append(Constraint([entity, previous], CONSTRAINT_TYPE.TANGENCY))
+
+        if isinstance(entity, Segment):
+            constraints.append(Constraint([entity, 80], CONSTRAINT_TYPE.LENGTH))
+
+        previous = entity
+
 examples = [
     Lines,
     CutSlot,
     Slot,
     Rect,
     Chain,
-]
\ No newline at end of file
+]
+
+generators = [
+    chain,
+    rectangle_grid,
+    tangent_slots,
+    mixed_profile,
+]
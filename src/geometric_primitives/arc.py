@@ -1,3 +1,4 @@
+from copy import copy
 from enum import auto
 from math import atan2, degrees, pi
 
@@ -19,6 +20,12 @@ class Arc:
         self.p1 = p1
         self.p2 = p2
 
+        # d lives in buffer[index], like the coordinates of a point
+        self.buffer = [0.0]
+        self.index = 0
+
+        self.cache_key, self.cache = None, {}
+
         p1_p = Vector.from_two_points(p1, p)
         p_p2 = Vector.from_two_points(p, p2)
         p1_p2 = Vector.from_two_points(p1, p2)
@@ -45,10 +52,60 @@ class Arc:
 
         self.d = dot(Vector.from_two_points(p1_p2_segment_center, center), self.get_n())
 
+    @classmethod
+    def from_d(cls, p1: Point, p2: Point, d):
+        # arc given by its ends and the signed distance from the middle of p1-p2 to the center
+        arc = cls.__new__(cls)
+        arc.p1, arc.p2 = p1, p2
+        arc.buffer, arc.index = [d], 0
+        arc.cache_key, arc.cache = None, {}
+        return arc
+
+    @classmethod
+    def from_buffer(cls, p1: Point, p2: Point, buffer, index):
+        # arc whose d is already in buffer[index]
+        arc = cls.from_d(p1, p2, None)
+        arc.buffer, arc.index = buffer, index
+        return arc
+
+    @property
+    def d(self):
+        return self.buffer[self.index]
+
+    @d.setter
+    def d(self, value):
+        self.buffer[self.index] = value
+
+    def detached(self):
+        # copy that owns its d, so it can be moved without touching the original; it is evaluated with
+        # symbolic values too, so it does not cache
+        arc = copy(self)
+        arc.buffer, arc.index = [self.d], 0
+        arc.cache_key, arc.cache = None, None
+        return arc
+
+    def cached(self, name, compute):
+        # derived values are kept until p1, p2 or d change; the key is made of the values themselves, since the
+        # solver writes them straight into the coordinate store, past the setters
+        if self.cache is None:
+            return compute()
+
+        key = (self.p1.x, self.p1.y, self.p2.x, self.p2.y, self.d)
+        if key != self.cache_key:
+            self.cache_key, self.cache = key, {}
+
+        if not name in self.cache:
+            self.cache[name] = compute()
+
+        return self.cache[name]
+
     def get_n(self):
         return Vector.from_two_points(self.p1, self.p2).rotated90ccw().normalized()
 
     def center(self):
+        return self.cached('center', self.compute_center)
+
+    def compute_center(self):
         p1_p2 = Vector.from_two_points(self.p1, self.p2)
         p1_p2_segment_center = self.p1 + p1_p2 / 2
 
@@ -58,25 +115,50 @@ class Arc:
         return [self.p1, self.p2]
 
     def radius(self):
-        return Vector.from_two_points(self.p1, self.center()).length()
+        return self.cached('radius', lambda: Vector.from_two_points(self.p1, self.center()).length())
 
     def bb_coords(self):
+        return self.cached('bb_coords', self.compute_bb_coords)
+
+    def compute_bb_coords(self):
         radius = self.radius()
         center = self.center()
         return center.x - radius, center.y - radius, center.x + radius, center.y + radius
 
+    def angle(self):
+        # central angle from p1 to p2, clockwise
+        return self.cached('angle', lambda: v2v_angle_cw(Vector.from_two_points(self.center(), self.p1), Vector.from_two_points(self.center(), self.p2)))
+
+    def start_and_extent(self):
+        # angles of p1 and of the arc in degrees, counterclockwise on a screen with y pointing down
+        return self.cached('start_and_extent', self.compute_start_and_extent)
+
+    def compute_start_and_extent(self):
+        center = self.center()
+
+        center_p1 = Vector.from_two_points(center, self.p1)
+        center_p2 = Vector.from_two_points(center, self.p2)
+
+        start_angle = degrees(atan2(-center_p1.y, center_p1.x))
+        end_angle = degrees(atan2(-center_p2.y, center_p2.x))
+
+        if start_angle < end_angle:
+            start_angle += 360
+
+        return start_angle, end_angle - start_angle
+
     def invert_direction(self):
         self.p1, self.p2 = self.p2, self.p1
 
     def middle_point(self):
+        return self.cached('middle_point', self.compute_middle_point)
+
+    def compute_middle_point(self):
         center = self.center()
 
         c_p1 = Vector.from_two_points(center, self.p1)
-        c_p2 = Vector.from_two_points(center, self.p2)
-
-        angle = v2v_angle_cw(c_p1, c_p2)
 
-        return center + c_p1.rotated(angle / 2)
+        return center + c_p1.rotated(self.angle() / 2)
 
 
 def distance_p2a(p: Point, arc: Arc):
@@ -86,7 +168,7 @@ def distance_p2a(p: Point, arc: Arc):
     c_p2 = Vector.from_two_points(arc_center, arc.p2)
     c_p = Vector.from_two_points(arc_center, p)
 
-    is_inside_sector = equal_eps(v2v_angle_cw(c_p1, c_p) + v2v_angle_cw(c_p, c_p2), v2v_angle_cw(c_p1, c_p2))
+    is_inside_sector = equal_eps(v2v_angle_cw(c_p1, c_p) + v2v_angle_cw(c_p, c_p2), arc.angle())
 
     if is_inside_sector:
         return abs(arc.radius() - distance_p2p(arc_center, p))
@@ -1,9 +1,34 @@
 import numpy as np
 
 class Point:
+    # coordinates live in buffer[index], buffer[index + 1]; a free point owns a small list,
+    # a point of an array-backed geometry is a handle into the shared float64 array
     def __init__(self, x, y):
-        self.x = x
-        self.y = y
+        self.buffer = [x, y]
+        self.index = 0
+
+    @classmethod
+    def from_buffer(cls, buffer, index):
+        # point whose coordinates are already in buffer[index], buffer[index + 1]
+        point = cls.__new__(cls)
+        point.buffer, point.index = buffer, index
+        return point
+
+    @property
+    def x(self):
+        return self.buffer[self.index]
+
+    @x.setter
+    def x(self, value):
+        self.buffer[self.index] = value
+
+    @property
+    def y(self):
+        return self.buffer[self.index + 1]
+
+    @y.setter
+    def y(self, value):
+        self.buffer[self.index + 1] = value
 
     def __add__(self, other):
         return Point(self.x + other.x, self.y + other.y)
@@ -1,19 +1,142 @@
+import weakref
+import numpy as np
 from geometric_primitives.arc import Arc
 from geometric_primitives.point import Point
 from geometric_primitives.segment import Segment
 
+class CoordinateStore:
+    # one contiguous float64 array for the coordinates of the points and the d of the arcs;
+    # points and arcs attached to the store read and write their values through (buffer, index)
+    def __init__(self, capacity = 256):
+        self.data = np.zeros(capacity)
+        self.size = 0
+        self.handles = {}
+        # index -> handle that owns the value, None for a free slot
+        self.owners = []
+        # slots of detached handles by their size, and the slot every detached handle had
+        self.free = {1: set(), 2: set()}
+        self.released = weakref.WeakKeyDictionary()
+
+    def __contains__(self, handle):
+        return id(handle) in self.handles
+
+    def attach(self, handle, count):
+        if handle in self:
+            return self.handles[id(handle)][1]
+
+        values = [handle.buffer[handle.index + i] for i in range(count)]
+
+        # a handle that comes back (e.g. undo of a removal) takes its old slot if it is still free, so the
+        # indices the history recorded for it stay valid
+        free = self.free[count]
+        index = self.released.pop(handle, None)
+        if index in free:
+            free.remove(index)
+        elif free:
+            index = free.pop()
+        else:
+            if self.size + count > len(self.data):
+                self.data = np.concatenate((self.data, np.zeros(max(len(self.data), count))))
+                for other, _ in self.handles.values():
+                    other.buffer = self.data
+
+            index = self.size
+            self.size += count
+            self.owners += [None] * count
+
+        self.data[index:index + count] = values
+
+        handle.buffer, handle.index = self.data, index
+        self.handles[id(handle)] = (handle, index)
+        self.owners[index:index + count] = [handle] * count
+
+        return index
+
+    def detach(self, handle, count):
+        # the handle keeps its values in a buffer of its own and its slot is reused by the next attach
+        _, index = self.handles.pop(id(handle))
+
+        handle.buffer, handle.index = [float(value) for value in self.data[index:index + count]], 0
+        self.owners[index:index + count] = [None] * count
+        self.free[count].add(index)
+        self.released[handle] = index
+
+    def adopt(self, data, points, arcs):
+        # takes over an array that already holds the values of the handles, e.g. a loaded sketch: x, y of
+        # points[i] at 2 * i, then d of every arc; the handles must be pointing into data
+        self.data = data
+        self.size = len(data)
+
+        end = 2 * len(points)
+        self.handles = dict(zip(map(id, points), zip(points, range(0, end, 2))))
+        self.handles.update(zip(map(id, arcs), zip(arcs, range(end, end + len(arcs)))))
+
+        self.owners = [None] * self.size
+        self.owners[0:end:2] = points
+        self.owners[1:end:2] = points
+        self.owners[end:end + len(arcs)] = arcs
+
+        self.free = {1: set(), 2: set()}
+        self.released = weakref.WeakKeyDictionary()
+
 class Geometry:
-    def __init__(self):
+    def __init__(self, array_backed = False):
         self.segments = []
         self.arcs = []
         # self.circles = []
 
+        self.store = CoordinateStore() if array_backed else None
+        # entities were removed since the store was last swept
+        self.removed = False
+
     def clear(self):
         self.segments = []
         self.arcs = []
+        self.removed = False
+
+        if not self.store is None:
+            self.store = CoordinateStore()
 
     def remove_entity(self, entity):
         if isinstance(entity, Segment):
             self.segments.remove(entity)
         elif isinstance(entity, Arc):
-            self.arcs.remove(entity)
\ No newline at end of file
+            self.arcs.remove(entity)
+
+        self.removed = True
+
+    def release(self):
+        # detaches the points and arcs no entity uses anymore, their slots are reused by the next attach;
+        # points can be shared, so this looks at all the entities
+        if self.store is None or not self.removed:
+            return
+
+        self.removed = False
+
+        live = {id(point) for entity in self.segments + self.arcs for point in entity.points()}
+        live.update(map(id, self.arcs))
+
+        for handle, _ in list(self.store.handles.values()):
+            if not id(handle) in live:
+                self.store.detach(handle, 1 if isinstance(handle, Arc) else 2)
+
+    def attach(self, entities):
+        # moves the values of the entities into the store (no-op without one), reusing the slots of removed
+        # ones; returns True if anything was attached
+        if self.store is None:
+            return False
+
+        self.release()
+
+        attached = False
+
+        for entity in entities:
+            for point in entity.points():
+                if not point in self.store:
+                    self.store.attach(point, 2)
+                    attached = True
+            if isinstance(entity, Arc) and not entity in self.store:
+                self.store.attach(entity, 1)
+                attached = True
+
+        return attached
@@ -1,3 +1,5 @@
+from solver.structural_analysis import CONSTRAINEDNESS
+
 WINDOW_SIZE                 = (840, 440)
 
 USER_SELECTING_RADUIS       = 10
@@ -14,4 +16,21 @@ MENU_SIDE_OFFSET            = 10
 
 EXTENSION_LINE_LENGTH       = 40
 DIMENSION_LINE_OFFSET       = 30
-EXTENSION_LINE_THICKNESS    = 1
\ No newline at end of file
+EXTENSION_LINE_THICKNESS    = 1
+SOLVER_STATISTICS_FILE      = "solver_statistics.json"
+
+# cell of the hit-testing grids: world units for the geometry, pixels for the constraint icons
+SPATIAL_INDEX_CELL_SIZE     = 50
+ICON_SELECTING_TOLERANCE    = 3
+
+# colors of points and lines by the structural analysis of the solver; the selection is drawn red over them
+POINT_COLOR = {
+    CONSTRAINEDNESS.UNDER:  'blue',
+    CONSTRAINEDNESS.WELL:   'dark green',
+    CONSTRAINEDNESS.OVER:   'magenta',
+}
+LINE_COLOR = {
+    CONSTRAINEDNESS.UNDER:  'black',
+    CONSTRAINEDNESS.WELL:   'dark green',
+    CONSTRAINEDNESS.OVER:   'magenta',
+}
@@ -37,5 +37,8 @@ class ConstraintIcon():
             x2, y2, x2-r, y2, x2-r, y2, x1+r, y2, x1+r, y2, x1, y2, x1, y2-r, x1, y2-r, x1, y1+r, x1, y1+r, x1, y1)
         return self.canvas.create_polygon(points, **kwargs, smooth=True)
 
+    def bbox(self):
+        return (self.point.x - self.icon_width / 2, self.point.y - self.icon_height / 2, self.point.x + self.icon_width / 2, self.point.y + self.icon_height / 2)
+
     def __contains__(self, p):
         return (self.point.x - self.icon_width / 2 <= p.x <= self.point.x + self.icon_width / 2) and (self.point.y - self.icon_height / 2 <= p.y <= self.point.y + self.icon_height / 2)
\ No newline at end of file
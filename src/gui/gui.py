@@ -1,5 +1,6 @@
 import tkinter as tk
 import tkinter.simpledialog
+import itertools
 from gui.tooltip import ToolTip
 from constraints.constraint import Constraint
 from constraints.constraints import *
@@ -7,13 +8,15 @@ from examples.examples import examples
 from geometry import Geometry
 from geometric_primitives.point import Point, distance_p2p
 from geometric_primitives.segment import Segment, distance_p2s
-from math import atan2, degrees, pi
+from math import pi
 from geometric_primitives.arc import Arc, distance_p2a
 from gui.constraint_icon import ConstraintIcon
 from gui.segment_dimension import SegmentDimension
 from gui.arc_dimension import ArcDimension
 from solver.solver import SOLVER_TYPE
+from sketch.history import History, OPERATION
 from gui.config import *
+from gui.spatial_index import SpatialIndex
 
 class GUI(tk.Frame):
     def __init__(self, root, geometry: Geometry, geometry_changed_callback, constraints, constraints_changed_callback, solver):
@@ -29,20 +32,33 @@ class GUI(tk.Frame):
 
         self.solver = solver
 
+        # undo/redo of the edits and drags, one step per user action
+        self.history = History(geometry, constraints, solver)
+
         self.canvas = tk.Canvas(self, width=WINDOW_SIZE[0], height=WINDOW_SIZE[1], background='white', bd=0, highlightthickness=0)
         self.canvas.grid(row=0, column=0, sticky="nsew")
 
         self.entity_to_drawn_entity = {}
+        # point -> the segments and arcs it belongs to (loaded sketches can share points)
+        self.point_to_entity = {}
         self.entity_and_constraint_to_drawn_constraint_icon = {}
 
+        # hit-testing: segments and arcs by their world bounding boxes, constraint icons (keyed as above) by screen ones
+        self.geometry_index = SpatialIndex(SPATIAL_INDEX_CELL_SIZE)
+        self.icon_index = SpatialIndex(SPATIAL_INDEX_CELL_SIZE)
+
         self.selected_point = None
         self.selected_point_moved = False
+        # world coordinates of the cursor dragging selected_point
+        self.drag_target = None
 
         self.points_for_new_geometry = []
         self.adding_segment = False
         self.adding_arc = False
 
         self.degrees_of_freedom = 0
+        # structural status of points and entities (under/well/over-constrained), set after every solve
+        self.entity_status = {}
 
         # could be Segment, Arc, Point or Constraint
         self.selected_entities = set()
@@ -83,6 +99,10 @@ class GUI(tk.Frame):
         file_menu = tk.Menu(menubar, tearoff="off")
         file_menu.add_command(label='Clear', command=self.clear_everything)
         menubar.add_cascade(label="File", menu=file_menu)
+        edit_menu = tk.Menu(menubar, tearoff="off")
+        edit_menu.add_command(label='Undo', accelerator='Ctrl+Z', command=self.undo)
+        edit_menu.add_command(label='Redo', accelerator='Ctrl+Y', command=self.redo)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
         examples_menu = tk.Menu(menubar, tearoff="off")
         for example in examples:
             examples_menu.add_command(label=f'{example.__name__}', command=lambda example = example: self.load_example(example))
@@ -97,9 +117,17 @@ class GUI(tk.Frame):
                 value=s_type.value,
                 command=self.solver_changed
             )
+        solver_menu.add_separator()
+        self.local_drag = tk.BooleanVar()
+        self.local_drag.set(self.solver.local_drag)
+        solver_menu.add_checkbutton(label='Local drag', variable=self.local_drag, command=self.local_drag_changed)
 
         menubar.add_cascade(menu=solver_menu, label="Solver")
 
+    def local_drag_changed(self):
+        self.solver.wait()
+        self.solver.local_drag = self.local_drag.get()
+
     def create_side_menus(self):
         self.menu_left = tk.Frame(self)
         self.menu_right = tk.Frame(self)
@@ -129,6 +157,9 @@ class GUI(tk.Frame):
         self.bind("<Configure>", self.on_resize)
 
         self.root.bind("<KeyPress>", self.on_key_press)
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        self.root.bind("<Control-Z>", lambda event: self.redo())
 
     def create_icons(self):
         self.segment_icon = tk.PhotoImage(file = f"icons/{BUTTON_ICON_SIZE}x{BUTTON_ICON_SIZE}/segment.png")
@@ -206,6 +237,7 @@ class GUI(tk.Frame):
             'o': lambda: self.on_add_constraint_button_clicked(CONSTRAINT_TYPE.CONCENTRICITY),
             'd': lambda: self.on_add_constraint_button_clicked(CONSTRAINT_TYPE.LENGTH),
             'p': self.print_detailed_info,
+            'P': self.dump_solver_statistics,
         }.get(event.keysym, lambda : None)()
 
     def on_left_button_pressed(self, event):
@@ -220,6 +252,8 @@ class GUI(tk.Frame):
             if self.adding_segment and len(self.points_for_new_geometry) == 2:
                 segment = Segment(self.points_for_new_geometry[0], self.points_for_new_geometry[1])
                 self.geometry.segments.append(segment)
+                self.solver.entity_added(segment)
+                self.history.record(OPERATION.ADD_ENTITY, segment)
                 self.add_drawn_entity(segment)
                 self.new_geometry_added()
                 return
@@ -227,13 +261,17 @@ class GUI(tk.Frame):
             if self.adding_arc and len(self.points_for_new_geometry) == 3:
                 arc = Arc(self.points_for_new_geometry[0], self.points_for_new_geometry[2], self.points_for_new_geometry[1])
                 self.geometry.arcs.append(arc)
+                self.solver.entity_added(arc)
+                self.history.record(OPERATION.ADD_ENTITY, arc)
                 self.add_drawn_entity(arc)
                 self.new_geometry_added()
                 return
             return
 
-        for (_, constraint), drawn_constraint_icon in self.entity_and_constraint_to_drawn_constraint_icon.items():
-            if self.to_screen(cursor) in drawn_constraint_icon:
+        screen_cursor = self.to_screen(cursor)
+
+        for (entity, constraint) in self.icon_index.query(screen_cursor.x, screen_cursor.y, ICON_SELECTING_TOLERANCE):
+            if screen_cursor in self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)]:
                 self.selected_entities.clear()
                 self.selected_entities.add(constraint)
                 self.redraw_geometry()
@@ -243,7 +281,7 @@ class GUI(tk.Frame):
             constraints = set(filter(lambda entity: isinstance(entity, Constraint), selected_entities))
             return selected_entities - constraints
 
-        for entity in (self.geometry.segments + self.geometry.arcs):
+        for entity in self.geometry_index.query(cursor.x, cursor.y, USER_SELECTING_RADUIS):
             for point in entity.points():
                 if distance_p2p(point, cursor) < USER_SELECTING_RADUIS:
                     self.selected_point = point
@@ -262,6 +300,9 @@ class GUI(tk.Frame):
             if isinstance(entity, Arc) and distance_p2a(cursor, entity) < USER_SELECTING_RADUIS:
                 if entity in self.selected_entities: # "double click"
                     entity.invert_direction()
+                    self.solver.entity_changed(entity)
+                    self.history.record(OPERATION.INVERT_ARC, entity)
+                    self.history.commit()
                 self.selected_entities = unselect_constraints(self.selected_entities)
                 self.selected_entities.add(entity)
                 self.check_constraints_requirements()
@@ -274,9 +315,13 @@ class GUI(tk.Frame):
 
     def on_left_button_released(self, event):
         if self.selected_point_moved:
+            # a local drag only moved the neighbourhood of the point, the whole sketch gets its say at the end
+            if self.solver.local_drag:
+                self.solver.solve(self.selected_point, local = False, target = self.drag_target)
             self.selected_entities.remove(self.selected_point)
             self.check_constraints_requirements()
             self.redraw_geometry()
+            self.history.commit()
         self.selected_point = None
         self.selected_point_moved = False
 
@@ -284,8 +329,8 @@ class GUI(tk.Frame):
         if self.selected_point is None:
             return
 
-        for constraint in self.constraints:
-            if (constraint.type == CONSTRAINT_TYPE.FIXED) and (self.selected_point in constraint.entities):
+        for constraint in self.constraints.constraints_of(self.selected_point):
+            if constraint.type == CONSTRAINT_TYPE.FIXED:
                 return
 
         self.selected_point_moved = True
@@ -293,9 +338,10 @@ class GUI(tk.Frame):
         canvas_cursor = Point(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
         cursor = self.to_world(canvas_cursor)
 
-        self.selected_point.x, self.selected_point.y = cursor.x, cursor.y
+        # the point itself is moved by the solver, the GUI only reads the geometry
+        self.drag_target = (cursor.x, cursor.y)
 
-        self.geometry_changed_callback(self.selected_point)
+        self.geometry_changed_callback(self.selected_point, self.drag_target)
 
     def on_middle_mouse_button_pressed(self, event):
         self.canvas.scan_mark(event.x, event.y)
@@ -368,6 +414,7 @@ class GUI(tk.Frame):
         self.selected_entities.clear()
         self.check_constraints_requirements()
         self.constraints_changed_callback()
+        self.history.commit()
 
     # elements drawing (geometry)
 
@@ -377,36 +424,29 @@ class GUI(tk.Frame):
     def remove_drawn_point(self, point: Point):
         self.canvas.delete(self.entity_to_drawn_entity[point])
         self.entity_to_drawn_entity.pop(point, None)
+        self.point_to_entity.pop(point, None)
 
     def add_drawn_segment(self, segment: Segment):
         line = self.canvas.create_line(segment.p1.x, segment.p1.y, segment.p2.x, segment.p2.y, capstyle=tk.ROUND, joinstyle=tk.ROUND, width=LINE_TICKNESS)
         self.canvas.tag_lower(line)
         self.entity_to_drawn_entity[segment] = line
+        self.geometry_index.insert(segment, self.segment_bbox(segment))
 
-        self.entity_to_drawn_entity[segment.p1] = self.add_drawn_entity(segment.p1)
-        self.entity_to_drawn_entity[segment.p2] = self.add_drawn_entity(segment.p2)
+        self.add_point_owner(segment.p1, segment)
+        self.add_point_owner(segment.p2, segment)
 
     def remove_drawn_segment(self, segment: Segment):
         self.canvas.delete(self.entity_to_drawn_entity[segment])
         self.entity_to_drawn_entity.pop(segment, None)
-        self.remove_drawn_entity(segment.p1)
-        self.remove_drawn_entity(segment.p2)
+        self.geometry_index.remove(segment)
+        self.remove_point_owner(segment.p1, segment)
+        self.remove_point_owner(segment.p2, segment)
 
-    def calculate_arc_start_and_extent(self, arc: Arc):
-        arc_center = arc.center()
+    def segment_bbox(self, segment: Segment):
+        return min(segment.p1.x, segment.p2.x), min(segment.p1.y, segment.p2.y), max(segment.p1.x, segment.p2.x), max(segment.p1.y, segment.p2.y)
 
-        center_p2 = Vector.from_two_points(arc_center, arc.p2)
-        center_p1 = Vector.from_two_points(arc_center, arc.p1)
-
-        start_angle = degrees(atan2(-center_p1.y, center_p1.x))
-        end_angle = degrees(atan2(-center_p2.y, center_p2.x))
-
-        if start_angle < end_angle:
-            start_angle += 360
-
-        extent = end_angle - start_angle
-
-        return start_angle, extent
+    def calculate_arc_start_and_extent(self, arc: Arc):
+        return arc.start_and_extent()
 
     def add_drawn_arc(self, arc: Arc):
         bb_coords = arc.bb_coords()
@@ -416,15 +456,31 @@ class GUI(tk.Frame):
         drawn_arc = self.canvas.create_arc(bb_coords, start = start, extent = extent, style=tk.ARC, width=LINE_TICKNESS)
         self.canvas.tag_lower(drawn_arc)
         self.entity_to_drawn_entity[arc] = drawn_arc 
+        self.geometry_index.insert(arc, bb_coords)
 
-        self.entity_to_drawn_entity[arc.p1] = self.add_drawn_entity(arc.p1)
-        self.entity_to_drawn_entity[arc.p2] = self.add_drawn_entity(arc.p2)
+        self.add_point_owner(arc.p1, arc)
+        self.add_point_owner(arc.p2, arc)
 
     def remove_drawn_arc(self, arc: Arc):
         self.canvas.delete(self.entity_to_drawn_entity[arc])
         self.entity_to_drawn_entity.pop(arc, None)
-        self.remove_drawn_entity(arc.p1)
-        self.remove_drawn_entity(arc.p2)
+        self.geometry_index.remove(arc)
+        self.remove_point_owner(arc.p1, arc)
+        self.remove_point_owner(arc.p2, arc)
+
+    def add_point_owner(self, point: Point, entity):
+        # a shared point is drawn once, for its first segment or arc
+        owners = self.point_to_entity.setdefault(point, [])
+        if not owners:
+            self.entity_to_drawn_entity[point] = self.add_drawn_entity(point)
+        owners.append(entity)
+
+    def remove_point_owner(self, point: Point, entity):
+        owners = self.point_to_entity.get(point, [])
+        if entity in owners:
+            owners.remove(entity)
+        if not owners:
+            self.remove_drawn_entity(point)
 
     def remove_drawn_entity(self, entity):
         {
@@ -448,31 +504,51 @@ class GUI(tk.Frame):
         for entity in (self.geometry.segments + self.geometry.arcs):
             self.remove_drawn_entity(entity)
 
-    def redraw_geometry(self):
+    def affected_entities(self, changed):
+        # segments and arcs to redraw for the points and arcs changed by the solver
+        entities = set()
+
+        for entity in changed:
+            for owner in self.point_to_entity.get(entity, [entity]):
+                if isinstance(owner, (Segment, Arc)) and owner in self.entity_to_drawn_entity:
+                    entities.add(owner)
+
+        return list(entities)
+
+    def redraw_geometry(self, changed = None):
+        # changed: points and arcs moved by the solver since the last redraw; None redraws everything
+        entities = (self.geometry.segments + self.geometry.arcs) if changed is None else self.affected_entities(changed)
+        redrawn = set(entities)
+
         # points
-        for entity in (self.geometry.segments + self.geometry.arcs):
+        for entity in entities:
             for point in entity.points():
                 screen_p = self.to_screen(point)
                 self.canvas.coords(self.entity_to_drawn_entity[point], 
                                    screen_p.x - POINT_RADIUS, screen_p.y - POINT_RADIUS, 
                                    screen_p.x + POINT_RADIUS, screen_p.y + POINT_RADIUS)
-                self.canvas.itemconfig(self.entity_to_drawn_entity[point], fill='blue', outline='blue')
+                color = POINT_COLOR[self.entity_status.get(point, CONSTRAINEDNESS.UNDER)]
+                self.canvas.itemconfig(self.entity_to_drawn_entity[point], fill=color, outline=color)
 
         # selected points
         for selected_point in [entity for entity in self.selected_entities if isinstance(entity, Point)]:
+            if not changed is None and not any(owner in redrawn for owner in self.point_to_entity.get(selected_point, [])):
+                continue
             circle = self.entity_to_drawn_entity[selected_point]
             self.canvas.itemconfig(circle, fill='red', outline='red')
             self.canvas.tag_raise(circle)
 
         # segments
-        for segment in self.geometry.segments:
+        for segment in filter(lambda entity: isinstance(entity, Segment), entities):
             p1_s = self.to_screen(segment.p1)
             p2_s = self.to_screen(segment.p2)
             self.canvas.coords(self.entity_to_drawn_entity[segment], p1_s.x, p1_s.y, p2_s.x, p2_s.y)
+            self.geometry_index.insert(segment, self.segment_bbox(segment))
 
         # arcs
-        for arc in self.geometry.arcs:
+        for arc in filter(lambda entity: isinstance(entity, Arc), entities):
             bb = arc.bb_coords()
+            self.geometry_index.insert(arc, bb)
             scaled_bb = (bb[0] * self.zoom_scale, bb[1] * self.zoom_scale, 
                          bb[2] * self.zoom_scale, bb[3] * self.zoom_scale)
             self.canvas.coords(self.entity_to_drawn_entity[arc], *scaled_bb)
@@ -480,37 +556,39 @@ class GUI(tk.Frame):
             self.canvas.itemconfig(self.entity_to_drawn_entity[arc], start = start, extent = extent)
 
         # selected segments and arcs
-        for entity in (self.geometry.segments + self.geometry.arcs):
-            line_color = "red" if entity in self.selected_entities else "black"
+        for entity in entities:
+            line_color = "red" if entity in self.selected_entities else LINE_COLOR[self.entity_status.get(entity, CONSTRAINEDNESS.UNDER)]
             self.canvas.itemconfig(self.entity_to_drawn_entity[entity], fill=line_color)
             if isinstance(entity, Arc):
                 self.canvas.itemconfig(self.entity_to_drawn_entity[entity], outline=line_color)
 
         # constraint icons
-        self.update_constraint_icons()
+        self.update_constraint_icons(entities)
 
         self.set_text_info(f'e: {len(self.geometry.segments) + len(self.geometry.arcs)} | c: {len(self.constraints)} | d: {self.degrees_of_freedom}')
 
     # elements drawing (constraints)
 
     def add_constraint_icon(self, constraint):
-        for entity in (self.geometry.segments + self.geometry.arcs):
-            if entity in constraint.entities:
-                if not (entity, constraint) in self.entity_and_constraint_to_drawn_constraint_icon:
-                    if constraint.type == CONSTRAINT_TYPE.LENGTH:
-                        if isinstance(constraint.entities[0], Segment):
-                            self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = SegmentDimension(self.canvas, constraint.entities[1])
-                        elif isinstance(constraint.entities[0], Arc):
-                            self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = ArcDimension(self.canvas, constraint.entities[1])
-                    else:
-                        self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = ConstraintIcon(self.canvas, self.constraint_icon[CONSTRAINT_ICON_SIZE][constraint.type], CONSTRAINT_ICON_SIZE)
-
-            for point in entity.points():
-                if point in constraint.entities:
-                    if not (point, constraint) in self.entity_and_constraint_to_drawn_constraint_icon:
-                        exists_already = (constraint.type == CONSTRAINT_TYPE.COINCIDENCE) and any(c is constraint for (p, c) in self.entity_and_constraint_to_drawn_constraint_icon)
-                        if not exists_already:
-                            self.entity_and_constraint_to_drawn_constraint_icon[(point, constraint)] = ConstraintIcon(self.canvas, self.constraint_icon[CONSTRAINT_ICON_SIZE][constraint.type], CONSTRAINT_ICON_SIZE)
+        for entity in constraint.entities:
+            # numbers and entities that are not drawn
+            if not isinstance(entity, (Point, Segment, Arc)) or not entity in self.entity_to_drawn_entity:
+                continue
+
+            if (entity, constraint) in self.entity_and_constraint_to_drawn_constraint_icon:
+                continue
+
+            if isinstance(entity, Point):
+                exists_already = (constraint.type == CONSTRAINT_TYPE.COINCIDENCE) and any((p, constraint) in self.entity_and_constraint_to_drawn_constraint_icon for p in constraint.entities)
+                if not exists_already:
+                    self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = ConstraintIcon(self.canvas, self.constraint_icon[CONSTRAINT_ICON_SIZE][constraint.type], CONSTRAINT_ICON_SIZE)
+            elif constraint.type == CONSTRAINT_TYPE.LENGTH:
+                if isinstance(constraint.entities[0], Segment):
+                    self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = SegmentDimension(self.canvas, constraint.entities[1])
+                elif isinstance(constraint.entities[0], Arc):
+                    self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = ArcDimension(self.canvas, constraint.entities[1])
+            else:
+                self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)] = ConstraintIcon(self.canvas, self.constraint_icon[CONSTRAINT_ICON_SIZE][constraint.type], CONSTRAINT_ICON_SIZE)
 
     def remove_constraint_icon(self, constraint):
         def remove_icon(entity):
@@ -518,15 +596,12 @@ class GUI(tk.Frame):
             if not icon is None:
                 icon.remove_drawn_entities()
                 self.entity_and_constraint_to_drawn_constraint_icon.pop((entity, constraint), None)
+                self.icon_index.remove((entity, constraint))
 
-        for entity in (self.geometry.segments + self.geometry.arcs):
-            if entity in constraint.entities:
+        for entity in constraint.entities:
+            if isinstance(entity, (Point, Segment, Arc)):
                 remove_icon(entity)
 
-            for point in entity.points():
-                if point in constraint.entities:
-                    remove_icon(point)
-
     def add_constraint_icons(self):
         for constraint in self.constraints:
             self.add_constraint_icon(constraint)
@@ -535,18 +610,27 @@ class GUI(tk.Frame):
         for constraint in self.constraints:
             self.remove_constraint_icon(constraint)
 
-    def update_constraint_icons(self):
+    def update_constraint_icons(self, entities = None):
+        # icons of the given segments and arcs and of their points, all of them by default
+        if entities is None:
+            entities = self.geometry.segments + self.geometry.arcs
+
+        owners = set(entities)
+        for point in itertools.chain.from_iterable(entity.points() for entity in entities):
+            owners.add(point)
+
+        icons = [(key, drawn_icon) for key, drawn_icon in self.entity_and_constraint_to_drawn_constraint_icon.items() if key[0] in owners]
+
         # constraint icon colors
-        for (_, constraint), drawn_constraint_icon in self.entity_and_constraint_to_drawn_constraint_icon.items():
+        for (_, constraint), drawn_constraint_icon in icons:
             drawn_constraint_icon.set_selected(constraint in self.selected_entities)
 
         # constraint icons for segments and arcs
-        for entity in (self.geometry.segments + self.geometry.arcs):
+        for entity in entities:
             drawn_icons = []
 
-            for constraint in self.constraints:
-                if entity in constraint.entities:
-                    drawn_icons.append(self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)])
+            for constraint in self.constraints.constraints_of(entity):
+                drawn_icons.append(self.entity_and_constraint_to_drawn_constraint_icon[(entity, constraint)])
 
             normal_spacing = CONSTRAINT_ICON_SPACING
             tangent_spacing = normal_spacing + 10
@@ -588,14 +672,13 @@ class GUI(tk.Frame):
                         drawn_icon.moveto(Arc(self.to_screen(entity.p1), self.to_screen(entity.p2), self.to_screen(entity.middle_point())))
 
         # constraint icons for points
-        for entity in (self.geometry.segments + self.geometry.arcs):
+        for entity in entities:
             for point in entity.points():
                 drawn_icons = []
 
-                for constraint in self.constraints:
-                    if point in constraint.entities:
-                        if (point, constraint) in self.entity_and_constraint_to_drawn_constraint_icon:
-                            drawn_icons.append(self.entity_and_constraint_to_drawn_constraint_icon[(point, constraint)])
+                for constraint in self.constraints.constraints_of(point):
+                    if (point, constraint) in self.entity_and_constraint_to_drawn_constraint_icon:
+                        drawn_icons.append(self.entity_and_constraint_to_drawn_constraint_icon[(point, constraint)])
 
                 icons_in_first_layer = 5
                 first_layer_radius = CONSTRAINT_ICON_SPACING
@@ -615,16 +698,42 @@ class GUI(tk.Frame):
                         layer += 1
                         offset += Vector(0, first_layer_radius)
 
+        # icons for hit-testing, at their new screen positions
+        for key, drawn_icon in icons:
+            bbox = drawn_icon.bbox()
+            if not bbox is None:
+                self.icon_index.insert(key, bbox)
+
     # misc
 
     def add_constraint(self, constraint: Constraint):
         new_constraints = self.constraints.add_constraint(constraint.type, constraint.entities)
+        self.solver.constraints_added(new_constraints)
+
+        # constraints that depend on the existing ones are rejected before the solver tries them
+        analysis = self.solver.find_dependent_constraints(new_constraints)
+        for constraint, dependent_set, conflicting in analysis.dependencies:
+            self.constraints.remove(constraint)
+            self.solver.constraint_removed(constraint)
+            new_constraints.remove(constraint)
+
+        if analysis.dependencies:
+            constraint, dependent_set, conflicting = analysis.dependencies[0]
+            reason = f"it depends on {', '.join(map(str, dependent_set[1:]))}" if dependent_set[1:] else "it does not depend on the geometry"
+            self.set_text_hint(f"{'Conflicting' if conflicting else 'Redundant'} constraint {constraint} rejected, {reason}")
+
         for constraint in new_constraints:
             self.add_constraint_icon(constraint)
+            self.history.record(OPERATION.ADD_CONSTRAINT, constraint)
+
+        # [(rejected constraint, [constraints of its dependent set], conflicting)]
+        return analysis.dependencies
 
     def remove_constraint(self, constraint: Constraint):
         self.remove_constraint_icon(constraint)
+        self.history.record(OPERATION.REMOVE_CONSTRAINT, constraint)
         self.constraints.remove(constraint)
+        self.solver.constraint_removed(constraint)
 
     def new_geometry_added(self):
         self.points_for_new_geometry.clear()
@@ -635,6 +744,7 @@ class GUI(tk.Frame):
         self.set_text_hint("")
 
         self.geometry_changed_callback(None)
+        self.history.commit()
 
     def check_constraints_requirements(self):
         for button in self.constraint_button.values():
@@ -651,6 +761,8 @@ class GUI(tk.Frame):
         self.remove_constraint_icons()
         self.geometry.clear()
         self.constraints.clear()
+        self.solver.reset()
+        self.history.reset()
 
     def load_example(self, example):
         self.clear_everything()
@@ -658,6 +770,7 @@ class GUI(tk.Frame):
         self.add_geometry()
         self.add_constraint_icons()
         self.constraints_changed_callback()
+        self.history.reset()
 
     def delete_selected_entities(self):
         entities_to_be_removed = []
@@ -679,13 +792,50 @@ class GUI(tk.Frame):
             self.remove_constraint(constraint)
 
         for entity in entities_to_be_removed:
+            if isinstance(entity, (Arc, Segment)):
+                self.history.record(OPERATION.REMOVE_ENTITY, entity)
             self.geometry.remove_entity(entity)
+            self.solver.entity_removed(entity)
 
         self.selected_entities.clear()
 
         self.geometry_changed_callback(None)
         self.constraints_changed_callback()
         self.redraw_geometry()
+        self.history.commit()
+
+    def undo(self):
+        self.apply_history(self.history.undo)
+
+    def redo(self):
+        self.apply_history(self.history.redo)
+
+    def apply_history(self, step):
+        # the drawing follows the edits of the step, the moved points are redrawn by the solve that follows
+        self.solver.wait()
+
+        result = step()
+
+        if result is None:
+            return
+
+        operations, _ = result
+
+        for operation, entity, _ in operations:
+            if operation == OPERATION.ADD_ENTITY:
+                self.add_drawn_entity(entity)
+            elif operation == OPERATION.REMOVE_ENTITY:
+                self.remove_drawn_entity(entity)
+            elif operation == OPERATION.ADD_CONSTRAINT:
+                self.add_constraint_icon(entity)
+            elif operation == OPERATION.REMOVE_CONSTRAINT:
+                self.remove_constraint_icon(entity)
+
+        self.selected_entities.clear()
+        self.check_constraints_requirements()
+        self.constraints_changed_callback()
+        self.redraw_geometry()
+        self.history.sync()
 
     def print_detailed_info(self):
         print ("")
@@ -695,4 +845,19 @@ class GUI(tk.Frame):
         print (f"\tInactive: {self.constraints.inactive_constraints}")
         print (f"\tSolved by substitution: {self.constraints.solved_by_substitution_constraints}")
         print (f"\tSolved by solver: {len(self.constraints) - self.constraints.solved_by_substitution_constraints - self.constraints.fixed_constraints}")
-        print ("==============================")
\ No newline at end of file
+        print ("==============================")
+        analysis = self.solver.analyze()
+        print (f"Structure: {self.solver.number_of_variables} variables, rank {analysis.rank}, {analysis.degrees_of_freedom} degrees of freedom, {analysis.redundant_equations} redundant equations")
+        for i, (component, dof, redundant) in enumerate(analysis.components):
+            print (f"\tComponent {i}: {len(component.vars)} variables, {len(component.constraints)} equations, {dof} degrees of freedom, {redundant} redundant")
+        if analysis.over_constrained_constraints:
+            print (f"\tOver-constrained: {analysis.over_constrained_constraints}")
+        for constraint, dependent_set, conflicting in self.solver.find_dependent_constraints().dependencies:
+            print (f"\t{'Conflicting' if conflicting else 'Redundant'}: {dependent_set}")
+        print ("==============================")
+        print (self.solver.instrumentation.report())
+        print ("==============================")
+
+    def dump_solver_statistics(self):
+        self.solver.instrumentation.dump(SOLVER_STATISTICS_FILE)
+        print (f"Solver statistics saved to {SOLVER_STATISTICS_FILE}")
\ No newline at end of file
@@ -58,6 +58,9 @@ class SegmentDimension():
         self.canvas.itemconfig(self.dimension_line, fill = color)
         self.canvas.itemconfig(self.value_icon, fill = color)
 
+    def bbox(self):
+        return self.canvas.bbox(self.dimension_line, self.value_icon)
+
     def __contains__(self, p):
         tolerance = 3 
         
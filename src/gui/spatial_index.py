@@ -0,0 +1,78 @@
+from math import floor
+
+# items spanning more cells than this are kept in one list and tested on every query
+SPATIAL_INDEX_MAX_CELLS = 64
+
+class SpatialIndex:
+    # Uniform grid over axis-aligned bounding boxes (x1, y1, x2, y2). An item is registered in every cell its box
+    # touches; a query returns the items whose boxes touch the cells around a point, in the order of insertion,
+    # so only the nearby candidates have to be hit-tested exactly.
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        self.large_items = set()
+        self.order = {}
+
+    def cell_range(self, x1, y1, x2, y2):
+        size = self.cell_size
+        return floor(x1 / size), floor(y1 / size), floor(x2 / size), floor(y2 / size)
+
+    def insert(self, item, bbox):
+        # also moves an item that is in the index already
+        i1, j1, i2, j2 = self.cell_range(*bbox)
+
+        if self.item_cells.get(item) == (i1, j1, i2, j2):
+            return
+
+        self.remove(item, False)
+        self.order.setdefault(item, len(self.order))
+        self.item_cells[item] = (i1, j1, i2, j2)
+
+        if (i2 - i1 + 1) * (j2 - j1 + 1) > SPATIAL_INDEX_MAX_CELLS:
+            self.large_items.add(item)
+            return
+
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                self.cells.setdefault((i, j), set()).add(item)
+
+    def remove(self, item, forget = True):
+        cells = self.item_cells.pop(item, None)
+
+        if forget:
+            self.order.pop(item, None)
+
+        if cells is None:
+            return
+
+        if item in self.large_items:
+            self.large_items.discard(item)
+            return
+
+        i1, j1, i2, j2 = cells
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                items = self.cells[(i, j)]
+                items.discard(item)
+                if not items:
+                    del self.cells[(i, j)]
+
+    def query(self, x, y, radius):
+        i1, j1, i2, j2 = self.cell_range(x - radius, y - radius, x + radius, y + radius)
+
+        candidates = set(self.large_items)
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                candidates.update(self.cells.get((i, j), ()))
+
+        return sorted(candidates, key = self.order.get)
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+        self.large_items.clear()
+        self.order.clear()
+
+    def __len__(self):
+        return len(self.item_cells)
@@ -4,10 +4,21 @@ from geometry import Geometry
 from gui.gui import GUI
 from solver.solver import Solver
 import sys
+import threading
+import time
 
-def geometry_changed_by_GUI(active_point):
+# how often results of the solver thread are checked while it has work, ms
+SOLVER_POLL_INTERVAL = 10
+
+def geometry_changed_by_GUI(active_point, target = None):
     global solver
-    solver.solve(active_point)
+    # drags are solved off the Tk thread (target is the cursor, the point itself is moved by the solver),
+    # edits are solved right away
+    if active_point is None:
+        solver.solve(None)
+    else:
+        solver.solve_async(active_point, *target)
+        start_publishing()
 
 def constraints_changed_by_GUI():
     global solver
@@ -16,15 +27,44 @@ def constraints_changed_by_GUI():
 def geometry_changed_by_solver():
     global gui
     global solver
+    if threading.current_thread() is not threading.main_thread():
+        solver_results_ready.set()
+        return
     gui.degrees_of_freedom = solver.degrees_of_freedom
-    gui.redraw_geometry()
+    gui.entity_status = solver.structural_analysis.entity_status
+    start = time.perf_counter()
+    gui.redraw_geometry(solver.take_changed_entities())
+    solver.instrumentation.add_sample('redraw', time.perf_counter() - start)
+
+def start_publishing():
+    # the worker thread does not call Tk (the Tk thread may be waiting for it) and does not write the geometry,
+    # results are picked up by polling from the Tk thread, only while the worker has work
+    global publishing
+    if not publishing:
+        publishing = True
+        root_widget.after(SOLVER_POLL_INTERVAL, publish_solver_results)
+
+def publish_solver_results():
+    global publishing
+    if solver_results_ready.is_set():
+        solver_results_ready.clear()
+        # the geometry is written here, on the Tk thread, and only read by the redraw
+        solver.publish()
+        geometry_changed_by_solver()
+    # a result set after the check is seen by the next one: the worker is in flight until its callback returned
+    if solver.in_flight() or solver_results_ready.is_set():
+        root_widget.after(SOLVER_POLL_INTERVAL, publish_solver_results)
+    else:
+        publishing = False
 
 sys.setrecursionlimit(1500)
 
-geometry = Geometry()
+geometry = Geometry(array_backed = True)
 constraints = Constraints()
 
 solver = Solver(geometry, geometry_changed_by_solver, constraints)
+solver_results_ready = threading.Event()
+publishing = False
 
 root_widget = tk.Tk()
 root_widget.title('2D Geometric Constraint Solver')
@@ -0,0 +1,184 @@
+from enum import Enum, auto
+import numpy as np
+from geometric_primitives.arc import Arc
+from geometric_primitives.segment import Segment
+
+# steps kept for undo, the oldest ones are forgotten
+HISTORY_MAX_STEPS = 1000
+
+class OPERATION(Enum):
+    ADD_ENTITY          = auto()
+    REMOVE_ENTITY       = auto()
+    ADD_CONSTRAINT      = auto()
+    REMOVE_CONSTRAINT   = auto()
+    INVERT_ARC          = auto()
+
+INVERSE_OPERATION = {
+    OPERATION.ADD_ENTITY:           OPERATION.REMOVE_ENTITY,
+    OPERATION.REMOVE_ENTITY:        OPERATION.ADD_ENTITY,
+    OPERATION.ADD_CONSTRAINT:       OPERATION.REMOVE_CONSTRAINT,
+    OPERATION.REMOVE_CONSTRAINT:    OPERATION.ADD_CONSTRAINT,
+    OPERATION.INVERT_ARC:           OPERATION.INVERT_ARC,
+}
+
+class HistoryStep:
+    # edits of one user action, [(operation, segment, arc or constraint, its index in its list)], and the
+    # coordinates it changed: indices into the coordinate store with the values before and after
+    def __init__(self, operations, indices, before, after):
+        self.operations = operations
+        self.indices = indices
+        self.before = before
+        self.after = after
+
+class History:
+    # Undo/redo for an array-backed geometry and its constraints. A step is the log of the edits recorded
+    # since the last commit plus the delta of the coordinate store against the values at the last commit,
+    # so memory grows with the edits, not with the size of the sketch. Undoing a step applies the inverse
+    # edits in the reverse order and writes the old values back; the solver is notified through its
+    # incremental hooks, entities and constraints are the same objects as before, put back at the
+    # positions they had in their lists.
+    def __init__(self, geometry, constraints, solver = None):
+        self.geometry = geometry
+        self.constraints = constraints
+        self.solver = solver
+
+        self.undo_steps = []
+        self.redo_steps = []
+
+        self.reset()
+
+    def reset(self):
+        # e.g. after the sketch was replaced; the current state is where the history starts
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.operations = []
+
+        self.store = self.geometry.store
+        self.coordinates = self.store.data[:self.store.size].copy()
+
+    def record(self, operation, entity):
+        # additions are recorded after the edit, removals before it, so the entity is in its list
+        index = None
+        if operation != OPERATION.INVERT_ARC:
+            index = self.entities_of(entity).index(entity)
+        self.operations.append((operation, entity, index))
+
+    def entities_of(self, entity):
+        # the list a segment, arc or constraint is kept in
+        if isinstance(entity, Arc):
+            return self.geometry.arcs
+        elif isinstance(entity, Segment):
+            return self.geometry.segments
+        else:
+            return self.constraints
+
+    def coordinates_delta(self):
+        # changed values of the store since the last commit; the copy of the values follows the store
+        store = self.store
+        size = min(len(self.coordinates), store.size)
+
+        indices = np.flatnonzero(store.data[:size] != self.coordinates[:size])
+        before, after = self.coordinates[indices], store.data[indices]
+        self.coordinates[indices] = after
+
+        if store.size > len(self.coordinates):
+            self.coordinates = np.concatenate((self.coordinates, store.data[len(self.coordinates):store.size]))
+
+        return indices, before, after
+
+    def commit(self):
+        # closes the step of the last user action, including the solve it started; returns False if it changed nothing
+        if not self.solver is None:
+            self.solver.wait()
+
+        if not self.store is self.geometry.store:
+            self.reset()
+            return False
+
+        indices, before, after = self.coordinates_delta()
+
+        if not self.operations and not len(indices):
+            return False
+
+        self.undo_steps.append(HistoryStep(self.operations, indices, before, after))
+        self.operations = []
+        self.redo_steps.clear()
+
+        del self.undo_steps[:-HISTORY_MAX_STEPS]
+
+        return True
+
+    def sync(self):
+        # takes the current values as they are, without a step (e.g. the solve that follows an undo)
+        if not self.solver is None:
+            self.solver.wait()
+
+        if self.store is self.geometry.store:
+            self.coordinates_delta()
+
+    def can_undo(self):
+        return len(self.undo_steps) > 0
+
+    def can_redo(self):
+        return len(self.redo_steps) > 0
+
+    def undo(self):
+        # returns the edits that were applied and the moved points and arcs, None if there is nothing to undo
+        if not self.undo_steps:
+            return None
+
+        self.commit()
+
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+
+        operations = [(INVERSE_OPERATION[operation], entity, index) for operation, entity, index in reversed(step.operations)]
+
+        return self.apply(operations, step.indices, step.before)
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+
+        return self.apply(step.operations, step.indices, step.after)
+
+    def apply(self, operations, indices, values):
+        solver = self.solver
+
+        for operation, entity, index in operations:
+            if operation == OPERATION.ADD_ENTITY:
+                self.entities_of(entity).insert(index, entity)
+                # back in the store before the values of the step are written to its slots
+                self.geometry.attach([entity])
+                if not solver is None:
+                    solver.entity_added(entity)
+            elif operation == OPERATION.REMOVE_ENTITY:
+                self.geometry.remove_entity(entity)
+                if not solver is None:
+                    solver.entity_removed(entity)
+            elif operation == OPERATION.ADD_CONSTRAINT:
+                self.constraints.insert(index, entity)
+                if not solver is None:
+                    solver.constraints_added([entity])
+            elif operation == OPERATION.REMOVE_CONSTRAINT:
+                self.constraints.remove(entity)
+                if not solver is None:
+                    solver.constraint_removed(entity)
+            elif operation == OPERATION.INVERT_ARC:
+                entity.invert_direction()
+                if not solver is None:
+                    solver.entity_changed(entity)
+
+        self.store.data[indices] = values
+        self.coordinates[indices] = values
+
+        # slots freed since the step was recorded have no owner
+        moved = [owner for owner in dict.fromkeys(self.store.owners[index] for index in indices) if not owner is None]
+
+        if not solver is None:
+            solver.entities_moved(moved)
+
+        return operations, moved
@@ -0,0 +1,232 @@
+from contextlib import contextmanager
+import gc
+import itertools
+import json
+import os
+import numpy as np
+from constraints.constraint import Constraint
+from constraints.constraints import CONSTRAINT_TYPE
+from geometric_primitives.arc import Arc
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+
+# JSON sketch:
+# {
+#     "version": 1,
+#     "points": [[x, y], ...],
+#     "segments": [[p1, p2], ...],        indices into points
+#     "arcs": [[p1, p2, d], ...],
+#     "constraints": [{"type": "LENGTH", "entities": [["segment", 0], 100.0]}, ...]
+# }
+SKETCH_FILE_VERSION = 1
+
+# Binary sketch: the same tables as flat little-endian arrays, read through numpy.memmap.
+#
+#     magic                                   8 bytes
+#     header          int64[6]                version, points, segments, arcs, constraints, references
+#     coordinates     float64[2 * points + arcs]   x, y of every point, then d of every arc
+#     segments        int32[segments, 2]      indices into points
+#     arcs            int32[arcs, 2]
+#     types           uint8[constraints]      CONSTRAINT_TYPE values
+#     offsets         int32[constraints + 1]  references of constraint i are offsets[i]:offsets[i + 1]
+#     kinds           uint8[references]       REFERENCE_KINDS index, or len(REFERENCE_KINDS) for a number
+#     indices         int32[references]       index into the table of the kind
+#     values          float64[references]     the number of a number reference
+#
+# Every section starts at a multiple of 8 bytes. The coordinates are laid out like the CoordinateStore
+# of an array-backed geometry: the file is mapped copy-on-write and the mapped section is the store, so
+# the values are never copied and the edits of the sketch never reach the file.
+SKETCH_BINARY_MAGIC = b'SKETCHB\0'
+SKETCH_BINARY_VERSION = 1
+SKETCH_BINARY_EXTENSION = '.sketch'
+SKETCH_BINARY_HEADER = 6
+REFERENCE_KINDS = ['point', 'segment', 'arc']
+
+@contextmanager
+def gc_paused():
+    # building a large sketch allocates hundreds of thousands of objects that all survive; without the pause
+    # the cyclic collector keeps rescanning them
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def sketch_tables(geometry, constraints):
+    # the tables of both formats: points in the order of their first use, segments and arcs as indices into
+    # them, and the entities of every constraint as references, (kind, index) or a number
+    points, point_to_index = [], {}
+
+    def point_index(point):
+        if not point in point_to_index:
+            point_to_index[point] = len(points)
+            points.append(point)
+        return point_to_index[point]
+
+    segments = [(point_index(segment.p1), point_index(segment.p2)) for segment in geometry.segments]
+    arcs = [(point_index(arc.p1), point_index(arc.p2)) for arc in geometry.arcs]
+
+    segment_to_index = {segment: i for i, segment in enumerate(geometry.segments)}
+    arc_to_index = {arc: i for i, arc in enumerate(geometry.arcs)}
+
+    def entity_reference(entity):
+        if isinstance(entity, Point):
+            return ('point', point_index(entity))
+        if isinstance(entity, Segment):
+            return ('segment', segment_to_index[entity])
+        if isinstance(entity, Arc):
+            return ('arc', arc_to_index[entity])
+        return float(entity)
+
+    references = [[entity_reference(entity) for entity in constraint.entities] for constraint in constraints]
+
+    return points, segments, arcs, references
+
+def sketch_to_dict(geometry, constraints):
+    points, segments, arcs, references = sketch_tables(geometry, constraints)
+
+    return {
+        'version': SKETCH_FILE_VERSION,
+        'points': [[float(point.x), float(point.y)] for point in points],
+        'segments': [list(segment) for segment in segments],
+        'arcs': [[p1, p2, float(arc.d)] for (p1, p2), arc in zip(arcs, geometry.arcs)],
+        'constraints': [{'type': constraint.type.name, 'entities': [list(reference) if isinstance(reference, tuple) else reference for reference in entities]} \
+            for constraint, entities in zip(constraints, references)],
+    }
+
+def sketch_from_dict(data, geometry, constraints):
+    geometry.clear()
+    constraints.clear()
+
+    if data.get('version') != SKETCH_FILE_VERSION:
+        raise ValueError(f'unsupported sketch version: {data.get("version")}')
+
+    points = [Point(x, y) for x, y in data['points']]
+
+    geometry.segments = [Segment(points[p1], points[p2]) for p1, p2 in data['segments']]
+    geometry.arcs = [Arc.from_d(points[p1], points[p2], d) for p1, p2, d in data['arcs']]
+
+    entities = {'point': points, 'segment': geometry.segments, 'arc': geometry.arcs}
+
+    def entity(reference):
+        if isinstance(reference, list):
+            kind, index = reference
+            return entities[kind][index]
+        return reference
+
+    for constraint in data['constraints']:
+        constraints.append(Constraint([entity(reference) for reference in constraint['entities']], CONSTRAINT_TYPE[constraint['type']]))
+
+def sketch_to_arrays(geometry, constraints):
+    points, segments, arcs, references = sketch_tables(geometry, constraints)
+
+    flat_references = [reference for entities in references for reference in entities]
+    number = len(REFERENCE_KINDS)
+
+    return {
+        'coordinates': np.array([coordinate for point in points for coordinate in (point.x, point.y)] + [arc.d for arc in geometry.arcs], dtype = np.float64),
+        'segments': np.array(segments, dtype = np.int32).reshape(-1, 2),
+        'arcs': np.array(arcs, dtype = np.int32).reshape(-1, 2),
+        'types': np.array([constraint.type.value for constraint in constraints], dtype = np.uint8),
+        'offsets': np.cumsum([0] + [len(entities) for entities in references], dtype = np.int32),
+        'kinds': np.array([REFERENCE_KINDS.index(reference[0]) if isinstance(reference, tuple) else number for reference in flat_references], dtype = np.uint8),
+        'indices': np.array([reference[1] if isinstance(reference, tuple) else 0 for reference in flat_references], dtype = np.int32),
+        'values': np.array([0.0 if isinstance(reference, tuple) else reference for reference in flat_references], dtype = np.float64),
+    }
+
+def sketch_from_arrays(arrays, geometry, constraints):
+    # the coordinates are not copied: every point and arc is a handle into the array, and the array is the
+    # coordinate store of an array-backed geometry; it must be writable
+    geometry.clear()
+    constraints.clear()
+
+    coordinates = arrays['coordinates']
+    n_points = (len(coordinates) - len(arrays['arcs'])) // 2
+
+    points = list(map(Point.from_buffer, itertools.repeat(coordinates, n_points), range(0, 2 * n_points, 2)))
+
+    geometry.segments = [Segment(points[p1], points[p2]) for p1, p2 in arrays['segments'].tolist()]
+    geometry.arcs = arcs = [Arc.from_buffer(points[p1], points[p2], coordinates, index) \
+        for index, (p1, p2) in enumerate(arrays['arcs'].tolist(), 2 * n_points)]
+
+    if not geometry.store is None:
+        geometry.store.adopt(coordinates, points, arcs)
+
+    tables = [points, geometry.segments, arcs]
+    number = len(REFERENCE_KINDS)
+    references = [value if kind == number else tables[kind][index] \
+        for kind, index, value in zip(arrays['kinds'].tolist(), arrays['indices'].tolist(), arrays['values'].tolist())]
+
+    types = {type.value: type for type in CONSTRAINT_TYPE}
+    offsets = arrays['offsets'].tolist()
+    constraints.extend(map(Constraint, map(references.__getitem__, map(slice, offsets, offsets[1:])), map(types.__getitem__, arrays['types'].tolist())))
+
+def binary_sections(counts):
+    points, segments, arcs, constraints, references = counts
+    return [
+        ('coordinates', np.float64, (2 * points + arcs,)),
+        ('segments', np.int32, (segments, 2)),
+        ('arcs', np.int32, (arcs, 2)),
+        ('types', np.uint8, (constraints,)),
+        ('offsets', np.int32, (constraints + 1,)),
+        ('kinds', np.uint8, (references,)),
+        ('indices', np.int32, (references,)),
+        ('values', np.float64, (references,)),
+    ]
+
+def save_sketch_binary(path, geometry, constraints):
+    arrays = sketch_to_arrays(geometry, constraints)
+    counts = [(len(arrays['coordinates']) - len(arrays['arcs'])) // 2, len(arrays['segments']), len(arrays['arcs']), len(arrays['types']), len(arrays['kinds'])]
+
+    with open(path, 'wb') as file:
+        file.write(SKETCH_BINARY_MAGIC)
+        file.write(np.array([SKETCH_BINARY_VERSION] + counts, dtype = '<i8').tobytes())
+        for name, dtype, _ in binary_sections(counts):
+            data = np.ascontiguousarray(arrays[name], dtype = np.dtype(dtype).newbyteorder('<')).tobytes()
+            file.write(data + bytes(-len(data) % 8))
+
+def load_sketch_binary(path, geometry, constraints):
+    data = np.memmap(path, dtype = np.uint8, mode = 'c')
+
+    if bytes(data[:len(SKETCH_BINARY_MAGIC)]) != SKETCH_BINARY_MAGIC:
+        raise ValueError(f'not a binary sketch: {path}')
+
+    offset = len(SKETCH_BINARY_MAGIC)
+    version, *counts = np.frombuffer(data, dtype = '<i8', count = SKETCH_BINARY_HEADER, offset = offset).tolist()
+    offset += 8 * SKETCH_BINARY_HEADER
+
+    if version != SKETCH_BINARY_VERSION:
+        raise ValueError(f'unsupported binary sketch version: {version}')
+
+    arrays = {}
+    for name, dtype, shape in binary_sections(counts):
+        dtype = np.dtype(dtype).newbyteorder('<')
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = np.frombuffer(data, dtype = dtype, count = size // dtype.itemsize, offset = offset).reshape(shape)
+        offset += size + (-size % 8)
+
+    with gc_paused():
+        sketch_from_arrays(arrays, geometry, constraints)
+
+def save_sketch(path, geometry, constraints):
+    # the format follows the extension; the file is replaced only when complete, a loaded binary sketch
+    # still maps the old one and must not see it truncated
+    temporary_path = path + '.part'
+
+    if os.path.splitext(path)[1] == SKETCH_BINARY_EXTENSION:
+        save_sketch_binary(temporary_path, geometry, constraints)
+    else:
+        with open(temporary_path, 'w') as file:
+            json.dump(sketch_to_dict(geometry, constraints), file)
+
+    os.replace(temporary_path, path)
+
+def load_sketch(path, geometry, constraints):
+    if os.path.splitext(path)[1] == SKETCH_BINARY_EXTENSION:
+        load_sketch_binary(path, geometry, constraints)
+        return
+
+    with open(path) as file, gc_paused():
+        sketch_from_dict(json.load(file), geometry, constraints)
@@ -0,0 +1,268 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from constraints.constraints import CONSTRAINT_FUNCTION, CONSTRAINT_TYPE
+from geometric_primitives.arc import Arc
+from geometric_primitives.segment import Segment
+
+# gathered columns of an entity: segment -- p1.x, p1.y, p2.x, p2.y; arc -- the same and d
+ENTITY_SIZE = {
+    Segment:    4,
+    Arc:        5,
+}
+
+class Jet:
+    # values of a group (n,) together with their derivatives (n, k) with respect to the k gathered columns
+    def __init__(self, value, gradient):
+        self.value = value
+        self.gradient = gradient
+
+    def __add__(self, other):
+        if isinstance(other, Jet):
+            return Jet(self.value + other.value, self.gradient + other.gradient)
+        return Jet(self.value + other, self.gradient)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Jet(-self.value, -self.gradient)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if isinstance(other, Jet):
+            return Jet(self.value * other.value, self.gradient * other.value[:, None] + other.gradient * self.value[:, None])
+        return Jet(self.value * other, self.gradient * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self * other.inverse() if isinstance(other, Jet) else self * (1 / other)
+
+    def inverse(self):
+        return Jet(1 / self.value, -self.gradient / (self.value ** 2)[:, None])
+
+    def sqrt(self):
+        value = np.sqrt(self.value)
+        # zero is a valid residual (e.g. concentric arcs), its gradient is taken as zero instead of infinity
+        with np.errstate(divide = 'ignore'):
+            factor = np.where(value > 0, 0.5 / value, 0)
+        return Jet(value, self.gradient * factor[:, None])
+
+    def abs(self):
+        return Jet(np.abs(self.value), self.gradient * np.sign(self.value)[:, None])
+
+# the same expressions work on plain arrays (values only) and on jets (values and derivatives)
+
+def sqrt(value):
+    return value.sqrt() if isinstance(value, Jet) else np.sqrt(value)
+
+def absolute(value):
+    return value.abs() if isinstance(value, Jet) else np.abs(value)
+
+# batched versions of constraints/constraint_equations.py; an entity is the list of its gathered columns
+
+def segment_vector(s):
+    return s[2] - s[0], s[3] - s[1]
+
+def norm(x, y):
+    return sqrt(x * x + y * y)
+
+def arc_center(a):
+    vx, vy = segment_vector(a)
+    length = norm(vx, vy)
+    return (a[0] + a[2]) * 0.5 + vy * a[4] / length, (a[1] + a[3]) * 0.5 - vx * a[4] / length
+
+def arc_radius(a):
+    vx, vy = segment_vector(a)
+    return sqrt(0.25 * (vx * vx + vy * vy) + a[4] * a[4])
+
+def parallel(s1, s2):
+    (x1, y1), (x2, y2) = segment_vector(s1), segment_vector(s2)
+    return x1 * y2 - y1 * x2
+
+def perpendicular(s1, s2):
+    (x1, y1), (x2, y2) = segment_vector(s1), segment_vector(s2)
+    return x1 * x2 + y1 * y2
+
+def equal_length(s1, s2):
+    return norm(*segment_vector(s1)) - norm(*segment_vector(s2))
+
+def equal_radius(a1, a2):
+    return arc_radius(a1) - arc_radius(a2)
+
+def segment_length(s, length):
+    return norm(*segment_vector(s)) - length[0]
+
+def arc_length(a, length):
+    return arc_radius(a) - length[0]
+
+def tangency_arc_segment(a, s):
+    cx, cy = arc_center(a)
+    vx, vy = segment_vector(s)
+    return absolute(vx * (cy - s[1]) - vy * (cx - s[0])) / norm(vx, vy) - arc_radius(a)
+
+def tangency_arc_segment_at_end(a, s):
+    # tangency_at_end of constraints/constraint_equations.py, the segment starts at the common end
+    cx, cy = arc_center(a)
+    vx, vy = segment_vector(s)
+    return (vx * (s[0] - cx) + vy * (s[1] - cy)) / norm(vx, vy)
+
+def tangency_arc_arc(a1, a2):
+    (x1, y1), (x2, y2) = arc_center(a1), arc_center(a2)
+    return norm(x2 - x1, y2 - y1) - (arc_radius(a1) + arc_radius(a2))
+
+def concentricity(a1, a2):
+    (x1, y1), (x2, y2) = arc_center(a1), arc_center(a2)
+    return norm(x2 - x1, y2 - y1)
+
+# (constraint type, classes of the entities, arcs first) -> batched residual; a number is a 1-column entity
+BATCHED_FUNCTION = {
+    (CONSTRAINT_TYPE.PARALLELITY,               (Segment, Segment)):    parallel,
+    (CONSTRAINT_TYPE.PERPENDICULARITY,          (Segment, Segment)):    perpendicular,
+    (CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS,    (Segment, Segment)):    equal_length,
+    (CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS,    (Arc, Arc)):            equal_radius,
+    (CONSTRAINT_TYPE.LENGTH,                    (Segment, float)):      segment_length,
+    (CONSTRAINT_TYPE.LENGTH,                    (Arc, float)):          arc_length,
+    (CONSTRAINT_TYPE.TANGENCY,                  (Arc, Segment)):        tangency_arc_segment,
+    (CONSTRAINT_TYPE.TANGENCY,                  (Arc, Arc)):            tangency_arc_arc,
+    (CONSTRAINT_TYPE.CONCENTRICITY,             (Arc, Arc)):            concentricity,
+}
+
+# the same for a segment that has a common end with the arc, gathered with that end first
+END_TANGENCY_FUNCTION = {
+    (Arc, Segment):     tangency_arc_segment_at_end,
+}
+
+class BatchedProblem:
+    # Numeric twin of CompiledProblem for a Component: constraints are grouped by type and classes of
+    # their entities, every group gathers its coordinates from w = x + p with one index array and is
+    # evaluated (with derivatives) by one NumPy expression. No tracing is needed.
+    def __init__(self, component):
+        self.n_vars = len(component.vars)
+
+        def column(source):
+            is_var, index = source
+            return index if is_var else self.n_vars + index
+
+        def entity_columns(entity):
+            columns = [column(source) for point in entity.points() for source in component.point_source[point]]
+            if isinstance(entity, Arc):
+                columns.append(column(component.arc_source[entity]))
+            return columns
+
+        groups = {}
+
+        for i, constraint in enumerate(component.constraints):
+            if CONSTRAINT_FUNCTION[constraint.type] is None:
+                continue
+
+            if constraint.type == CONSTRAINT_TYPE.LENGTH:
+                entities = [constraint.entities[0]]
+                classes = (constraint.entities[0].__class__, float)
+                columns = entity_columns(entities[0]) + [self.n_vars + component.constraint_to_parameter[constraint]]
+            else:
+                entities = sorted(constraint.entities, key = lambda entity: not isinstance(entity, Arc))
+                classes = tuple(entity.__class__ for entity in entities)
+                columns = sum((entity_columns(entity) for entity in entities), [])
+
+            at_end = False
+            if constraint.type == CONSTRAINT_TYPE.TANGENCY and classes in END_TANGENCY_FUNCTION:
+                ends, start, end = [columns[0:2], columns[2:4]], columns[5:7], columns[7:9]
+                if end in ends and not start in ends:
+                    columns = columns[:5] + end + start
+                at_end = columns[5:7] in ends
+
+            groups.setdefault((constraint.type, classes, at_end), []).append((i, columns))
+
+        # group -> (function, sizes of the entities, gathered columns (n, k), rows of the group);
+        # row -> index of its constraint in component.constraints (the problem is shared by equal components)
+        self.groups = []
+        self.row_constraints = []
+
+        for (constraint_type, classes, at_end), members in groups.items():
+            sizes = [ENTITY_SIZE.get(cls, 1) for cls in classes]
+            columns = np.array([columns for _, columns in members], dtype = int)
+            rows = np.arange(len(self.row_constraints), len(self.row_constraints) + len(members))
+            function = END_TANGENCY_FUNCTION[classes] if at_end else BATCHED_FUNCTION[(constraint_type, classes)]
+            self.groups.append((function, np.cumsum([0] + sizes), columns, rows))
+            self.row_constraints += [i for i, _ in members]
+
+        self.n_rows = len(self.row_constraints)
+
+        # sparsity pattern of the jacobian: only the columns that are variables
+        if self.groups:
+            rows = np.concatenate([np.repeat(rows, columns.shape[1]) for _, _, columns, rows in self.groups])
+            columns = np.concatenate([columns.ravel() for _, _, columns, _ in self.groups])
+        else:
+            rows, columns = np.zeros(0, dtype = int), np.zeros(0, dtype = int)
+
+        self.jacobian_mask = columns < self.n_vars
+        self.jacobian_rows, self.jacobian_columns = rows[self.jacobian_mask], columns[self.jacobian_mask]
+
+        # CSR structure of the jacobian, computed once: entry -> position in the data array (duplicates summed)
+        entries = self.jacobian_rows * self.n_vars + self.jacobian_columns
+        unique_entries, self.jacobian_data_index = np.unique(entries, return_inverse = True)
+        self.jacobian_indices = unique_entries % self.n_vars if self.n_vars else unique_entries
+        self.jacobian_indptr = np.searchsorted(unique_entries, np.arange(self.n_rows + 1) * self.n_vars)
+
+        self.active_columns = None
+        if not component.active_point is None:
+            self.active_columns = np.array([column(source) for source in component.point_source[component.active_point]])
+
+    def evaluate(self, x, p, derivatives):
+        w = np.concatenate((np.asarray(x, dtype = float), np.asarray(p, dtype = float)))
+
+        values, gradients = np.zeros(self.n_rows), []
+
+        for function, offsets, columns, rows in self.groups:
+            n, k = columns.shape
+            gathered = w[columns]
+            if derivatives:
+                seeds = np.eye(k)
+                gathered = [Jet(gathered[:, i], np.broadcast_to(seeds[i], (n, k))) for i in range(k)]
+            else:
+                gathered = list(gathered.T)
+            result = function(*[gathered[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)])
+            if derivatives:
+                values[rows] = result.value
+                gradients.append(result.gradient.ravel())
+            else:
+                values[rows] = result
+
+        if not derivatives:
+            return values
+
+        return values, np.concatenate(gradients)[self.jacobian_mask] if gradients else np.zeros(0)
+
+    def objective(self, x, p=()):
+        if self.active_columns is None:
+            return 0.0
+        w = np.concatenate((x, p))
+        return float((w[self.active_columns[0]] - p[0]) ** 2 + (w[self.active_columns[1]] - p[1]) ** 2)
+
+    def objective_gradient(self, x, p=()):
+        gradient = np.zeros(self.n_vars)
+        if self.active_columns is None:
+            return gradient
+        w = np.concatenate((x, p))
+        for column, target in zip(self.active_columns, p[:2]):
+            if column < self.n_vars:
+                gradient[column] += 2 * (w[column] - target)
+        return gradient
+
+    def constraints(self, x, p=()):
+        return self.evaluate(x, p, False)
+
+    def constraints_jacobian_sparse(self, x, p=()):
+        # duplicated (row, column) entries, e.g. a variable shared by two points of a segment, are summed
+        data = np.bincount(self.jacobian_data_index, weights = self.evaluate(x, p, True)[1], minlength = len(self.jacobian_indices))
+        return csr_matrix((data, self.jacobian_indices, self.jacobian_indptr), shape = (self.n_rows, self.n_vars))
+
+    def constraints_jacobian(self, x, p=()):
+        jacobian = np.zeros((self.n_rows, self.n_vars))
+        np.add.at(jacobian, (self.jacobian_rows, self.jacobian_columns), self.evaluate(x, p, True)[1])
+        return jacobian
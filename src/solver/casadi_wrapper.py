@@ -2,110 +2,161 @@ import casadi as ca
 import numpy as np
 from scipy.optimize import OptimizeResult
 
+class CompiledProblem:
+    """
+    CasADi (IPOPT) problem that is traced once and then solved many times.
+
+    `fun(x, p)` and the functions inside `constraints` are called once with symbolic
+    decision variables `x` and symbolic parameters `p` (MX). Everything that may change
+    between two solves of the same problem (targets, dimensions, constants) must come
+    through `p`, the rest is baked into the expression graph.
+    """
+
+    def __init__(self, fun, n_vars, n_params, constraints=(), tol=None, options=None):
+        options = options if options else {}
+
+        self.n_vars = n_vars
+        self.n_params = n_params
+
+        x = ca.MX.sym('x', n_vars)
+        p = ca.MX.sym('p', n_params)
+
+        # Construct the Objective Function (Tracing)
+        obj = fun(x, p)
+        if not isinstance(obj, ca.MX):
+            obj = ca.MX(obj)
+
+        # Process Constraints
+        # Scipy accepts either a dict or a list of dicts
+        if isinstance(constraints, dict):
+            constraints = [constraints]
+
+        g, lbg, ubg = [], [], []
+
+        for constraint in constraints:
+            c_type = constraint.get('type') # 'eq' or 'ineq'
+            c_fun = constraint.get('fun')
+
+            if c_fun is None:
+                continue
+
+            for r in c_fun(x, p):
+                g.append(r)
+                lbg.append(0.0)
+                ubg.append(0.0 if c_type == 'eq' else np.inf)
+
+        self.lbg = np.array(lbg)
+        self.ubg = np.array(ubg)
+
+        g = ca.vertcat(*g)
+
+        # Exact derivatives (AD) for callers that drive their own optimizer, e.g. scipy SLSQP
+        self.objective_function = ca.Function('f', [x, p], [obj]).expand()
+        self.objective_gradient_function = ca.Function('grad_f', [x, p], [ca.gradient(obj, x)]).expand()
+        self.constraints_function = ca.Function('g', [x, p], [g]).expand()
+        self.constraints_jacobian_function = ca.Function('jac_g', [x, p], [ca.jacobian(g, x)]).expand()
+
+        self.nlp = {'x': x, 'p': p, 'f': obj, 'g': g}
+        self.tol = tol
+        self.options = options
+        self.solver = None
+
+    def objective(self, x, p=()):
+        return float(self.objective_function(x, p))
+
+    def objective_gradient(self, x, p=()):
+        return np.array(self.objective_gradient_function(x, p)).flatten()
+
+    def constraints(self, x, p=()):
+        return np.array(self.constraints_function(x, p)).flatten()
+
+    def constraints_jacobian(self, x, p=()):
+        return np.array(self.constraints_jacobian_function(x, p)).reshape(len(self.lbg), self.n_vars)
+
+    def create_solver(self):
+        verbose = self.options.get('disp', False)
+
+        # Solver Setup (IPOPT)
+        s_opts = {
+            "max_iter": self.options.get('maxiter', 100),
+            "tol": self.tol if self.tol else 1e-4,
+            "acceptable_tol": 1e-3,
+            "print_level": 5 if verbose else 0, # 0 - silent
+            "sb": "yes" # Suppress banner
+        }
+
+        p_opts = {
+            "expand": True,
+            "print_time": verbose,
+            "error_on_fail": False,
+            "ipopt": s_opts,
+        }
+
+        return ca.nlpsol('solver', 'ipopt', self.nlp, p_opts)
+
+    def solve(self, x0, p=()):
+        x0_arr = np.array(x0, dtype=float).flatten()
+        p_arr = np.array(p, dtype=float).flatten()
+
+        res_x = x0_arr
+        success = False
+        fun_val = 0.0
+        nit = 0
+        nfev = 0
+        ncev = 0
+
+        try:
+            if self.solver is None:
+                self.solver = self.create_solver()
+
+            sol = self.solver(x0=x0_arr, p=p_arr, lbg=self.lbg, ubg=self.ubg)
+            stats = self.solver.stats()
+            # If it didn't converge perfectly, IPOPT still returns the last iterate
+            res_x = np.array(sol['x']).flatten()
+            fun_val = float(sol['f'])
+            success = stats['success']
+            nit = stats.get('iter_count', 0)
+            nfev = stats.get('n_call_nlp_f', 0)
+            ncev = stats.get('n_call_nlp_g', 0)
+            status_msg = "Optimization terminated successfully." if success else "Optimization failed to converge to target tolerance."
+        except Exception:
+            status_msg = "Optimization failed completely."
+
+        # Form the result in Scipy style
+        return OptimizeResult(
+            x = res_x,
+            success = success,
+            status = 0 if success else 1,
+            message = status_msg,
+            fun = fun_val,
+            nit = nit,
+            nfev = nfev,
+            ncev = ncev
+        )
+
 def casadi_minimize(fun, x0, constraints=(), tol=None, options=None):
     """
     Wrapper around CasADi (IPOPT), mimicking the scipy.optimize.minimize interface.
-    
-    Important: The function `fun` and functions inside `constraints` must be written 
-    such that they can accept CasADi symbolic variables (MX). 
+
+    Important: The function `fun` and functions inside `constraints` must be written
+    such that they can accept CasADi symbolic variables (MX).
     This means: use numpy instead of math, avoid if/else statements dependent on x.
+
+    The problem is traced on every call; use CompiledProblem to solve the same problem repeatedly.
     """
-    
-    # Option normalization
-    options = options if options else {}
-    verbose = options.get('disp', False)
-    
-    # Initialize CasADi Opti
-    opti = ca.Opti()
-    
-    # Create variables
-    # x0 must be a flat array
-    x0_arr = np.array(x0, dtype=float).flatten()
-    n_vars = len(x0_arr)
-    
-    x = opti.variable(n_vars)
-    opti.set_initial(x, x0_arr)
-    
-    # Construct the Objective Function (Tracing)
-    # We call the passed function `fun` with symbolic variables `x`
-    try:
-        obj = fun(x)
-        opti.minimize(obj)
-    except Exception as e:
-        print (str(e))
 
-    # Process Constraints
-    # Scipy accepts either a dict or a list of dicts
     if isinstance(constraints, dict):
         constraints = [constraints]
-        
-    for constraint in constraints:
-        c_type = constraint.get('type') # 'eq' or 'ineq'
-        c_fun = constraint.get('fun')
-        
-        if c_fun is None:
-            continue
-            
-        try:
-            # Calculate constraint values (symbolically)
-            res = c_fun(x)
-            
-            # Add to Opti
-            for r in res:
-                if c_type == 'eq':
-                    opti.subject_to(r == 0)
-                elif c_type == 'ineq':
-                    opti.subject_to(r >= 0)
-                    
-        except Exception as e:
-            print (str(e))
-
-    # Solver Setup (IPOPT)
-    s_opts = {
-        "max_iter": options.get('maxiter', 100),
-        "tol": tol if tol else 1e-4,
-        "acceptable_tol": 1e-3,
-        "print_level": 5 if verbose else 0, # 0 - silent
-        "sb": "yes" # Suppress banner
-    }
-
-    p_opts = {
-        "expand": True,
-        "print_time": verbose, 
-        "error_on_fail": True
-    }
-    
-    opti.solver('ipopt', p_opts, s_opts)
-    
-    # Solve
-    res_x = x0_arr
-    success = False
-    status_msg = ""
-    fun_val = 0.0
-    
+
+    # CompiledProblem passes the (empty) parameters vector as the second argument
+    wrapped_constraints = [dict(constraint, fun=lambda x, p, c_fun=constraint.get('fun'): c_fun(x)) for constraint in constraints if constraint.get('fun') is not None]
+
+    x0_arr = np.array(x0, dtype=float).flatten()
+
     try:
-        sol = opti.solve()
-        res_x = sol.value(x)
-        fun_val = sol.value(obj)
-        success = True
-        status_msg = "Optimization terminated successfully."
-    except Exception:
-        # If it didn't converge perfectly, take the "debug" value (last best known)
-        try:
-            res_x = opti.debug.value(x)
-            fun_val = opti.debug.value(obj)
-            status_msg = "Optimization failed to converge to target tolerance."
-        except:
-            status_msg = "Optimization failed completely."
+        problem = CompiledProblem(lambda x, p: fun(x), len(x0_arr), 0, wrapped_constraints, tol, options)
+    except Exception as e:
+        print (str(e))
+        return OptimizeResult(x = x0_arr, success = False, status = 1, message = "Optimization failed completely.", fun = 0.0, nit = 0)
 
-    # Form the result in Scipy style
-    result = OptimizeResult(
-        x = res_x,
-        success = success,
-        status = 0 if success else 1,
-        message = status_msg,
-        fun = fun_val,
-        nit = opti.debug.stats()['iter_count'] if hasattr(opti.debug, 'stats') else 0
-    )
-    
-    return result
\ No newline at end of file
+    return problem.solve(x0_arr)
@@ -0,0 +1,189 @@
+from copy import copy
+from constraints.constraint_equations import tangency_at_end
+from constraints.constraints import CONSTRAINT_FUNCTION, CONSTRAINT_TYPE
+from geometric_primitives.arc import Arc
+from geometric_primitives.point import Point, distance_p2p
+
+# parameters vector layout: [active point target x, y, inputs..., LENGTH values...]
+PARAMETERS_INPUTS_OFFSET = 2
+
+# grid step for the target of the dragged point in the keys of cached solutions
+SOLUTION_CACHE_TARGET_STEP = 0.5
+
+class Component:
+    # Part of the sketch that is solved as a separate problem: some of the solver variables, the constraints
+    # that depend on them and the dragged point if it belongs here. Everything else the constraints read
+    # (fixed values, variables of other parts) comes through the parameters vector as "inputs".
+    #
+    # Sources are indices into the solver's z = vars + values vector.
+    def __init__(self, solver, vars, constraints, active_point):
+        self.vars = vars
+        self.constraints = constraints
+        self.active_point = active_point
+        # where the dragged point is going, set by the solver for every solve
+        self.target = solver.get_target
+
+        # set by the solver: the current values of the variables satisfy the constraints
+        self.solved = False
+
+        var_to_local = {var: i for i, var in enumerate(vars)}
+        input_to_local = {}
+
+        self.inputs = []
+
+        def local_source(source):
+            if source in var_to_local:
+                return (True, var_to_local[source])
+            if not source in input_to_local:
+                input_to_local[source] = len(self.inputs)
+                self.inputs.append(source)
+            return (False, PARAMETERS_INPUTS_OFFSET + input_to_local[source])
+
+        self.point_source = {}
+
+        def add_point(point):
+            if not point in self.point_source:
+                id = solver.point_to_id[point]
+                self.point_source[point] = (local_source(solver.coordinate_source[id]), local_source(solver.coordinate_source[id + 1]))
+
+        # segments and arcs
+        self.entities = []
+        self.entity_to_local = {}
+        self.arc_source = {}
+
+        for constraint in constraints:
+            for entity in constraint.entities:
+                if isinstance(entity, Point):
+                    add_point(entity)
+                elif entity in solver.entity_to_id and not entity in self.entity_to_local:
+                    self.entity_to_local[entity] = len(self.entities)
+                    self.entities.append(entity)
+                    for point in entity.points():
+                        add_point(point)
+                    if isinstance(entity, Arc):
+                        self.arc_source[entity] = local_source(solver.arc_to_var[entity])
+
+        if not active_point is None:
+            add_point(active_point)
+
+        self.ids = tuple(solver.point_to_id[point] for point in self.point_source) + tuple(solver.entity_to_id[arc] for arc in self.arc_source)
+
+        # numeric entities of the constraints (dimensions) are parameters too
+        self.constraint_to_parameter = {}
+        for constraint in constraints:
+            if constraint.type == CONSTRAINT_TYPE.LENGTH:
+                self.constraint_to_parameter[constraint] = PARAMETERS_INPUTS_OFFSET + len(self.inputs) + len(self.constraint_to_parameter)
+
+        self.number_of_parameters = PARAMETERS_INPUTS_OFFSET + len(self.inputs) + len(self.constraint_to_parameter)
+
+        # tangencies of a segment and an arc with a common end -> (arc, the common end, the other end of the segment)
+        self.end_tangency = {}
+        for constraint in constraints:
+            if constraint.type != CONSTRAINT_TYPE.TANGENCY or not all(entity in self.entity_to_local for entity in constraint.entities):
+                continue
+            arcs = [entity for entity in constraint.entities if isinstance(entity, Arc)]
+            if len(arcs) != 1:
+                continue
+            arc, segment = arcs[0], next(entity for entity in constraint.entities if not entity is arcs[0])
+            arc_ends = [self.point_source[point] for point in arc.points()]
+            for point, other_point in ((segment.p1, segment.p2), (segment.p2, segment.p1)):
+                if self.point_source[point] in arc_ends:
+                    self.end_tangency[constraint] = (arc, point, other_point)
+                    break
+
+        self.key = self.structure_key()
+
+    def structure_key(self):
+        # two components with equal keys are traced into the same problem
+        def entity_key(entity):
+            if isinstance(entity, Point):
+                return self.point_source[entity]
+            if entity in self.entity_to_local:
+                return self.entity_to_local[entity]
+            return 'parameter'
+
+        return (
+            len(self.vars),
+            len(self.inputs),
+            tuple((entity.__class__.__name__, tuple(self.point_source[point] for point in entity.points()), self.arc_source.get(entity)) for entity in self.entities),
+            tuple((constraint.type, tuple(entity_key(entity) for entity in constraint.entities)) for constraint in self.constraints),
+            None if self.active_point is None else self.point_source[self.active_point],
+        )
+
+    def parameters(self, z_value):
+        target = [0, 0] if self.active_point is None else list(self.target())
+        lengths = [constraint.entities[1] for constraint in self.constraint_to_parameter]
+        return target + [z_value(i) for i in self.inputs] + lengths
+
+    def solution_key(self, parameters):
+        # converged solutions of the same points and arcs with the same structure, dimensions and inputs (fixed
+        # and frozen coordinates); the target of the dragged point only counts on a grid of the given step. The
+        # solver ids of the points and arcs are in the key: an equal component elsewhere in the sketch must not take
+        # their solution, and the cache must not keep removed entities alive
+        parameters = [float(value) for value in parameters]
+        target = () if self.active_point is None else tuple(round(value / SOLUTION_CACHE_TARGET_STEP) for value in parameters[:PARAMETERS_INPUTS_OFFSET])
+        return (self.key, target, tuple(parameters[PARAMETERS_INPUTS_OFFSET:]), self.ids)
+
+    def signature(self, z_value):
+        # structure and current state; equal signatures mean there is nothing new to solve
+        return (self.key, tuple(z_value(var) for var in self.vars), tuple(self.parameters(z_value)))
+
+    def value_from_vars(self, source, x, p):
+        is_var, index = source
+        return x[index] if is_var else p[index]
+
+    def point_from_vars(self, point, x, p):
+        source_x, source_y = self.point_source[point]
+        return Point(self.value_from_vars(source_x, x, p), self.value_from_vars(source_y, x, p))
+
+    def entities_from_vars(self, x, p):
+        # copies of the entities placed according to x and p; the geometry itself is not touched,
+        # so the same code works for numeric evaluation and for CasADi tracing
+        entities = {}
+
+        for point in self.point_source:
+            entities[point] = self.point_from_vars(point, x, p)
+
+        for entity in self.entities:
+            new_entity = entity.detached() if isinstance(entity, Arc) else copy(entity)
+            new_entity.p1, new_entity.p2 = entities[entity.p1], entities[entity.p2]
+            if isinstance(entity, Arc):
+                new_entity.d = self.value_from_vars(self.arc_source[entity], x, p)
+            entities[entity] = new_entity
+
+        return entities
+
+    def f(self, x, p):
+        result = 0
+
+        if not self.active_point is None:
+            result = distance_p2p(self.point_from_vars(self.active_point, x, p), Point(p[0], p[1])) ** 2
+
+        # print (f'f: {result}')
+
+        return result
+
+    def c(self, x, p):
+        f = []
+
+        entities = self.entities_from_vars(x, p)
+
+        for constraint in self.constraints:
+            if constraint in self.end_tangency:
+                arc, point, other_point = self.end_tangency[constraint]
+                f += tangency_at_end(entities[arc], entities[point], entities[other_point])
+                continue
+
+            function = CONSTRAINT_FUNCTION[constraint.type]
+
+            arguments = [entities.get(entity, entity) for entity in constraint.entities]
+
+            if constraint in self.constraint_to_parameter:
+                arguments[1] = p[self.constraint_to_parameter[constraint]]
+
+            f += function(*arguments)
+
+        # print (f'x: {x}')
+        # print (f'c [{len(f)}]: {f}')
+
+        return f
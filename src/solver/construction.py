@@ -0,0 +1,387 @@
+from collections import deque
+from math import sqrt
+from constraints.constraints import CONSTRAINT_TYPE
+from geometric_primitives.arc import Arc
+from geometric_primitives.segment import Segment
+
+# a construction that needs a root of a negative number beyond this (relative to the squared lengths) fails
+CONSTRUCTION_TOLERANCE = 1e-9
+# lines closer to parallel than this (sine of the angle between them) are not intersected
+CONSTRUCTION_MIN_SINE = 1e-9
+
+class Construction:
+    # Ruler-and-compass plan of a component: starting from its inputs (fixed and frozen coordinates), points
+    # and arc bulges that are determined by known ones alone are placed one at a time in closed form:
+    #
+    #   one unknown coordinate     a distance (LENGTH, or EQUAL_LENGTH with a known segment) or a direction
+    #                              (PARALLELITY/PERPENDICULARITY with a known segment) to a known point
+    #   two unknown coordinates    two distances (circle-circle), a distance and a direction to the same point
+    #                              (polar), two directions (line-line)
+    #   arc with known ends        radius (LENGTH, EQUAL_LENGTH with a known arc) or tangency to a known segment
+    #
+    # Points are handled by their locations, the pairs of sources of their coordinates, so coincident points
+    # are one. The constraints used are satisfied by the placement, the placed variables become inputs of the
+    # rest of the component. Where a construction has two roots the one closer to the current values is taken.
+    #
+    # The plan depends only on the structure, so it is made once per component; place() runs it on values.
+    def __init__(self, component):
+        self.component = component
+
+        # local variables placed by the plan, in order; the constraints it used
+        self.constructed = []
+        self.consumed = set()
+
+        # (kind, target, data...) for place()
+        self.steps = []
+
+        self.known = [False] * len(component.vars)
+
+        self.plan()
+
+        self.remaining = [constraint for constraint in component.constraints if not constraint in self.consumed]
+
+    # planning
+
+    def source_known(self, source):
+        is_var, index = source
+        return not is_var or self.known[index]
+
+    def location_known(self, location):
+        return all(self.source_known(source) for source in location)
+
+    def segment_known(self, segment):
+        point_source = self.component.point_source
+        return self.location_known(point_source[segment.p1]) and self.location_known(point_source[segment.p2])
+
+    def arc_known(self, arc):
+        return self.segment_known(arc) and self.source_known(self.component.arc_source[arc])
+
+    def reference_known(self, reference):
+        kind, entity = reference
+        if kind == 'parameter':
+            return True
+        return self.arc_known(entity) if kind == 'arc' else self.segment_known(entity)
+
+    def collect_facts(self):
+        # location -> [(kind, constraint, other end, reference)], kind is 'distance' or 'direction';
+        # arc -> [(kind, constraint, reference)], kind is 'radius' or 'tangent'
+        component = self.component
+        point_source = component.point_source
+
+        self.locations = list(dict.fromkeys(point_source.values()))
+
+        self.location_facts = {location: [] for location in self.locations}
+        self.arc_facts = {arc: [] for arc in component.arc_source}
+
+        # whatever has to be retried once a location or an arc is known
+        self.dependents = {entity: [] for entity in self.locations + list(component.arc_source)}
+
+        def segment_fact(kind, constraint, segment, reference):
+            if not isinstance(segment, Segment):
+                return
+            ends = (point_source[segment.p1], point_source[segment.p2])
+            for location, other in (ends, ends[::-1]):
+                self.location_facts[location].append((kind, constraint, other, reference))
+                self.dependents[other].append(location)
+            if reference[0] in ('segment', 'parallel', 'perpendicular'):
+                for point in reference[1].points():
+                    self.dependents[point_source[point]] += ends
+
+        def arc_fact(kind, constraint, arc, reference):
+            if not arc in self.arc_facts:
+                return
+            self.arc_facts[arc].append((kind, constraint, reference))
+            if reference[0] != 'parameter':
+                for point in reference[1].points():
+                    self.dependents[point_source[point]].append(arc)
+            if reference[0] == 'arc':
+                self.dependents[reference[1]].append(arc)
+
+        for constraint in component.constraints:
+            entities = constraint.entities
+
+            if constraint.type == CONSTRAINT_TYPE.LENGTH:
+                reference = ('parameter', component.constraint_to_parameter[constraint])
+                if isinstance(entities[0], Arc):
+                    arc_fact('radius', constraint, entities[0], reference)
+                else:
+                    segment_fact('distance', constraint, entities[0], reference)
+
+            elif constraint.type == CONSTRAINT_TYPE.EQUAL_LENGTH_OR_RADIUS and len(entities) == 2:
+                for entity, other in (entities, entities[::-1]):
+                    if isinstance(entity, Arc):
+                        arc_fact('radius', constraint, entity, ('arc', other))
+                    else:
+                        segment_fact('distance', constraint, entity, ('segment', other))
+
+            elif constraint.type in (CONSTRAINT_TYPE.PARALLELITY, CONSTRAINT_TYPE.PERPENDICULARITY) and len(entities) == 2:
+                kind = 'parallel' if constraint.type == CONSTRAINT_TYPE.PARALLELITY else 'perpendicular'
+                for entity, other in (entities, entities[::-1]):
+                    segment_fact('direction', constraint, entity, (kind, other))
+
+            elif constraint.type == CONSTRAINT_TYPE.TANGENCY and len(entities) == 2:
+                for entity, other in (entities, entities[::-1]):
+                    if isinstance(entity, Arc) and isinstance(other, Segment):
+                        arc_fact('tangent', constraint, entity, ('line', other))
+
+        for arc in component.arc_source:
+            for point in arc.points():
+                self.dependents[point_source[point]].append(arc)
+
+        self.var_arc = {source[1]: arc for arc, source in component.arc_source.items() if source[0]}
+
+        # locations sharing a variable (coordinate classes)
+        self.var_locations = {}
+        for location in self.locations:
+            for is_var, index in location:
+                if is_var:
+                    self.var_locations.setdefault(index, []).append(location)
+
+    def plan(self):
+        component = self.component
+
+        self.collect_facts()
+
+        queue = deque(self.locations + list(component.arc_source))
+        queued = set(queue)
+
+        while queue:
+            entity = queue.popleft()
+            queued.discard(entity)
+
+            placed = self.plan_arc(entity) if isinstance(entity, Arc) else self.plan_location(entity)
+
+            for index in placed:
+                retry = [self.var_arc[index]] if index in self.var_arc else []
+                for location in self.var_locations.get(index, ()):
+                    retry.append(location)
+                    if self.location_known(location):
+                        retry += self.dependents[location]
+                for arc in list(retry):
+                    if isinstance(arc, Arc) and self.arc_known(arc):
+                        retry += self.dependents[arc]
+                for other in retry:
+                    if not other in queued:
+                        queued.add(other)
+                        queue.append(other)
+
+    def usable(self, facts):
+        return [fact for fact in facts if not fact[1] in self.consumed and self.reference_known(fact[-1]) \
+            and (len(fact) == 3 or self.location_known(fact[2]))]
+
+    def place_step(self, step, indices, constraints):
+        self.steps.append(step)
+        for index in indices:
+            self.known[index] = True
+            self.constructed.append(index)
+        self.consumed.update(constraints)
+        return indices
+
+    def plan_location(self, location):
+        unknown = [offset for offset, source in enumerate(location) if not self.source_known(source)]
+
+        if not unknown:
+            return []
+
+        indices = [location[offset][1] for offset in unknown]
+        facts = self.usable(self.location_facts[location])
+        distances = [fact for fact in facts if fact[0] == 'distance']
+        directions = [fact for fact in facts if fact[0] == 'direction']
+
+        if len(unknown) == 1:
+            if distances:
+                kind, constraint, other, reference = distances[0]
+                return self.place_step(('distance_1d', location, unknown[0], other, reference), indices, [constraint])
+            if directions:
+                kind, constraint, other, reference = directions[0]
+                return self.place_step(('direction_1d', location, unknown[0], other, reference), indices, [constraint])
+            return []
+
+        for distance in distances:
+            for direction in directions:
+                if distance[2] == direction[2]:
+                    return self.place_step(('polar', location, distance[2], distance[3], direction[3]), indices, [distance[1], direction[1]])
+
+        for first, second in zip(distances, distances[1:]):
+            if first[2] != second[2]:
+                return self.place_step(('circle_circle', location, first[2], first[3], second[2], second[3]), indices, [first[1], second[1]])
+
+        for first, second in zip(directions, directions[1:]):
+            if first[2] != second[2]:
+                return self.place_step(('line_line', location, first[2], first[3], second[2], second[3]), indices, [first[1], second[1]])
+
+        return []
+
+    def plan_arc(self, arc):
+        source = self.component.arc_source[arc]
+
+        if self.source_known(source) or not self.segment_known(arc):
+            return []
+
+        for kind, constraint, reference in self.usable(self.arc_facts[arc]):
+            return self.place_step((kind, arc, reference), [source[1]], [constraint])
+
+        return []
+
+    # placement
+
+    def place(self, x, p):
+        # values of the variables with the plan applied, None if a construction has no (real) solution
+        x = [float(value) for value in x]
+        p = [float(value) for value in p]
+
+        component = self.component
+
+        def value(source):
+            is_var, index = source
+            return x[index] if is_var else p[index]
+
+        def point(location):
+            return [value(source) for source in location]
+
+        def set_point(location, coordinates):
+            for (is_var, index), coordinate in zip(location, coordinates):
+                if is_var:
+                    x[index] = coordinate
+
+        def entity_point(point):
+            return [value(source) for source in component.point_source[point]]
+
+        def length(reference):
+            kind, entity = reference
+            if kind == 'parameter':
+                return p[entity]
+            if kind == 'arc':
+                return arc_radius(entity)
+            (x1, y1), (x2, y2) = entity_point(entity.p1), entity_point(entity.p2)
+            return sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+
+        def direction(reference):
+            kind, segment = reference
+            (x1, y1), (x2, y2) = entity_point(segment.p1), entity_point(segment.p2)
+            norm = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            if norm == 0:
+                return None
+            ux, uy = (x2 - x1) / norm, (y2 - y1) / norm
+            return (ux, uy) if kind == 'parallel' else (-uy, ux)
+
+        def chord(arc):
+            # middle of p1-p2, unit normal (the one of Arc.get_n) and half of the length
+            (x1, y1), (x2, y2) = entity_point(arc.p1), entity_point(arc.p2)
+            half = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2) / 2
+            if half == 0:
+                return None
+            return ((x1 + x2) / 2, (y1 + y2) / 2), ((y2 - y1) / (2 * half), -(x2 - x1) / (2 * half)), half
+
+        def arc_radius(arc):
+            _, _, half = chord(arc)
+            return sqrt(half ** 2 + value(component.arc_source[arc]) ** 2)
+
+        def nearest(candidates, current):
+            return min(candidates, key = lambda candidate: sum((a - b) ** 2 for a, b in zip(candidate, current)))
+
+        def root(value, scale):
+            # square root of a value that may be negative by rounding
+            if value < -CONSTRUCTION_TOLERANCE * max(scale, 1):
+                return None
+            return sqrt(max(value, 0))
+
+        for step in self.steps:
+            kind, target = step[0], step[1]
+
+            if kind == 'distance_1d':
+                _, _, offset, other, reference = step
+                current, center, radius = point(target), point(other), length(reference)
+                known = 1 - offset
+                h = root(radius ** 2 - (current[known] - center[known]) ** 2, radius ** 2)
+                if h is None:
+                    return None
+                coordinates = list(current)
+                coordinates[offset] = nearest([(center[offset] + h,), (center[offset] - h,)], (current[offset],))[0]
+                set_point(target, coordinates)
+
+            elif kind == 'direction_1d':
+                _, _, offset, other, reference = step
+                current, origin, u = point(target), point(other), direction(reference)
+                known = 1 - offset
+                if u is None or abs(u[known]) < CONSTRUCTION_MIN_SINE:
+                    return None
+                t = (current[known] - origin[known]) / u[known]
+                coordinates = list(current)
+                coordinates[offset] = origin[offset] + t * u[offset]
+                set_point(target, coordinates)
+
+            elif kind == 'polar':
+                _, _, other, distance_reference, direction_reference = step
+                current, origin, radius, u = point(target), point(other), length(distance_reference), direction(direction_reference)
+                if u is None:
+                    return None
+                set_point(target, nearest([(origin[0] + radius * u[0], origin[1] + radius * u[1]), \
+                    (origin[0] - radius * u[0], origin[1] - radius * u[1])], current))
+
+            elif kind == 'circle_circle':
+                _, _, other1, reference1, other2, reference2 = step
+                current, (x1, y1), (x2, y2) = point(target), point(other1), point(other2)
+                r1, r2 = length(reference1), length(reference2)
+                d = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+                if d == 0:
+                    return None
+                a = (r1 ** 2 - r2 ** 2 + d ** 2) / (2 * d)
+                h = root(r1 ** 2 - a ** 2, r1 ** 2)
+                if h is None:
+                    return None
+                mx, my = x1 + a * (x2 - x1) / d, y1 + a * (y2 - y1) / d
+                nx, ny = -(y2 - y1) / d, (x2 - x1) / d
+                set_point(target, nearest([(mx + h * nx, my + h * ny), (mx - h * nx, my - h * ny)], current))
+
+            elif kind == 'line_line':
+                _, _, other1, reference1, other2, reference2 = step
+                (x1, y1), (x2, y2) = point(other1), point(other2)
+                u, v = direction(reference1), direction(reference2)
+                if u is None or v is None:
+                    return None
+                denominator = u[0] * v[1] - u[1] * v[0]
+                if abs(denominator) < CONSTRUCTION_MIN_SINE:
+                    return None
+                t = ((x2 - x1) * v[1] - (y2 - y1) * v[0]) / denominator
+                set_point(target, (x1 + t * u[0], y1 + t * u[1]))
+
+            elif kind == 'radius':
+                _, _, reference = step
+                geometry = chord(target)
+                if geometry is None:
+                    return None
+                _, _, half = geometry
+                radius = length(reference)
+                d = root(radius ** 2 - half ** 2, radius ** 2)
+                if d is None:
+                    return None
+                source = component.arc_source[target]
+                x[source[1]] = nearest([(d,), (-d,)], (value(source),))[0]
+
+            elif kind == 'tangent':
+                _, _, reference = step
+                geometry = chord(target)
+                (x1, y1), (x2, y2) = entity_point(reference[1].p1), entity_point(reference[1].p2)
+                norm = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+                if geometry is None or norm == 0:
+                    return None
+                (mx, my), (nx, ny), half = geometry
+                # signed distance of the center mid + n d from the line is s0 + s1 d, it has to equal the radius
+                # sqrt(half^2 + d^2): (s1^2 - 1) d^2 + 2 s0 s1 d + s0^2 - half^2 = 0
+                lx, ly = -(y2 - y1) / norm, (x2 - x1) / norm
+                s0, s1 = (mx - x1) * lx + (my - y1) * ly, nx * lx + ny * ly
+                a, b, c = s1 ** 2 - 1, 2 * s0 * s1, s0 ** 2 - half ** 2
+                if abs(a) < CONSTRUCTION_MIN_SINE:
+                    if abs(b) < CONSTRUCTION_MIN_SINE:
+                        return None
+                    roots = [-c / b]
+                else:
+                    discriminant = root(b ** 2 - 4 * a * c, b ** 2 + abs(4 * a * c))
+                    if discriminant is None:
+                        return None
+                    roots = [(-b + discriminant) / (2 * a), (-b - discriminant) / (2 * a)]
+                source = component.arc_source[target]
+                x[source[1]] = nearest([(d,) for d in roots], (value(source),))[0]
+
+        return x
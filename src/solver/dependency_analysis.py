@@ -0,0 +1,438 @@
+from collections import deque
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import splu
+from solver.batched_problem import BatchedProblem
+from solver.disjoint_set import DisjointSet
+from constraints.constraints import CONSTRAINT_FUNCTION, CONSTRAINT_TYPE, SUBSTITUTION_OFFSETS
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+
+# relative size of the part of a (normalized) jacobian row that is not spanned by the rows before it
+DEPENDENCY_TOLERANCE = 1e-8
+# jacobian rows with a smaller norm do not depend on the variables at all
+ZERO_ROW_TOLERANCE = 1e-12
+# relative size of the random step used to tell identically zero jacobian rows from degenerate ones
+PERTURBATION = 1e-3
+# linearized residual (in coordinate units) that a dependent constraint may have and still be only redundant
+CONFLICT_TOLERANCE = 1e-6
+# smallest pivot of the factorization of B B^T, the squared distance of a row of B from the rows eliminated before
+# it; rows closer to dependent than this are not factorized, their component is reduced row by row instead
+PIVOT_TOLERANCE = 1e-8
+# largest product of the factorized rows with the remainder of a row projected on them
+ORTHOGONALITY_TOLERANCE = 1e-10
+
+def row_norms(matrix):
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis = 1)).ravel())
+
+class RowSpace:
+    # Span of normalized jacobian rows. The rows known up front (B) are factorized once, a sparse symmetric LU of
+    # B B^T, the rows added later are kept as a dense orthonormal basis of what they add to the span of B. A row is
+    # projected with one solve (and one step of refinement) and a product with the dense basis, and written back
+    # as a combination of the rows. Dependent rows in B would make the combinations ambiguous, such B raises
+    # RuntimeError.
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.factor = None
+
+        if rows.shape[0]:
+            self.factor = splu((rows @ rows.T).tocsc(), permc_spec = 'MMD_AT_PLUS_A', diag_pivot_thresh = 0, options = dict(SymmetricMode = True))
+            if np.min(np.abs(self.factor.U.diagonal())) < PIVOT_TOLERANCE:
+                raise RuntimeError('dependent rows')
+
+        # added rows: remainders after the projection on B, their coefficients over B, orthonormal basis
+        self.added_remainders, self.added_coefficients = [], []
+        self.basis = np.empty((0, columns))
+
+    def copy(self):
+        # the factorization is shared, the added rows are not
+        other = RowSpace.__new__(RowSpace)
+        other.rows, other.factor = self.rows, self.factor
+        other.added_remainders, other.added_coefficients, other.basis = [], [], self.basis[:0]
+        return other
+
+    def project(self, row):
+        # (remainder of the row after the projection on B, its coefficients over B, remainder after the projection
+        # on the whole span); None if the projection on B is not accurate
+        coefficients, remainder = np.zeros(self.rows.shape[0]), row
+
+        if not self.factor is None:
+            for _ in range(2):
+                coefficients = coefficients + self.factor.solve(self.rows @ remainder)
+                remainder = row - self.rows.T @ coefficients
+            if not np.all(np.isfinite(coefficients)) or np.linalg.norm(self.rows @ remainder) > ORTHOGONALITY_TOLERANCE:
+                return None
+
+        # classical Gram-Schmidt, twice for the orthogonality of the basis
+        rest = remainder.copy()
+        for _ in range(2):
+            rest -= (self.basis @ rest) @ self.basis
+
+        return remainder, coefficients, rest
+
+    def add(self, remainder, coefficients, rest):
+        self.added_remainders.append(remainder)
+        self.added_coefficients.append(coefficients)
+        self.basis = np.vstack((self.basis, rest / np.linalg.norm(rest)))
+
+    def combination(self, remainder, coefficients):
+        # coefficients of a row in the span over the rows of B and over the added rows
+        if not self.added_remainders:
+            return coefficients, np.zeros(0)
+        added = np.linalg.lstsq(np.array(self.added_remainders).T, remainder, rcond = None)[0]
+        return coefficients - added @ np.array(self.added_coefficients), added
+
+class DependencyAnalysis:
+    # Numeric rank of the constraint jacobian at the current values of the variables, component by component.
+    # Rows go in the order of the sketch's constraints, so a constraint is dependent if its row is a linear
+    # combination of the rows of the constraints added before it. The combination names the minimal dependent
+    # set (the constraint and the earlier ones with non-zero coefficients). A dependent constraint is
+    # conflicting if the same combination of the residuals does not vanish, i.e. the linearized equations
+    # have no solution, and redundant otherwise.
+    #
+    # Every component jacobian is reduced densely by Gram-Schmidt over its rows, a product with the basis per row.
+    # Rows that are not finite are left out. So are rows that vanish only at the current point: the tangency
+    # of two arcs with a common end has a zero gradient when satisfied (distance of the centers is at its
+    # maximum), while PARALLELITY of two horizontal segments does not depend on the variables anywhere. The
+    # two are told apart by the jacobian at a randomly perturbed point.
+    #
+    # Constraints solved by substitution have no rows. They are checked before the layout is built, by merging
+    # the coordinate classes again in the order of the constraints and remembering which constraint merged
+    # what: a merge of coordinates that are equal already is redundant, a merge of two fixed classes is
+    # conflicting if their values differ. A merge (or a fix) can also leave the row of an earlier constraint
+    # constant, as in PARALLELITY of two segments that became horizontal or LENGTH of a segment that became
+    # fixed. Such a row is named together with the substitution constraints that made it constant. When only
+    # some constraints are checked, only the merges of the classes their rows (and the rows of the constraints
+    # sharing these classes) depend on are replayed; the classes come from the solver.
+    def __init__(self, solver, constraints = None):
+        self.solver = solver
+
+        # [(dependent constraint, [constraints of the minimal dependent set], conflicting)]
+        self.dependencies = []
+
+        constraints = None if constraints is None else set(constraints)
+
+        # constraints with constant rows, accounted for by the substitution and left out of the rank
+        self.constant_constraints = set()
+
+        if not constraints is None:
+            solver.update_substitution()
+
+        self.analyze_substitution(constraints)
+
+        # the layout of a merge of two fixed classes moves one of the fixed points
+        if not any(conflicting and CONSTRAINT_FUNCTION[constraint.type] is None for constraint, _, conflicting in self.dependencies):
+            solver.update_layout()
+
+            for component in solver.components:
+                if constraints is None or any(constraint in constraints for constraint in component.constraints):
+                    self.analyze_component(component, constraints)
+
+        self.redundant_constraints = [constraint for constraint, _, conflicting in self.dependencies if not conflicting]
+        self.conflicting_constraints = [constraint for constraint, _, conflicting in self.dependencies if conflicting]
+
+    def analyze_substitution(self, constraints):
+        sketch_constraints = self.solver.constraints
+
+        # coordinate ids: 2 * i is x of the i-th point seen, 2 * i + 1 is y
+        point_to_id, id_to_point = {}, []
+        classes = DisjointSet()
+        # id -> [(id, constraint that merged the two)]
+        edges = {}
+        # class -> its ids, and class -> (FIXED constraint, id of the fixed point) for the fixed classes
+        members, fixes = {}, {}
+
+        def get_id(point):
+            if not point in point_to_id:
+                point_to_id[point] = 2 * len(id_to_point)
+                id_to_point.append(point)
+                for _ in range(2):
+                    id = classes.add()
+                    members[id] = [id]
+            return point_to_id[point]
+
+        def value(id):
+            point = id_to_point[id // 2]
+            return point.y if id % 2 else point.x
+
+        def merged_by(id1, id2):
+            # constraints on a path of merges between two ids of a class
+            previous = {id1: None}
+            queue = deque([id1])
+            while queue and not id2 in previous:
+                id = queue.popleft()
+                for other, constraint in edges.get(id, ()):
+                    if not other in previous:
+                        previous[other] = (id, constraint)
+                        queue.append(other)
+            path, id = [], id2
+            while not previous[id] is None:
+                id, constraint = previous[id]
+                path.append(constraint)
+            return path
+
+        def fixed_by(id):
+            constraint, fixed_id = fixes[classes.find(id)]
+            return [constraint] + merged_by(id, fixed_id)
+
+        def merge(id1, id2, constraint):
+            edges.setdefault(id1, []).append((id2, constraint))
+            edges.setdefault(id2, []).append((id1, constraint))
+            root1, root2 = classes.find(id1), classes.find(id2)
+            if root1 == root2:
+                return
+            root = classes.union(root1, root2)
+            other = root2 if root == root1 else root1
+            members[root] += members.pop(other)
+            fix = fixes.pop(other, None)
+            if not root in fixes and not fix is None:
+                fixes[root] = fix
+
+        def fixed_point(point):
+            # the point at the values of its fixed classes
+            id = get_id(point)
+            return Point(*(value(fixes[classes.find(id + offset)][1]) for offset in range(2)))
+
+        def constant_row(constraint):
+            # (substitution constraints that make the row of the constraint constant, conflicting) or None
+            entities = [entity for entity in constraint.entities if isinstance(entity, (Point, Segment))]
+            if len(entities) != sum(hasattr(entity, 'points') for entity in constraint.entities):
+                return None
+
+            ids = [get_id(point) + offset for entity in entities for point in entity.points() for offset in range(2)]
+            if all(classes.find(id) in fixes for id in ids):
+                fixed_entities = [fixed_point(entity) if isinstance(entity, Point) else
+                                  Segment(fixed_point(entity.p1), fixed_point(entity.p2)) if isinstance(entity, Segment) else entity
+                                  for entity in constraint.entities]
+                residual = np.max(np.abs(CONSTRAINT_FUNCTION[constraint.type](*fixed_entities)))
+                return [fixing for id in ids for fixing in fixed_by(id)], bool(residual > CONFLICT_TOLERANCE)
+
+            if constraint.type in (CONSTRAINT_TYPE.PARALLELITY, CONSTRAINT_TYPE.PERPENDICULARITY) and len(entities) == 2:
+                # offsets of the coordinates equal at both ends: 1 for a horizontal segment, 0 for a vertical one
+                directions = [[offset for offset in range(2) if classes.find(get_id(segment.p1) + offset) == classes.find(get_id(segment.p2) + offset)]
+                              for segment in entities]
+                for offset1 in directions[0]:
+                    for offset2 in directions[1]:
+                        if (offset1 == offset2) == (constraint.type == CONSTRAINT_TYPE.PARALLELITY):
+                            return merged_by(get_id(entities[0].p1) + offset1, get_id(entities[0].p2) + offset1) \
+                                + merged_by(get_id(entities[1].p1) + offset2, get_id(entities[1].p2) + offset2), False
+
+            return None
+
+        def touched_constraints(ids):
+            # constraints on the points of the classes of the given ids
+            touched = {}
+            for id in ids:
+                for offset in range(2):
+                    for member in members[classes.find(id + offset)]:
+                        touched.update(point_constraints[id_to_point[member // 2]])
+            return touched
+
+        position = {constraint: i for i, constraint in enumerate(sketch_constraints)}
+
+        # point -> constraints on it or on an entity it belongs to
+        point_constraints = {}
+        for constraint in sketch_constraints:
+            for entity in constraint.entities:
+                for point in entity.points() if hasattr(entity, 'points') else ():
+                    point_constraints.setdefault(point, {})[constraint] = None
+
+        replayed = sketch_constraints if constraints is None else self.replayed_constraints(constraints, point_constraints, position)
+        # checked constraints with rows, which a later merge can still leave constant
+        checked_rows = [constraint for constraint in replayed if not constraints is None and constraint in constraints and not CONSTRAINT_FUNCTION[constraint.type] is None]
+
+        for constraint in replayed:
+            i = position[constraint]
+            checked = constraints is None or constraint in constraints
+
+            # (constraints the constraint depends on, conflicting)
+            found = None
+
+            offsets = SUBSTITUTION_OFFSETS.get(constraint.type)
+            points = [point for entity in constraint.entities if hasattr(entity, 'points') for point in entity.points()]
+            ids = [get_id(point) for point in points]
+
+            substituting = not offsets is None or constraint.type == CONSTRAINT_TYPE.FIXED
+
+            if checked and substituting and not constraints is None:
+                # the earlier rows these classes made constant, which the full replay would have found by now
+                for other in touched_constraints(ids):
+                    if position[other] < i and not other in self.constant_constraints and not CONSTRAINT_FUNCTION[other.type] is None \
+                        and not constant_row(other) is None:
+                        self.constant_constraints.add(other)
+
+            if not offsets is None:
+                # redundant if every merge is, conflicting if any merge is; the merges of the constraints that are
+                # not checked are not explained
+                merges = []
+                for offset in offsets:
+                    for id in ids[1:]:
+                        id1, id2 = ids[0] + offset, id + offset
+                        if not checked:
+                            merges.append(None)
+                        elif classes.find(id1) == classes.find(id2):
+                            merges.append((merged_by(id1, id2), False))
+                        elif classes.find(id1) in fixes and classes.find(id2) in fixes:
+                            values = [value(fixes[classes.find(id)][1]) for id in (id1, id2)]
+                            merges.append((fixed_by(id1) + fixed_by(id2), bool(abs(values[0] - values[1]) > CONFLICT_TOLERANCE)))
+                        else:
+                            merges.append(None)
+                        merge(id1, id2, constraint)
+
+                conflicts = [result for result in merges if not result is None and result[1]]
+                if conflicts:
+                    found = conflicts[0]
+                elif merges and not None in merges:
+                    found = [dependency for result in merges for dependency in result[0]], False
+
+            elif constraint.type == CONSTRAINT_TYPE.FIXED:
+                for id in ids:
+                    if checked and found is None and all(classes.find(id + offset) in fixes for offset in range(2)):
+                        found = fixed_by(id) + fixed_by(id + 1), False
+                    for offset in range(2):
+                        fixes.setdefault(classes.find(id + offset), (constraint, id + offset))
+
+            elif not CONSTRAINT_FUNCTION[constraint.type] is None:
+                found = constant_row(constraint)
+                if not found is None:
+                    self.constant_constraints.add(constraint)
+
+            if not checked and substituting:
+                # checked constraints whose rows the merge or fix left constant, as in the full replay (unexplained)
+                for other in checked_rows:
+                    if position[other] < i and not other in self.constant_constraints and not constant_row(other) is None:
+                        self.constant_constraints.add(other)
+
+            # earlier constraints on the points of the merged or fixed classes whose rows became constant
+            touched = touched_constraints(ids) if checked and substituting else {}
+
+            for other in touched:
+                if position[other] > i or other in self.constant_constraints or CONSTRAINT_FUNCTION[other.type] is None:
+                    continue
+                row = constant_row(other)
+                if row is None:
+                    continue
+                self.constant_constraints.add(other)
+                if found is None:
+                    found = [other] + row[0], row[1]
+
+            if not found is None and checked:
+                self.dependencies.append((constraint, list(dict.fromkeys([constraint] + found[0])), found[1]))
+
+    def replayed_constraints(self, constraints, point_constraints, position):
+        # the checked constraints of the sketch and the substitution constraints on the classes of their points and
+        # of the points of the constraints on these classes, in the order of the sketch
+        def points_of(constraints):
+            return [point for constraint in constraints for entity in constraint.entities if hasattr(entity, 'points') for point in entity.points()]
+
+        replayed = {constraint for constraint in constraints if constraint in position}
+
+        points = self.solver.class_points(points_of(replayed))
+        near = {other for point in points for other in point_constraints.get(point, ())}
+
+        for point in self.solver.class_points(points_of(near)):
+            for other in point_constraints.get(point, ()):
+                if other.type in SUBSTITUTION_OFFSETS or other.type == CONSTRAINT_TYPE.FIXED:
+                    replayed.add(other)
+
+        return sorted(replayed, key = position.__getitem__)
+
+    def analyze_component(self, component, constraints):
+        problem = BatchedProblem(component)
+
+        x, p = self.solver.x[component.vars], component.parameters(self.solver.z_value)
+
+        jacobian = problem.constraints_jacobian_sparse(x, p)
+        residuals = problem.constraints(x, p)
+        norms = row_norms(jacobian)
+
+        # rows in the order of the constraints, without the ones that are not finite or constant
+        rows = [(row, component.constraints[problem.row_constraints[row]]) for row in np.argsort(problem.row_constraints, kind = 'stable')]
+        rows = [(row, constraint) for row, constraint in rows if not constraint in self.constant_constraints and np.isfinite(residuals[row]) \
+            and np.all(np.isfinite(jacobian.data[jacobian.indptr[row]:jacobian.indptr[row + 1]]))]
+
+        # the rows before the first checked one are factorized together, the rest is reduced row by row against them
+        first = next((i for i, (_, constraint) in enumerate(rows) if constraints is None or constraint in constraints), len(rows))
+        base = [(row, constraint) for row, constraint in rows[:first] if norms[row] >= ZERO_ROW_TOLERANCE]
+
+        dependencies = None
+
+        space = self.row_space(component, jacobian, norms, [row for row, _ in base], x, p)
+        if not space is None:
+            dependencies = self.reduce_rows(problem, jacobian, residuals, norms, space, base, rows[first:], constraints, x, p)
+
+        if dependencies is None:
+            # the rows before are dependent themselves (e.g. a loaded sketch with a redundant constraint),
+            # all the rows are reduced one by one
+            space = RowSpace(jacobian[[]], jacobian.shape[1])
+            dependencies = self.reduce_rows(problem, jacobian, residuals, norms, space, [], rows, constraints, x, p)
+
+        self.dependencies += dependencies
+
+    def row_space(self, component, jacobian, norms, rows, x, p):
+        # factorization of the given rows, kept with the component while the rows and the values stay the same
+        # (components are replaced when the topology changes); None if the rows are dependent
+        key = (tuple(rows), x.tobytes(), tuple(p))
+        cached = getattr(component, 'dependency_rows', None)
+
+        if cached is None or cached[0] != key:
+            try:
+                space = RowSpace(csr_matrix(jacobian[rows].multiply(1 / norms[rows][:, None])), jacobian.shape[1])
+            except RuntimeError:
+                space = None
+            cached = component.dependency_rows = (key, space)
+
+        return None if cached[1] is None else cached[1].copy()
+
+    def reduce_rows(self, problem, jacobian, residuals, norms, space, base, rows, constraints, x, p):
+        # [(dependent constraint, dependent set, conflicting)] of the rows, every one against the base rows (in
+        # space) and the independent rows before it; None if the base rows turn out to be dependent
+        dependencies = []
+
+        basis_residuals = np.array([residuals[row] / norms[row] for row, _ in base])
+        basis_constraints = [constraint for _, constraint in base]
+        added_residuals, added_constraints = [], []
+
+        perturbed_norms = None
+
+        for row, constraint in rows:
+            residual, norm = residuals[row], norms[row]
+
+            if norm < ZERO_ROW_TOLERANCE:
+                if perturbed_norms is None:
+                    random = np.random.default_rng(0)
+                    perturbed_norms = row_norms(problem.constraints_jacobian_sparse(x + PERTURBATION * (1 + np.abs(x)) * random.standard_normal(len(x)), p))
+                if perturbed_norms[row] >= ZERO_ROW_TOLERANCE:
+                    continue
+                dependent_set, conflicting = [], bool(abs(residual) > CONFLICT_TOLERANCE)
+            else:
+                gradient, residual = jacobian[row].toarray().ravel() / norm, residual / norm
+
+                projection = space.project(gradient)
+                if projection is None:
+                    return None
+
+                remainder, coefficients, rest = projection
+
+                if np.linalg.norm(rest) > DEPENDENCY_TOLERANCE:
+                    space.add(remainder, coefficients, rest)
+                    added_residuals.append(residual)
+                    added_constraints.append(constraint)
+                    continue
+
+                coefficients, added = space.combination(remainder, coefficients)
+
+                dependent_set = [basis_constraint for basis_constraint, coefficient in zip(basis_constraints + added_constraints, np.concatenate((coefficients, added))) \
+                    if abs(coefficient) > DEPENDENCY_TOLERANCE ** 0.5]
+                conflicting = bool(abs(residual - np.dot(coefficients, basis_residuals) - np.dot(added, added_residuals)) > CONFLICT_TOLERANCE)
+
+            if constraints is None or constraint in constraints:
+                dependencies.append((constraint, [constraint] + dependent_set, conflicting))
+
+        return dependencies
+
+    def dependent_set(self, constraint):
+        for dependent_constraint, dependent_set, _ in self.dependencies:
+            if dependent_constraint is constraint:
+                return dependent_set
+        return None
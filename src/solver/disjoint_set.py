@@ -0,0 +1,46 @@
+class DisjointSet:
+    # union-find over integer ids with path compression and union by size
+    def __init__(self, size = 0):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self):
+        id = len(self.parent)
+        self.parent.append(id)
+        self.size.append(1)
+        return id
+
+    def find(self, id):
+        root = id
+        while self.parent[root] != root:
+            root = self.parent[root]
+
+        while self.parent[id] != root:
+            self.parent[id], id = root, self.parent[id]
+
+        return root
+
+    def union(self, id1, id2):
+        root1, root2 = self.find(id1), self.find(id2)
+
+        if root1 == root2:
+            return root1
+
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+
+        return root1
+
+    def classes(self):
+        classes = {}
+
+        for id in range(len(self.parent)):
+            classes.setdefault(self.find(id), []).append(id)
+
+        return classes
@@ -0,0 +1,96 @@
+from collections import deque
+from contextlib import contextmanager
+import json
+import time
+import numpy as np
+
+# number of last solves kept for every metric
+INSTRUMENTATION_WINDOW = 256
+
+# stages of Solver.solve in the order they run; other metrics are counters or added by the caller (e.g. redraw)
+SOLVE_STAGES = [
+    'substitution',
+    'inactive_constraints',
+    'layout',
+    'structural_analysis',
+    'construction',
+    'problem_construction',
+    'solution_cache',
+    'numeric',
+    'write_back',
+    'callback',
+]
+
+class Instrumentation:
+    # Rolling window of per-solve metrics: wall time of every stage in seconds and counters. Values of one
+    # solve are accumulated between two calls of finish_solve(), so the work done by the incremental hooks
+    # before a solve is attributed to it.
+    def __init__(self, window = INSTRUMENTATION_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.current = {}
+        self.solves = 0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, value):
+        self.current[name] = self.current.get(name, 0) + value
+
+    def add_sample(self, name, value):
+        # metric that is not a part of a solve, e.g. redraw done later by the GUI
+        self.samples.setdefault(name, deque(maxlen = self.window)).append(value)
+
+    def finish_solve(self):
+        for name in SOLVE_STAGES:
+            self.current.setdefault(name, 0.0)
+        self.current['total'] = sum(self.current[name] for name in SOLVE_STAGES)
+
+        for name, value in self.current.items():
+            self.add_sample(name, value)
+
+        self.current = {}
+        self.solves += 1
+
+    def clear(self):
+        self.samples = {}
+        self.current = {}
+        self.solves = 0
+
+    def percentiles(self, name, q = (50, 95, 99)):
+        values = self.samples.get(name)
+        if not values:
+            return {}
+        return {p: float(value) for p, value in zip(q, np.percentile(values, q))}
+
+    def summary(self):
+        summary = {}
+
+        for name, values in self.samples.items():
+            summary[name] = dict(count = len(values), mean = float(np.mean(values)), max = float(np.max(values)), \
+                **{f'p{p}': value for p, value in self.percentiles(name).items()})
+
+        return summary
+
+    def report(self):
+        # stages in ms, counters as they are
+        lines = [f'Last {min(self.solves, self.window)} of {self.solves} solves:']
+
+        for name, values in self.summary().items():
+            if name in SOLVE_STAGES + ['total', 'redraw']:
+                format = lambda value: f'{value * 1000:10.3f}ms'
+            else:
+                format = lambda value: f'{value:10.4g}  '
+            lines.append(f'\t{name:22} ' + '  '.join(f'{key} {format(values[key])}' for key in ('mean', 'p50', 'p95', 'p99', 'max')))
+
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump({'window': self.window, 'solves': self.solves, 'summary': self.summary(), \
+                'samples': {name: list(values) for name, values in self.samples.items()}}, file, indent = 1)
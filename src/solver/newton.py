@@ -0,0 +1,90 @@
+import numpy as np
+from scipy.optimize import OptimizeResult
+from scipy.sparse import identity
+from scipy.sparse.linalg import splu
+
+NEWTON_MAX_ITERATIONS = 50
+# max norm of the residuals of a solution
+NEWTON_TOLERANCE = 1e-7
+# the dragged point moves this many times less than the other variables in a step
+NEWTON_ACTIVE_POINT_WEIGHT = 1e3
+# Levenberg-Marquardt damping: the smallest one relative to the largest diagonal entry of J D J^T,
+# the largest one relative to the smallest
+NEWTON_INITIAL_DAMPING = 1e-12
+NEWTON_MAX_DAMPING = 1e12
+# smaller systems are factorized densely, the overhead of scipy.sparse is larger than the work there
+NEWTON_SPARSE_ROWS = 100
+
+def newton_minimize(problem, x0, p):
+    # Damped Gauss-Newton on the constraints of a BatchedProblem. x0 already holds the target of the dragged
+    # point, every step is the minimum-norm correction dx = -D J^T (J D J^T + mu I)^-1 c in the norm weighted
+    # by D^-1, so the dragged point is a soft target: it only moves when the constraints need it to.
+    # Redundant constraints make J D J^T singular, the damping mu keeps the factorization possible.
+    sparse = problem.n_rows >= NEWTON_SPARSE_ROWS
+
+    x = np.array(x0, dtype = float)
+
+    weights = np.ones(len(x))
+    if not problem.active_columns is None:
+        columns = problem.active_columns[problem.active_columns < len(x)]
+        weights[columns] = NEWTON_ACTIVE_POINT_WEIGHT
+    d = 1 / weights
+
+    c = problem.constraints(x, p)
+    nfev, nit = 1, 0
+    damping = None
+
+    while np.max(np.abs(c), initial = 0) > NEWTON_TOLERANCE and nit < NEWTON_MAX_ITERATIONS:
+        nfev += 1
+        nit += 1
+
+        if sparse:
+            # J D: columns scaled in place, J is CSR
+            J = problem.constraints_jacobian_sparse(x, p)
+            JD = J.copy()
+            JD.data *= d[JD.indices]
+            A = (JD @ J.T).tocsc()
+        else:
+            J = problem.constraints_jacobian(x, p)
+            JD = J * d
+            A = JD @ J.T
+
+        if damping is None:
+            min_damping = NEWTON_INITIAL_DAMPING * max(A.diagonal().max(initial = 0), 1)
+            damping = min_damping
+            I = identity(A.shape[0], format = 'csc') if sparse else np.eye(A.shape[0])
+
+        norm = np.linalg.norm(c)
+
+        # the damping grows until a step reduces the residuals
+        while damping < NEWTON_MAX_DAMPING * min_damping:
+            try:
+                step = -JD.T @ (splu(A + damping * I).solve(c) if sparse else np.linalg.solve(A + damping * I, c))
+            except (RuntimeError, np.linalg.LinAlgError):
+                damping *= 10
+                continue
+
+            c_new = problem.constraints(x + step, p)
+            nfev += 1
+
+            if np.all(np.isfinite(c_new)) and np.linalg.norm(c_new) < norm:
+                x, c = x + step, c_new
+                damping = max(damping / 10, min_damping)
+                break
+
+            damping *= 10
+        else:
+            break
+
+    success = bool(np.max(np.abs(c), initial = 0) <= NEWTON_TOLERANCE)
+
+    return OptimizeResult(
+        x = x,
+        success = success,
+        status = 0 if success else 1,
+        message = "Optimization terminated successfully." if success else "Residuals did not converge to the tolerance.",
+        fun = float(np.linalg.norm(c)),
+        nit = nit,
+        nfev = nfev,
+        ncev = nfev
+    )
@@ -0,0 +1,345 @@
+from collections import deque
+import numpy as np
+from scipy.sparse import coo_matrix
+from constraints.constraints import CONSTRAINT_TYPE
+from geometric_primitives.segment import Segment
+from solver.disjoint_set import DisjointSet
+
+# longest chain of segments placed one from another; deeper chains make the jacobian of the mapping denser
+REPARAMETERIZATION_MAX_DEPTH = 8
+
+class Reparameterization:
+    # Shared directions of parallel and perpendicular segments. Segments connected by PARALLELITY and
+    # PERPENDICULARITY form groups; in a group every segment has the direction theta + k * pi / 2 of one angle
+    # variable theta (k is 0 or 1). A segment of a group places one of its ends from the other:
+    #
+    #   end = anchor + length * (cos(theta + k * pi / 2), sin(theta + k * pi / 2))
+    #
+    # so the two coordinates of the end are replaced by the (signed) length, and the constraints between the
+    # placed segments of a group hold by construction and are dropped. Points are handled by their locations
+    # (pairs of coordinate sources, coincident points are one); an end is placed only if its coordinates are
+    # its own (not shared with other points by HORIZONTALITY/VERTICALITY), the dragged point is never placed,
+    # and the placements form a forest of limited depth. The segments of a group that could not be placed keep
+    # enough of their constraints to follow the shared direction.
+    #
+    # Reduced variables: [kept variables, theta of every group, length of every placed segment].
+    def __init__(self, component):
+        self.component = component
+
+        point_source = component.point_source
+        self.n_full = len(component.vars)
+
+        var_locations = {}
+        for location in set(point_source.values()):
+            for is_var, index in location:
+                if is_var:
+                    var_locations.setdefault(index, []).append(location)
+
+        active_location = None if component.active_point is None else point_source[component.active_point]
+
+        def placeable(location):
+            (is_var_x, x), (is_var_y, y) = location
+            return is_var_x and is_var_y and x != y and location != active_location and \
+                var_locations[x] == [location] and var_locations[y] == [location]
+
+        # location -> (anchor location, segment); height of the tree of placements under every root
+        self.parent = {}
+        height = {}
+
+        def root(location):
+            while location in self.parent:
+                location = self.parent[location][0]
+            return location
+
+        def depth(location):
+            result = 0
+            while location in self.parent:
+                location = self.parent[location][0]
+                result += 1
+            return result
+
+        # placed segments of every group [(segment, k, anchor, end)], and by segment (group, k, anchor, end)
+        self.groups = []
+        self.segments = {}
+        self.removed = set()
+
+        for segments, constraints in self.collect_groups():
+            log = []
+
+            def place(end, anchor, segment):
+                if end in self.parent or not placeable(end) or root(anchor) == end:
+                    return False
+                anchor_depth = depth(anchor)
+                if anchor_depth + 1 + height.get(end, 0) > REPARAMETERIZATION_MAX_DEPTH:
+                    return False
+                top = root(anchor)
+                log.append((end, top, height.get(top, 0)))
+                self.parent[end] = (anchor, segment)
+                height[top] = max(height.get(top, 0), anchor_depth + 1 + height.get(end, 0))
+                return True
+
+            placed = []
+
+            for segment, k in segments.items():
+                p1, p2 = point_source[segment.p1], point_source[segment.p2]
+                for end, anchor in ((p2, p1), (p1, p2)):
+                    if place(end, anchor, segment):
+                        placed.append((segment, k, anchor, end))
+                        break
+
+            # a single placed segment only trades its end for an angle and a length
+            if len(placed) < 2:
+                for end, top, old_height in reversed(log):
+                    del self.parent[end]
+                    height[top] = old_height
+                continue
+
+            group = len(self.groups)
+            self.groups.append(placed)
+
+            for segment, k, anchor, end in placed:
+                self.segments[segment] = (group, k, anchor, end)
+
+            # the placed segments share one direction; of the other constraints of the group only a spanning forest
+            # is independent of it, the rest would be redundant rows of the reduced problem
+            segment_id = {segment: i for i, segment in enumerate(segments)}
+            directions = DisjointSet(len(segments))
+            for segment, k, anchor, end in placed:
+                directions.union(segment_id[placed[0][0]], segment_id[segment])
+
+            for constraint in constraints:
+                s1, s2 = (segment_id[entity] for entity in constraint.entities)
+                if directions.find(s1) == directions.find(s2):
+                    self.removed.add(constraint)
+                else:
+                    directions.union(s1, s2)
+
+        self.remaining = [constraint for constraint in component.constraints if not constraint in self.removed]
+
+        if self.removed:
+            self.build_layout()
+
+    def collect_groups(self):
+        # connected sets of segments with their k relative to the first one, and their constraints; a set with
+        # an odd cycle of perpendicularities has no consistent k and is left alone
+        neighbours = {}
+        constraints = []
+
+        for constraint in self.component.constraints:
+            if not constraint.type in (CONSTRAINT_TYPE.PARALLELITY, CONSTRAINT_TYPE.PERPENDICULARITY):
+                continue
+            if len(constraint.entities) != 2 or not all(isinstance(entity, Segment) for entity in constraint.entities):
+                continue
+            s1, s2 = constraint.entities
+            k = 0 if constraint.type == CONSTRAINT_TYPE.PARALLELITY else 1
+            neighbours.setdefault(s1, []).append((s2, k, constraint))
+            neighbours.setdefault(s2, []).append((s1, k, constraint))
+            constraints.append(constraint)
+
+        visited = {}
+        groups = []
+
+        for start in neighbours:
+            if start in visited:
+                continue
+
+            segments, group_constraints, consistent = {start: 0}, set(), True
+            visited[start] = True
+            queue = deque([start])
+
+            while queue:
+                segment = queue.popleft()
+                for other, k, constraint in neighbours[segment]:
+                    group_constraints.add(constraint)
+                    if not other in segments:
+                        segments[other] = (segments[segment] + k) % 2
+                        visited[other] = True
+                        queue.append(other)
+                    elif segments[other] != (segments[segment] + k) % 2:
+                        consistent = False
+
+            if consistent:
+                groups.append((segments, [constraint for constraint in constraints if constraint in group_constraints]))
+
+        return groups
+
+    def build_layout(self):
+        placed_vars = set()
+        for segment, (group, k, anchor, end) in self.segments.items():
+            placed_vars.update(index for _, index in end)
+
+        self.kept = np.array([i for i in range(self.n_full) if not i in placed_vars], dtype = int)
+        self.kept_position = {var: i for i, var in enumerate(self.kept)}
+
+        self.n_groups = len(self.groups)
+        self.placed = list(self.segments)
+        self.n_placed = len(self.placed)
+        self.n_reduced = len(self.kept) + self.n_groups + self.n_placed
+
+        segment_index = {segment: i for i, segment in enumerate(self.placed)}
+
+        # per placed segment: its group, k, and the full columns (variables, then parameters) of its ends
+        def full_column(source):
+            is_var, index = source
+            return index if is_var else self.n_full + index
+
+        self.segment_group = np.array([self.segments[segment][0] for segment in self.placed], dtype = int)
+        self.segment_k = np.array([self.segments[segment][1] for segment in self.placed], dtype = float)
+        self.anchor_columns = np.array([[full_column(source) for source in self.segments[segment][2]] for segment in self.placed], dtype = int).reshape(-1, 2)
+        self.end_columns = np.array([[full_column(source) for source in self.segments[segment][3]] for segment in self.placed], dtype = int).reshape(-1, 2)
+
+        # the group's angle is read from its first placed segment
+        self.group_reference = np.array([segment_index[group[0][0]] for group in self.groups], dtype = int)
+
+        # placed variables: the root of their chain and the placed segments along it, in the order of placement
+        # (anchors first) for the traced mapping
+        def reduced_column(source):
+            is_var, index = source
+            return self.kept_position[index] if is_var else self.n_reduced + index
+
+        self.rows, self.root_columns = [], []
+        entry_rows, entry_segments, entry_axes = [], [], []
+        self.order = []
+
+        def chain(location):
+            segments = []
+            while location in self.parent:
+                location, segment = self.parent[location]
+                segments.append(segment)
+            return location, segments
+
+        placed_locations = sorted((self.segments[segment][3] for segment in self.placed), key = lambda location: len(chain(location)[1]))
+
+        for location in placed_locations:
+            top, segments = chain(location)
+            self.order.append((location, self.parent[location][0], segment_index[self.parent[location][1]]))
+            for axis in (0, 1):
+                row = len(self.rows)
+                self.rows.append(location[axis][1])
+                self.root_columns.append(reduced_column(top[axis]))
+                for segment in segments:
+                    entry_rows.append(row)
+                    entry_segments.append(segment_index[segment])
+                    entry_axes.append(axis)
+
+        self.rows = np.array(self.rows, dtype = int)
+        self.root_columns = np.array(self.root_columns, dtype = int)
+        self.entry_rows = np.array(entry_rows, dtype = int)
+        self.entry_segments = np.array(entry_segments, dtype = int)
+        self.entry_axes = np.array(entry_axes, dtype = int)
+
+        # constant part of the jacobian of the mapping: kept variables and roots that are kept variables
+        roots = self.root_columns < self.n_reduced
+        self.constant_rows = np.concatenate((self.kept, self.rows[roots]))
+        self.constant_columns = np.concatenate((np.arange(len(self.kept)), self.root_columns[roots]))
+
+        self.length_columns = len(self.kept) + self.n_groups + self.entry_segments
+        self.angle_columns = len(self.kept) + self.segment_group[self.entry_segments]
+
+    def angles(self, y):
+        theta = np.asarray(y[len(self.kept):len(self.kept) + self.n_groups], dtype = float)
+        return theta[self.segment_group] + self.segment_k * np.pi / 2
+
+    def reduce(self, x, p):
+        # reduced variables of full values; segments of a group that are not parallel yet are projected
+        # on the direction of the first one
+        w = np.concatenate((np.asarray(x, dtype = float), np.asarray(p, dtype = float)))
+
+        vectors = w[self.end_columns] - w[self.anchor_columns]
+
+        reference = vectors[self.group_reference]
+        theta = np.arctan2(reference[:, 1], reference[:, 0]) - self.segment_k[self.group_reference] * np.pi / 2
+
+        phi = theta[self.segment_group] + self.segment_k * np.pi / 2
+        lengths = vectors[:, 0] * np.cos(phi) + vectors[:, 1] * np.sin(phi)
+
+        return np.concatenate((w[self.kept], theta, lengths))
+
+    def expand(self, y, p):
+        y = np.asarray(y, dtype = float)
+        w = np.concatenate((y, np.asarray(p, dtype = float)))
+
+        phi = self.angles(y)
+        lengths = y[len(self.kept) + self.n_groups:]
+        directions = np.array([np.cos(phi), np.sin(phi)])
+
+        x = np.empty(self.n_full)
+        x[self.kept] = y[:len(self.kept)]
+        x[self.rows] = w[self.root_columns] + np.bincount(self.entry_rows, \
+            weights = lengths[self.entry_segments] * directions[self.entry_axes, self.entry_segments], minlength = len(self.rows))
+
+        return x
+
+    def expand_traced(self, y, p):
+        # the same mapping element by element, for CasADi tracing
+        x = [None] * self.n_full
+
+        for i, var in enumerate(self.kept):
+            x[var] = y[i]
+
+        def value(source):
+            is_var, index = source
+            return x[index] if is_var else p[index]
+
+        for end, anchor, segment in self.order:
+            phi = y[len(self.kept) + int(self.segment_group[segment])] + self.segment_k[segment] * np.pi / 2
+            length = y[len(self.kept) + self.n_groups + segment]
+            x[end[0][1]] = value(anchor[0]) + length * np.cos(phi)
+            x[end[1][1]] = value(anchor[1]) + length * np.sin(phi)
+
+        return x
+
+    def jacobian(self, y):
+        # d full / d reduced, sparse
+        phi = self.angles(y)
+        lengths = np.asarray(y[len(self.kept) + self.n_groups:], dtype = float)
+
+        directions = np.array([np.cos(phi), np.sin(phi)])
+        derivatives = np.array([-np.sin(phi), np.cos(phi)])
+
+        segments, axes = self.entry_segments, self.entry_axes
+        rows = self.rows[self.entry_rows]
+
+        data = np.concatenate((np.ones(len(self.constant_rows)), directions[axes, segments], lengths[segments] * derivatives[axes, segments]))
+        row_indices = np.concatenate((self.constant_rows, rows, rows))
+        column_indices = np.concatenate((self.constant_columns, self.length_columns, self.angle_columns))
+
+        return coo_matrix((data, (row_indices, column_indices)), shape = (self.n_full, self.n_reduced)).tocsr()
+
+    def reduced_columns(self, columns):
+        # columns of the full problem (variables, then parameters) in the reduced one; placed variables have none
+        result = []
+        for column in columns:
+            if column >= self.n_full:
+                result.append(self.n_reduced + column - self.n_full)
+            elif column in self.kept_position:
+                result.append(self.kept_position[column])
+        return np.array(result, dtype = int)
+
+class ReducedProblem:
+    # a BatchedProblem seen through a Reparameterization: same interface, reduced variables
+    def __init__(self, reparameterization, problem):
+        self.reparameterization = reparameterization
+        self.problem = problem
+
+        self.n_vars = reparameterization.n_reduced
+        self.n_rows = problem.n_rows
+
+        self.active_columns = None
+        if not problem.active_columns is None:
+            self.active_columns = reparameterization.reduced_columns(problem.active_columns)
+
+    def constraints(self, y, p=()):
+        return self.problem.constraints(self.reparameterization.expand(y, p), p)
+
+    def constraints_jacobian_sparse(self, y, p=()):
+        return (self.problem.constraints_jacobian_sparse(self.reparameterization.expand(y, p), p) @ self.reparameterization.jacobian(y)).tocsr()
+
+    def constraints_jacobian(self, y, p=()):
+        return self.constraints_jacobian_sparse(y, p).toarray()
+
+    def objective(self, y, p=()):
+        return self.problem.objective(self.reparameterization.expand(y, p), p)
+
+    def objective_gradient(self, y, p=()):
+        return self.reparameterization.jacobian(y).T @ self.problem.objective_gradient(self.reparameterization.expand(y, p), p)
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+import numpy as np
+
+# memory for the cached solutions (values of the variables and of the parameters in the keys), bytes
+SOLUTION_CACHE_BUDGET = 32 * 2 ** 20
+
+class SolutionCache:
+    # Least recently used converged solutions of components: key (see Component.solution_key) -> values of
+    # the component variables. Entries are dropped, oldest first, once their size exceeds the budget.
+    def __init__(self, budget = SOLUTION_CACHE_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def entry_size(self, key, x):
+        # the structure part of a key is shared with the component, only the values and the ids of the points
+        # and arcs are counted
+        return x.nbytes + 8 * sum(len(part) for part in key[1:])
+
+    def get(self, key):
+        x = self.entries.get(key)
+
+        if x is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return x
+
+    def put(self, key, x):
+        x = np.array(x, dtype = float)
+
+        self.discard(key)
+
+        size = self.entry_size(key, x)
+        if size > self.budget:
+            return
+
+        self.entries[key] = x
+        self.size += size
+
+        self.shrink()
+
+    def discard(self, key):
+        x = self.entries.pop(key, None)
+        if not x is None:
+            self.size -= self.entry_size(key, x)
+
+    def set_budget(self, budget):
+        self.budget = budget
+        self.shrink()
+
+    def shrink(self):
+        while self.size > self.budget:
+            old_key, old_x = self.entries.popitem(last = False)
+            self.size -= self.entry_size(old_key, old_x)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,16 +1,58 @@
+from collections import OrderedDict
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
 import itertools
-from scipy.optimize import minimize
-from solver.casadi_wrapper import casadi_minimize
-from copy import copy
-from constraints.constraints import CONSTRAINT_FUNCTION, CONSTRAINT_TYPE, Constraints
+import threading
+import numpy as np
+from scipy.optimize import OptimizeResult, minimize
+from solver.batched_problem import BatchedProblem
+from solver.casadi_wrapper import CompiledProblem
+from solver.component import Component
+from solver.construction import Construction
+from solver.disjoint_set import DisjointSet
+from solver.instrumentation import Instrumentation
+from solver.newton import newton_minimize
+from solver.reparameterization import Reparameterization, ReducedProblem
+from solver.solution_cache import SolutionCache
+from solver.dependency_analysis import DependencyAnalysis
+from solver.structural_analysis import StructuralAnalysis
+from constraints.constraints import CONSTRAINT_FUNCTION, CONSTRAINT_TYPE, SUBSTITUTION_OFFSETS, Constraints
 from geometry import Geometry
+from geometric_primitives.arc import Arc
 from geometric_primitives.point import Point, distance_p2p
 from geometric_primitives.segment import Segment
 
+# number of compiled (traced or batched) problems kept alive, one per component topology
+COMPILED_PROBLEMS_CACHE_SIZE = 16
+
+# a variable that moved less than this in a solve is not reported as changed
+CHANGE_TOLERANCE = 1e-9
+
+# local drag: number of constraints between the dragged point and the edge of the first region tried,
+# and how much the depth grows when a region fails
+LOCAL_DRAG_INITIAL_DEPTH = 2
+LOCAL_DRAG_GROWTH = 2
+# largest residual of a local solution, and the largest distance of the dragged point from its target;
+# Newton treats the target as a soft one, so the point never lands on it exactly
+LOCAL_DRAG_TOLERANCE = 1e-4
+LOCAL_DRAG_TARGET_TOLERANCE = 1e-2
+
+# largest residual of a cached solution that is taken as it is, without a solve
+SOLUTION_CACHE_TOLERANCE = 1e-6
+# initial values with residuals below this are solved from as they are, the cache could only offer another branch
+SOLUTION_CACHE_SOLVED_TOLERANCE = 1e-4
+
+# largest residual of a component that was placed entirely by construction
+CONSTRUCTION_RESIDUAL_TOLERANCE = 1e-7
+
+# SLSQP: initial values of a component without the dragged point with residuals below this are a solution already
+SLSQP_SOLVED_TOLERANCE = 1e-8
+
 class SOLVER_TYPE(Enum):
     SLSQP   = 0
     IPOPT   = 1
+    NEWTON  = 2
 
 class SPECIAL_LINK(Enum):
     BASE    = -1
@@ -20,6 +62,18 @@ class SPECIAL_LINK(Enum):
     def __repr__(self):
         return str(self.value)
 
+def get_constraints_points(constraints):
+    points = []
+
+    for constraint in constraints:
+        for entity in constraint.entities:
+            if not hasattr(entity, 'points'):
+                continue
+            for point in entity.points():
+                points.append(point)
+
+    return points
+
 class Solver:
     def __init__(self, geometry: Geometry, geometry_changed_callback, constraints):
         self.geometry = geometry
@@ -33,7 +87,56 @@ class Solver:
 
         self.is_solving = False
 
+        # outcome of the last solve: all solved components converged, optimizer iterations, norm of the residuals
+        self.success = True
+        self.iterations = 0
+        self.residual_norm = 0.0
+
+        # per-solve stage timings and counters over the last solves
+        self.instrumentation = Instrumentation()
+
+        self.compiled_problems = OrderedDict()
+
+        # signatures of the components that were solved successfully before the last change of the layout
+        self.solved_components = set()
+
+        # converged solutions of earlier states, e.g. before a constraint was toggled or a dimension re-entered
+        self.solution_cache = SolutionCache()
+
+        # independent components are solved on a thread pool if more than one worker is allowed
+        self.max_workers = 1
+        self.executor = None
+
+        # drags can be solved on a worker thread (solve_async); only the newest target is solved
+        self.thread = None
+        self.condition = threading.Condition()
+        self.pending_request = None
+        self.busy = False
+        # the worker does not touch the geometry: its writes are queued, (store, store indices or a point or
+        # an arc, values), and made by publish() on the thread that owns the geometry
+        self.deferred_writes = []
+
+        # substitution state (point ids, values, links, classes, inactive constraints) is kept between solves
+        # and updated by entity_added(), constraints_added(), etc.; the variables layout and the components
+        # are rebuilt lazily after any change
+        self.rebuild_required = True
+        self.layout_changed = True
+
+        self.active_point = None
+        # where the dragged point is going in the current solve
+        self.target = None
+        self.components = []
+        self.active_component = None
+
+        # drags solve a neighbourhood of the dragged point first (see solve_local)
+        self.local_drag = False
+
+        # points and arcs moved by the solves since take_changed_entities() was called; None is everything
+        self.changed_entities = None
+
     def set_solver_type(self, solver_type):
+        self.wait()
+
         # print(f"Solver switched to: {solver_type.name}")
         self.solver_type = solver_type
 
@@ -41,95 +144,74 @@ class Solver:
         temp = self.links[id]
         return id if isinstance(temp, SPECIAL_LINK) else temp
 
+    # substitution
+
     def process_constraints_that_could_be_solved_by_substitution(self):
-        points = list(itertools.chain.from_iterable([entity.points() for entity in (self.geometry.segments + self.geometry.arcs)]))
+        self.entities = self.geometry.segments + self.geometry.arcs
+        self.geometry.attach(self.entities)
+        self.entity_to_id = {entity: i for i, entity in enumerate(self.entities)}
+        self.number_of_entities = len(self.entities)
+        # the keys of the cached solutions hold the ids that are renumbered here
+        self.solution_cache.clear()
+
+        points = list(itertools.chain.from_iterable([entity.points() for entity in self.entities]))
 
+        # point -> id of its x variable, y is the next one
         self.point_to_id = {}
+        self.id_to_point = {}
         self.values = []
         for i, point in enumerate(points):
-            self.point_to_id[point] = i
+            self.point_to_id[point] = i * 2
+            self.id_to_point[i * 2] = self.id_to_point[i * 2 + 1] = point
             self.values += [point.x, point.y]
 
         self.number_of_primary_varialbes = len(self.values)
         self.links = [SPECIAL_LINK.BASE] * self.number_of_primary_varialbes
 
-        def get_constraints_points(constraints):
-            points = []
+        # COINCIDENCE, HORIZONTALITY and VERTICALITY constraints merge primary variables into equivalence
+        # classes; every class of more than one variable is replaced by one secondary variable
 
-            for constraint in constraints:
-                for entity in constraint.entities:
-                    if not hasattr(entity, 'points'):
-                        continue
-                    for point in entity.points():
-                        points.append(point)
-            
-            return points
+        self.coordinate_classes = DisjointSet(self.number_of_primary_varialbes)
 
-        def hv_helper(constraint, type):
-            constraint_points = get_constraints_points([constraint])
+        for constraint in self.constraints:
+            offsets = SUBSTITUTION_OFFSETS.get(constraint.type)
+            if offsets is None:
+                continue
 
-            link = SPECIAL_LINK.BASE
-            for point in constraint_points:
-                id = self.point_to_id[point] * 2 + (1 if type == CONSTRAINT_TYPE.HORIZONTALITY else 0)
-                if self.links[id] != SPECIAL_LINK.BASE:
-                    link = self.links[id]
-                    break
+            ids = [self.point_to_id[point] for point in get_constraints_points([constraint])]
 
-            if link == SPECIAL_LINK.BASE:
-                link = len(self.links)
-                self.links.append(SPECIAL_LINK.BASE)
+            for offset in offsets:
+                for id in ids[1:]:
+                    self.coordinate_classes.union(ids[0] + offset, id + offset)
 
-                for entity in constraint_points:
-                    if not entity is self.active_point:
-                        self.values.append(entity.y if type == CONSTRAINT_TYPE.HORIZONTALITY else entity.x)
-                        break
+        active_id = self.point_to_id.get(self.active_point)
 
-            for point in constraint_points:
-                id = self.point_to_id[point] * 2 + (1 if type == CONSTRAINT_TYPE.HORIZONTALITY else 0)
+        # secondary variable -> primary variables linked to it
+        self.class_members = {}
 
-                existing_link = self.links[id]
-                if existing_link != SPECIAL_LINK.BASE:
-                    for i, _ in enumerate(self.links):
-                        if self.links[i] == existing_link:
-                            self.links[i] = link
-                else:
-                    self.links[id] = link
+        for ids in self.coordinate_classes.classes().values():
+            if len(ids) == 1:
+                continue
 
-        # COINCIDENCE, HORIZONTALITY and VERTICALITY constraints
+            link = len(self.links)
+            self.links.append(SPECIAL_LINK.BASE)
+            self.coordinate_classes.add()
 
-        for constraint in self.constraints:
-            if constraint.type == CONSTRAINT_TYPE.COINCIDENCE:
-                hv_helper(constraint, CONSTRAINT_TYPE.HORIZONTALITY)
-                hv_helper(constraint, CONSTRAINT_TYPE.VERTICALITY)
+            # the class starts from the value of its first variable that is not being dragged
+            value_id = next((id for id in ids if id - id % 2 != active_id), ids[0])
+            self.values.append(self.values[value_id])
 
-            elif constraint.type == CONSTRAINT_TYPE.HORIZONTALITY:
-                hv_helper(constraint, CONSTRAINT_TYPE.HORIZONTALITY)
+            for id in ids:
+                self.links[id] = link
 
-            elif constraint.type == CONSTRAINT_TYPE.VERTICALITY:
-                hv_helper(constraint, CONSTRAINT_TYPE.VERTICALITY)
+            self.class_members[link] = ids
 
         # FIXED constraints
 
-        fixed_constraints = filter(lambda constraint: constraint.type == CONSTRAINT_TYPE.FIXED, self.constraints)
+        fixed_constraints = self.constraints.constraints_of_type(CONSTRAINT_TYPE.FIXED)
 
         for point in get_constraints_points(fixed_constraints):
-            id = self.point_to_id[point]
-            id_x, id_y = id * 2, id * 2 + 1
-
-            self.links[self.get_base_id(id_x)] = SPECIAL_LINK.FIXED
-            self.links[self.get_base_id(id_y)] = SPECIAL_LINK.FIXED
-
-        for point in get_constraints_points(self.constraints):
-            if point is self.active_point:
-                id = self.point_to_id[point]
-                id_x, id_y = id * 2, id * 2 + 1
-                base_id_x, base_id_y = self.get_base_id(id_x), self.get_base_id(id_y)
-
-                if self.links[base_id_x] == SPECIAL_LINK.BASE:
-                    self.values[base_id_x] = point.x
-
-                if self.links[base_id_y] == SPECIAL_LINK.BASE:
-                    self.values[base_id_y] = point.y
+            self.fix_point(point)
 
         self.number_of_secondary_variables = len(self.links) - self.number_of_primary_varialbes
 
@@ -143,6 +225,441 @@ class Solver:
 
         # print (f'links[{len(self.links)}]: {self.links}')
 
+        self.number_of_constraints = len(self.constraints)
+
+        self.rebuild_required = False
+        self.layout_changed = True
+
+    def fix_point(self, point):
+        id = self.point_to_id[point]
+        self.links[self.get_base_id(id)] = SPECIAL_LINK.FIXED
+        self.links[self.get_base_id(id + 1)] = SPECIAL_LINK.FIXED
+
+    def merge_coordinates(self, id1, id2):
+        base1, base2 = self.get_base_id(id1), self.get_base_id(id2)
+
+        if base1 == base2:
+            return
+
+        fixed = SPECIAL_LINK.FIXED in (self.links[base1], self.links[base2])
+
+        # the smaller class is relinked to the bigger one, a fixed class keeps its value
+        if len(self.class_members.get(base1, (base1,))) < len(self.class_members.get(base2, (base2,))):
+            base1, base2 = base2, base1
+
+        if self.links[base2] == SPECIAL_LINK.FIXED:
+            self.values[base1] = self.values[base2]
+
+        if not base1 in self.class_members:
+            link = len(self.links)
+            self.links.append(SPECIAL_LINK.BASE)
+            self.values.append(self.values[base1])
+            self.coordinate_classes.add()
+
+            self.links[base1] = link
+            self.class_members[link] = [base1]
+            base1 = link
+
+        members = self.class_members.pop(base2, None)
+
+        if members is None:
+            members = [base2]
+        else:
+            # merged secondary variable is not referenced anymore
+            self.links[base2] = SPECIAL_LINK.ORPHAN
+
+        for id in members:
+            self.links[id] = base1
+
+        self.class_members[base1] += members
+        self.links[base1] = SPECIAL_LINK.FIXED if fixed else SPECIAL_LINK.BASE
+
+        self.coordinate_classes.union(id1, id2)
+
+    def structure_changed(self):
+        # remember which components are in a solved state, so they are not solved again after the layout is rebuilt
+        if not self.layout_changed:
+            self.solved_components = set(component.signature(self.z_value) for component in self.components if component.solved)
+            # the state being left, after all the drags since the last change, is the one to come back to
+            for component in self.components:
+                if component.solved:
+                    self.solution_cache.put(component.solution_key(component.parameters(self.z_value)), self.x[component.vars])
+
+        self.layout_changed = True
+
+    def reset(self):
+        self.wait()
+
+        # geometry and constraints were replaced entirely
+        self.structure_changed()
+        self.rebuild_required = True
+
+    def entity_added(self, entity):
+        self.wait()
+
+        if self.rebuild_required:
+            return
+
+        self.structure_changed()
+
+        for point in entity.points():
+            if point in self.point_to_id:
+                continue
+
+            self.point_to_id[point] = len(self.links)
+            self.id_to_point[len(self.links)] = self.id_to_point[len(self.links) + 1] = point
+            self.values += [point.x, point.y]
+            self.links += [SPECIAL_LINK.BASE, SPECIAL_LINK.BASE]
+            self.coordinate_classes.add()
+            self.coordinate_classes.add()
+
+        self.entity_to_id[entity] = self.number_of_entities
+        self.number_of_entities += 1
+        self.entities.append(entity)
+        self.geometry.attach([entity])
+
+    def entity_removed(self, entity):
+        self.wait()
+
+        if self.rebuild_required or not entity in self.entity_to_id:
+            return
+
+        self.structure_changed()
+
+        ids = [id + offset for id in map(self.point_to_id.get, entity.points()) for offset in (0, 1)]
+
+        # variables of unconstrained points are dropped in place, everything else needs the classes to be split
+        if any(self.links[id] != SPECIAL_LINK.BASE for id in ids):
+            self.rebuild_required = True
+            return
+
+        for id in ids:
+            self.links[id] = SPECIAL_LINK.ORPHAN
+
+        for point in entity.points():
+            for offset in (0, 1):
+                self.id_to_point.pop(self.point_to_id[point] + offset, None)
+            self.point_to_id.pop(point, None)
+
+        del self.entity_to_id[entity]
+        self.entities.remove(entity)
+
+    def entity_changed(self, entity):
+        self.wait()
+
+        # e.g. the direction of an arc was inverted: same variables, different problem
+        self.structure_changed()
+
+    def entities_moved(self, entities):
+        # points and arcs were moved outside of a solve (e.g. by undo): their values are taken over in place
+        # and the components they belong to are solved again
+        self.wait()
+
+        if self.rebuild_required:
+            return
+
+        vars = []
+
+        for entity in entities:
+            if isinstance(entity, Point) and entity in self.point_to_id:
+                id = self.point_to_id[entity]
+                for offset, value in ((0, entity.x), (1, entity.y)):
+                    base_id = self.get_base_id(id + offset)
+                    self.values[base_id] = value
+                    if not self.layout_changed and base_id in self.value_to_var:
+                        vars.append(self.value_to_var[base_id])
+                        self.x[vars[-1]] = value
+            elif isinstance(entity, Arc) and not self.layout_changed and entity in self.arc_to_var:
+                vars.append(self.arc_to_var[entity])
+                self.x[vars[-1]] = entity.d
+
+        if self.layout_changed:
+            return
+
+        for var in vars:
+            component = self.var_to_component.get(var)
+            if not component is None:
+                component.solved = False
+
+        with self.condition:
+            if not self.changed_entities is None:
+                self.changed_entities |= set(entities)
+
+    def constraints_added(self, constraints):
+        self.wait()
+
+        if self.rebuild_required:
+            return
+
+        self.structure_changed()
+
+        substituted_points = []
+
+        with self.instrumentation.stage('substitution'):
+            for constraint in constraints:
+                offsets = SUBSTITUTION_OFFSETS.get(constraint.type)
+
+                if not offsets is None:
+                    ids = [self.point_to_id[point] for point in get_constraints_points([constraint])]
+                    for offset in offsets:
+                        for id in ids[1:]:
+                            self.merge_coordinates(ids[0] + offset, id + offset)
+                    substituted_points += get_constraints_points([constraint])
+
+                elif constraint.type == CONSTRAINT_TYPE.FIXED:
+                    for point in get_constraints_points([constraint]):
+                        self.fix_point(point)
+                    substituted_points += get_constraints_points([constraint])
+
+        # merged or fixed classes can make the constraints on their points, and on the segments and arcs
+        # of these points, inactive
+        with self.instrumentation.stage('inactive_constraints'):
+            candidates = set(constraints)
+
+            for point in self.class_points(substituted_points):
+                candidates.update(self.constraints.constraints_of(point))
+                for entity in self.constraints.entities_of(point):
+                    candidates.update(self.constraints.constraints_of(entity))
+
+            for constraint in candidates:
+                if self.is_inactive_constraint(constraint):
+                    self.inactive_constraints.add(constraint)
+
+        self.number_of_constraints += len(constraints)
+
+    def class_points(self, points):
+        # points sharing a coordinate class with any of the given ones
+        class_points = set()
+
+        for point in points:
+            id = self.point_to_id[point]
+            for offset in (0, 1):
+                base_id = self.get_base_id(id + offset)
+                for member in self.class_members.get(base_id, (id + offset,)):
+                    class_points.add(self.id_to_point[member])
+
+        return class_points
+
+    def constraint_removed(self, constraint):
+        self.wait()
+
+        if self.rebuild_required:
+            return
+
+        self.structure_changed()
+
+        if constraint.type in SUBSTITUTION_OFFSETS or constraint.type == CONSTRAINT_TYPE.FIXED:
+            self.rebuild_required = True
+            return
+
+        self.inactive_constraints.discard(constraint)
+        self.number_of_constraints -= 1
+
+    def topology_outdated(self):
+        # changes made without notifying the solver are caught at least by the number of entities and constraints
+        return self.rebuild_required or len(self.entities) != len(self.geometry.segments) + len(self.geometry.arcs) \
+            or self.number_of_constraints != len(self.constraints)
+
+    def is_fixed_entity(self, entity):
+        if isinstance(entity, Point):
+            id = self.point_to_id[entity]
+            return self.links[self.get_base_id(id)] == SPECIAL_LINK.FIXED and self.links[self.get_base_id(id + 1)] == SPECIAL_LINK.FIXED
+        elif isinstance(entity, Segment):
+            return self.is_fixed_entity(entity.p1) and self.is_fixed_entity(entity.p2)
+        else:
+            return False
+
+    def is_inactive_constraint(self, constraint):
+        # constraints that do not depend on variables are ignored; it means they should be defined based on fixed points only
+        return not CONSTRAINT_FUNCTION[constraint.type] is None and all(self.is_fixed_entity(entity) for entity in constraint.entities)
+
+    def detect_inactive_constraints(self):
+        inactive_constraints = set()
+
+        for constraint in self.constraints:
+            if self.is_inactive_constraint(constraint):
+                inactive_constraints.add(constraint)
+
+        return inactive_constraints
+
+    # variables layout
+
+    def build_variables_layout(self):
+        self.constraints.inactive_constraints = len(self.inactive_constraints)
+        self.constraints.solved_by_substitution_constraints = sum(len(self.constraints.constraints_of_type(type)) for type in SUBSTITUTION_OFFSETS)
+        self.constraints.fixed_constraints = len(self.constraints.constraints_of_type(CONSTRAINT_TYPE.FIXED))
+
+        # vars: values with BASE link, then arc.d for every arc
+        self.value_to_var = {}
+        for i, link in enumerate(self.links):
+            if link == SPECIAL_LINK.BASE:
+                self.value_to_var[i] = len(self.value_to_var)
+
+        arcs = [entity for entity in self.entities if isinstance(entity, Arc)]
+
+        self.arc_to_var = {arc: len(self.value_to_var) + i for i, arc in enumerate(arcs)}
+
+        self.number_of_variables = len(self.value_to_var) + len(self.arc_to_var)
+
+        self.var_to_value = {var: i for i, var in self.value_to_var.items()}
+        self.var_to_arc = {var: arc for arc, var in self.arc_to_var.items()}
+
+        # for every primary variable: its index in z = vars + values
+        def source(id):
+            if self.links[id] == SPECIAL_LINK.BASE:
+                return self.value_to_var[id]
+            return self.number_of_variables + id
+
+        self.coordinate_source = {}
+        self.var_to_points = {}
+
+        for point, id in self.point_to_id.items():
+            for id in (id, id + 1):
+                self.coordinate_source[id] = source(self.get_base_id(id))
+                if self.coordinate_source[id] < self.number_of_variables:
+                    self.var_to_points.setdefault(self.coordinate_source[id], []).append(point)
+
+        self.x = np.array(self.geometry_to_vars(), dtype = float)
+
+        # constraints that go to the optimizer
+        self.active_constraints = [constraint for constraint in self.constraints \
+            if not constraint in self.inactive_constraints and not CONSTRAINT_FUNCTION[constraint.type] is None]
+
+        # array-backed geometry: store index of every coordinate and arc d that is driven by a variable
+        if not self.geometry.store is None:
+            indices, vars = [], []
+            for var, points in self.var_to_points.items():
+                for point in points:
+                    id = self.point_to_id[point]
+                    for offset in (0, 1):
+                        if self.coordinate_source[id + offset] == var:
+                            indices.append(point.index + offset)
+                            vars.append(var)
+            for arc, var in self.arc_to_var.items():
+                indices.append(arc.index)
+                vars.append(var)
+            self.store_indices = np.array(indices, dtype = int)
+            self.store_vars = np.array(vars, dtype = int)
+
+        self.components = self.find_components()
+        self.var_to_component = {var: component for component in self.components for var in component.vars}
+        self.active_component = None
+
+        for component in self.components:
+            component.solved = component.signature(self.z_value) in self.solved_components
+
+        self.layout_changed = False
+
+    def z_value(self, source):
+        if source < self.number_of_variables:
+            return self.x[source]
+        return self.values[source - self.number_of_variables]
+
+    def entities_vars(self, entities):
+        vars = []
+
+        for entity in entities:
+            for point in entity.points() if hasattr(entity, 'points') else ():
+                id = self.point_to_id[point]
+                for source in (self.coordinate_source[id], self.coordinate_source[id + 1]):
+                    if source < self.number_of_variables:
+                        vars.append(source)
+            if entity in self.arc_to_var:
+                vars.append(self.arc_to_var[entity])
+
+        return vars
+
+    def find_components(self):
+        # independent parts of the problem: variables connected through the active constraints;
+        # variables that are not constrained are left alone unless they are dragged
+        disjoint_set = DisjointSet(self.number_of_variables)
+
+        constraint_roots = []
+
+        for constraint in self.active_constraints:
+            vars = self.entities_vars(constraint.entities)
+            for var in vars[1:]:
+                disjoint_set.union(vars[0], var)
+            constraint_roots.append((constraint, vars[0] if vars else None))
+
+        root_to_constraints = {}
+
+        for constraint, var in constraint_roots:
+            if not var is None:
+                root_to_constraints.setdefault(disjoint_set.find(var), []).append(constraint)
+
+        components = []
+
+        for root, vars in disjoint_set.classes().items():
+            if root in root_to_constraints:
+                components.append(Component(self, vars, root_to_constraints[root], None))
+
+        return components
+
+    def get_active_component(self):
+        # the dragged point joins (and merges) the components of its variables
+        if self.active_point is None:
+            return None
+
+        if not self.active_component is None and self.active_component.active_point is self.active_point:
+            return self.active_component
+
+        active_vars = self.entities_vars([self.active_point])
+
+        if not active_vars:
+            return None
+
+        components = list(OrderedDict.fromkeys(self.var_to_component[var] for var in active_vars if var in self.var_to_component))
+
+        vars = sorted(set(active_vars).union(*[component.vars for component in components]))
+        constraints = list(itertools.chain.from_iterable(component.constraints for component in components))
+
+        self.active_component = Component(self, vars, constraints, self.active_point)
+        self.active_component.parts = components
+        # local drag: regions by depth and the depth to start the next drag frame from, None is the whole component
+        self.active_component.local_regions = {}
+        self.active_component.local_depth = LOCAL_DRAG_INITIAL_DEPTH
+
+        return self.active_component
+
+    def local_region(self, active_component, depth):
+        # the variables of the dragged point and the ones reachable from them through at most depth constraints,
+        # with every constraint on them; variables of the component outside of the region are inputs, frozen.
+        # None if the region is the whole component
+        if depth in active_component.local_regions:
+            return active_component.local_regions[depth]
+
+        if not hasattr(active_component, 'constraint_vars'):
+            active_component.constraint_vars = {constraint: self.entities_vars(constraint.entities) for constraint in active_component.constraints}
+            active_component.var_constraints = {}
+            for constraint, vars in active_component.constraint_vars.items():
+                for var in vars:
+                    active_component.var_constraints.setdefault(var, []).append(constraint)
+
+        region_vars = set(self.entities_vars([self.active_point]))
+        frontier = set(region_vars)
+
+        for _ in range(depth):
+            reached = set()
+            for var in frontier:
+                for constraint in active_component.var_constraints.get(var, ()):
+                    reached.update(active_component.constraint_vars[constraint])
+            frontier = reached - region_vars
+            region_vars |= frontier
+            if not frontier:
+                break
+
+        if len(region_vars) >= len(active_component.vars):
+            region = None
+        else:
+            constraints = [constraint for constraint in active_component.constraints \
+                if any(var in region_vars for var in active_component.constraint_vars[constraint])]
+            region = Component(self, sorted(region_vars), constraints, self.active_point)
+
+        active_component.local_regions[depth] = region
+
+        return region
+
     def geometry_to_vars(self):
         vars = []
 
@@ -150,132 +667,540 @@ class Solver:
             if self.links[i] == SPECIAL_LINK.BASE:
                 vars.append(value)
 
-        for arc in self.geometry.arcs:
+        for arc in self.arc_to_var:
             vars.append(arc.d)
 
         return vars
 
-    def geometry_from_vars(self, vars):
-        vars_i = 0
-        for i, _ in enumerate(self.values):
-            if self.links[i] == SPECIAL_LINK.BASE:
-                self.values[i] = vars[vars_i]
-                vars_i += 1
+    def geometry_from_vars(self, component, x):
+        # writes back only the variables of the component and the points and arcs that depend on them
+        vars = component.vars
 
-        for entity in (self.geometry.segments + self.geometry.arcs):
-            for point in entity.points():
-                id = self.point_to_id[point]
-                id_x, id_y = id * 2, id * 2 + 1
+        self.x[vars] = x
 
-                temp = (SPECIAL_LINK.BASE, SPECIAL_LINK.FIXED)
+        for var in vars:
+            if var in self.var_to_value:
+                self.values[self.var_to_value[var]] = self.x[var]
 
-                def helper(id):
-                    if self.links[id] in temp:
-                        return self.values[id]
-                    if self.links[self.links[id]] in temp:
-                        return self.values[self.links[id]]
-                    return None
+        if not self.geometry.store is None:
+            if not hasattr(component, 'store_indices'):
+                mask = np.isin(self.store_vars, vars)
+                component.store_indices, component.store_vars = self.store_indices[mask], self.store_vars[mask]
+            self.write_geometry(component.store_indices, self.x[component.store_vars])
+            return
 
-                x, y = helper(id_x), helper(id_y)
+        points = set()
 
-                point.x, point.y = point.x if x is None else x, point.y if y is None else y
+        for var in vars:
+            if var in self.var_to_value:
+                points.update(self.var_to_points.get(var, ()))
+            else:
+                self.write_geometry(self.var_to_arc[var], (self.x[var],))
 
-        for arc in self.geometry.arcs:
-            arc.d = vars[vars_i]
-            vars_i += 1
+        for point in points:
+            id = self.point_to_id[point]
+            self.write_geometry(point, (self.z_value(self.coordinate_source[id]), self.z_value(self.coordinate_source[id + 1])))
+
+    def geometry_from_layout(self):
+        # classes merged since the last solve may not be optimized at all (e.g. a lone horizontal segment),
+        # their points take the values of the classes here; the dragged point keeps its target
+        for point, id in self.point_to_id.items():
+            if not point is self.active_point:
+                self.write_geometry(point, (self.z_value(self.coordinate_source[id]), self.z_value(self.coordinate_source[id + 1])))
+
+    def write_geometry(self, target, values):
+        # target: store indices, a point or an arc
+        if threading.current_thread() is self.thread:
+            with self.condition:
+                self.deferred_writes.append((self.geometry.store, target, values))
+        elif isinstance(target, Point):
+            target.x, target.y = values
+        elif isinstance(target, Arc):
+            target.d = values[0]
+        else:
+            self.geometry.store.data[target] = values
+
+    def publish(self):
+        # makes the writes of the worker thread; called from the thread that owns the geometry, returns True
+        # if there were any. Writes into a store that was replaced since (e.g. a sketch was loaded) are dropped
+        with self.condition:
+            writes, self.deferred_writes = self.deferred_writes, []
+            for store, target, values in writes:
+                if store is self.geometry.store:
+                    self.write_geometry(target, values)
+
+        return len(writes) > 0
+
+    def set_active_point_values(self):
+        # the dragged point drives its classes unless they are fixed
+        id = self.point_to_id.get(self.active_point)
+
+        if id is None:
+            return
 
-    def f(self, x):
-        self.geometry_from_vars(x)
+        coordinates = list(self.target)
 
-        result = 0
+        for offset in (0, 1):
+            base_id = self.get_base_id(id + offset)
+            if self.links[base_id] == SPECIAL_LINK.BASE:
+                self.values[base_id] = coordinates[offset]
+                self.x[self.value_to_var[base_id]] = coordinates[offset]
+            else:
+                coordinates[offset] = self.values[base_id]
 
-        if not self.active_point is None:
-            result = distance_p2p(self.active_point, self.active_point_copy) ** 2
+        self.target = tuple(coordinates)
+        self.write_geometry(self.active_point, self.target)
 
-        # print (f'f: {result}')
+    def get_target(self):
+        return self.target
 
-        return result
+    # solving
 
-    def c(self, x):
-        f = []
+    def get_problem(self, component):
+        # SLSQP and Newton work on the batched numeric evaluation, IPOPT needs the traced problem
+        batched = self.solver_type in (SOLVER_TYPE.SLSQP, SOLVER_TYPE.NEWTON)
+        key = (batched, component.key)
 
-        self.geometry_from_vars(x)
+        problem = self.compiled_problems.pop(key, None)
 
-        for constraint in self.constraints:
-            # ignore all the constraints that do not depend on variables; it means they should be defined based on fixed points only
-            if constraint in self.inactive_constraints:
-                continue
+        if problem is None:
+            if batched:
+                problem = BatchedProblem(component)
+            else:
+                problem = CompiledProblem(component.f, len(component.vars), component.number_of_parameters, \
+                    constraints = {'type': 'eq', 'fun': component.c}, options = {'maxiter': 100, 'disp': False})
+            problem.reduced = self.reduced_problem(component, batched)
+
+        self.compiled_problems[key] = problem
+
+        while len(self.compiled_problems) > COMPILED_PROBLEMS_CACHE_SIZE:
+            self.compiled_problems.popitem(last = False)
+
+        return problem
+
+    def reduced_problem(self, component, batched):
+        # The problem in the shared directions of parallel and perpendicular segments (see Reparameterization),
+        # None if the component has no such group. The constraints that hold by construction are left out;
+        # the copy of the component keeps the layout of the parameters.
+        reparameterization = Reparameterization(component)
+
+        if not reparameterization.removed:
+            return None
+
+        inner = copy(component)
+        inner.constraints = reparameterization.remaining
+
+        if batched:
+            reduced = ReducedProblem(reparameterization, BatchedProblem(inner))
+        else:
+            reduced = CompiledProblem(lambda y, p: inner.f(reparameterization.expand_traced(y, p), p), reparameterization.n_reduced, \
+                component.number_of_parameters, constraints = {'type': 'eq', 'fun': lambda y, p: inner.c(reparameterization.expand_traced(y, p), p)}, \
+                options = {'maxiter': 100, 'disp': False})
+
+        reduced.reparameterization = reparameterization
+        return reduced
+
+    def solve_slsqp(self, problem, x0, p):
+        evaluations = [1]
+
+        # nothing to minimize and nothing to correct; SLSQP would still take a step and can fail on a degenerate jacobian
+        if problem.active_columns is None and np.max(np.abs(problem.constraints(x0, p)), initial = 0) <= SLSQP_SOLVED_TOLERANCE:
+            return OptimizeResult(x = np.array(x0, dtype = float), success = True, status = 0, message = 'Initial values satisfy the constraints.', \
+                nit = 0, nfev = 0, ncev = evaluations[0])
+
+        def constraints(x, p):
+            evaluations[0] += 1
+            return problem.constraints(x, p)
+
+        # exact gradients from the compiled problem instead of finite differences
+        solution = minimize(problem.objective, x0, args = (p,), jac = problem.objective_gradient, method = 'SLSQP', \
+            constraints = {'type' : 'eq', 'fun': constraints, 'jac': problem.constraints_jacobian, 'args': (p,)})
+        nfev = solution.nfev
+        # tangency-like constraints have a vanishing gradient when satisfied, which makes the exact
+        # jacobian singular; finite differences are noisy enough to get through such points
+        if not solution.success:
+            solution = minimize(problem.objective, x0, args = (p,), method = 'SLSQP', \
+                constraints = {'type' : 'eq', 'fun': constraints, 'args': (p,)}, options = {'eps' : 1e-05})
+            nfev += solution.nfev
+        solution.nfev, solution.ncev = nfev, evaluations[0]
+        # print (solution)
+        return solution
+
+    def solve_problem(self, problem, x0, p):
+        # a problem with a reduced form is solved in it, the solution is mapped back to the variables; Newton stays
+        # on the sparse full problem, the shared angles would couple every row of its normal equations
+        reduced = getattr(problem, 'reduced', None)
+        if not reduced is None and self.solver_type != SOLVER_TYPE.NEWTON:
+            reparameterization = reduced.reparameterization
+            solution = self.solve_problem(reduced, reparameterization.reduce(x0, p), p)
+            solution.x = reparameterization.expand(solution.x, p)
+            return solution
 
-            function = CONSTRAINT_FUNCTION[constraint.type]
+        if self.solver_type == SOLVER_TYPE.SLSQP:
+            return self.solve_slsqp(problem, x0, p)
+        elif self.solver_type == SOLVER_TYPE.NEWTON:
+            # Newton only follows the residuals down; far from a solution it can stop in a local minimum of them
+            solution = newton_minimize(problem, x0, p)
+            if solution.success:
+                return solution
+            fallback = self.solve_slsqp(problem, x0, p)
+            fallback.nit += solution.nit
+            fallback.nfev += solution.nfev
+            fallback.ncev += solution.ncev
+            return fallback
+        elif self.solver_type == SOLVER_TYPE.IPOPT:
+            return problem.solve(x0, p)
+
+    def solve_local(self, active_component):
+        # Local drag: only a region around the dragged point is solved, starting from the depth that worked in
+        # the last frame. A region that does not converge, or converges with the dragged point away from its
+        # target, is dropped and a deeper one is tried. Returns the residuals of the region that was written
+        # back, None if only the whole component will do.
+        instrumentation = self.instrumentation
 
-            if function is None:
-                continue
+        depth = active_component.local_depth
 
-            f += function(*constraint. entities)
+        while not depth is None:
+            region = self.local_region(active_component, depth)
 
-        # print (f'x: {x}')
-        # print (f'c [{len(f)}]: {f}')
-        # print (f'f: {f}')
+            if region is None:
+                break
 
-        return f
+            with instrumentation.stage('problem_construction'):
+                problem = self.get_problem(region)
+                p = region.parameters(self.z_value)
 
-    def detect_inactive_constraints(self):
-        def is_fixed_entity(entity):
-            if isinstance(entity, Point):
-                id = self.point_to_id[entity]
-                id_x, id_y = id * 2, id * 2 + 1
-                return self.links[self.get_base_id(id_x)] == SPECIAL_LINK.FIXED and self.links[self.get_base_id(id_y)] == SPECIAL_LINK.FIXED
-            elif isinstance(entity, Segment):
-                return is_fixed_entity(entity.p1) and is_fixed_entity(entity.p2)
-            else:
-                return False
+            with instrumentation.stage('numeric'):
+                solution = self.solve_problem(problem, self.x[region.vars], p)
 
-        inactive_constraints = set()
+            self.iterations += solution.get('nit', 0)
+            instrumentation.add('f_evaluations', solution.get('nfev', 0))
+            instrumentation.add('c_evaluations', solution.get('ncev', 0))
 
-        for constraint in self.constraints:
-            if constraint in inactive_constraints:
-                continue
-            if CONSTRAINT_FUNCTION[constraint.type] is None:
-                continue
-            if all(is_fixed_entity(entity) for entity in constraint.entities):
-                inactive_constraints.add(constraint)
+            residuals = np.asarray(problem.constraints(solution.x, p), dtype = float).flatten()
+            target_distance = distance_p2p(region.point_from_vars(self.active_point, solution.x, p), Point(p[0], p[1]))
 
-        return inactive_constraints
+            if solution.success and np.max(np.abs(residuals), initial = 0) <= LOCAL_DRAG_TOLERANCE and target_distance <= LOCAL_DRAG_TARGET_TOLERANCE:
+                with instrumentation.stage('write_back'):
+                    self.geometry_from_vars(region, solution.x)
+                active_component.local_depth = depth
+                instrumentation.add('local_region_vars', len(region.vars))
+                return residuals
+
+            depth *= LOCAL_DRAG_GROWTH
+
+        active_component.local_depth = None
+        return None
 
-    def solve(self, active_point):
+    def use_cached_solution(self, component, job, key):
+        # a cached solution that still satisfies the constraints is taken as it is (unless x0 does), otherwise it is the initial
+        # guess; a drag matches its target only on a grid, so the dragged point keeps its current target in
+        # the guess. Returns the job and the solution
+        problem, x0, p = job
+
+        x = self.solution_cache.get(key)
+
+        if x is None:
+            return job, None
+
+        x = x.copy()
+
+        if component.active_point is None:
+            # values that (nearly) solve the component already, e.g. restored by undo, are kept
+            if np.max(np.abs(np.asarray(problem.constraints(x0, p), dtype = float)), initial = 0) <= SOLUTION_CACHE_SOLVED_TOLERANCE:
+                return job, None
+            residuals = np.asarray(problem.constraints(x, p), dtype = float)
+            if np.max(np.abs(residuals), initial = 0) <= SOLUTION_CACHE_TOLERANCE:
+                return job, OptimizeResult(x = x, success = True, status = 0, message = 'Cached solution.', nit = 0, nfev = 0, ncev = 1)
+        else:
+            for is_var, index in component.point_source[component.active_point]:
+                if is_var:
+                    x[index] = x0[index]
+            # consecutive frames of a drag usually fall into one cell, the last frame is the better guess then
+            if np.linalg.norm(problem.constraints(x, p)) >= np.linalg.norm(problem.constraints(x0, p)):
+                return job, None
+
+        return (problem, x, p), None
+
+    def construct(self, component):
+        # Places the variables of a component that its constructive plan determines (see Construction) and
+        # returns what is left for the optimizer: the component itself, or the rest of it with the placed
+        # variables as inputs. If nothing is left, the solution comes along. Drags are left to the optimizer,
+        # the dragged point is a soft target there. Returns (component, solution, placed anything).
+        if not component.active_point is None:
+            return component, None, False
+
+        if not hasattr(component, 'construction'):
+            component.construction = Construction(component)
+            component.remainder = None
+            placed = set(component.construction.constructed)
+            if placed and len(placed) < len(component.vars):
+                component.remainder = Component(self, [var for i, var in enumerate(component.vars) if not i in placed], component.construction.remaining, None)
+                component.remainder.parts = [component]
+
+        construction = component.construction
+
+        if not construction.steps:
+            return component, None, False
+
+        p = component.parameters(self.z_value)
+        x = construction.place(self.x[component.vars], p)
+
+        if x is None:
+            return component, None, False
+
+        self.geometry_from_vars(component, np.array(x))
+        self.instrumentation.add('constructed_variables', len(construction.constructed))
+
+        if not component.remainder is None:
+            return component.remainder, None, True
+
+        residuals = np.asarray(self.get_problem(component).constraints(self.x[component.vars], p), dtype = float)
+        success = bool(np.max(np.abs(residuals), initial = 0) <= CONSTRUCTION_RESIDUAL_TOLERANCE)
+
+        return component, OptimizeResult(x = self.x[component.vars], success = success, status = 0 if success else 1, \
+            message = 'Constructed.', nit = 0, nfev = 0, ncev = 1), True
+
+    def solve_problems(self, jobs):
+        # jobs: [(problem, x0, p)]; jobs sharing a problem instance are never run concurrently
+        if self.max_workers <= 1 or len(jobs) <= 1:
+            return [self.solve_problem(*job) for job in jobs]
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers = self.max_workers)
+
+        problem_to_jobs = OrderedDict()
+        for i, job in enumerate(jobs):
+            problem_to_jobs.setdefault(job[0], []).append(i)
+
+        def solve_jobs(indices):
+            return [(i, self.solve_problem(*jobs[i])) for i in indices]
+
+        solutions = [None] * len(jobs)
+        for result in self.executor.map(solve_jobs, problem_to_jobs.values()):
+            for i, solution in result:
+                solutions[i] = solution
+
+        return solutions
+
+    def solve_async(self, active_point, x, y):
+        # drags active_point to (x, y); returns immediately, a request that was not picked up yet is replaced by
+        # this one. geometry_changed_callback is called from the worker thread, the results reach the geometry
+        # with publish()
+        with self.condition:
+            self.pending_request = (active_point, x, y)
+            self.condition.notify_all()
+
+        if self.thread is None:
+            self.thread = threading.Thread(target = self.solve_requests, daemon = True)
+            self.thread.start()
+
+    def solve_requests(self):
+        while True:
+            with self.condition:
+                while self.pending_request is None:
+                    self.condition.wait()
+                active_point, x, y = self.pending_request
+                self.pending_request = None
+                self.busy = True
+
+            try:
+                self.solve_now(active_point, target = (x, y))
+            except Exception as e:
+                print (str(e))
+
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def in_flight(self):
+        # True while the worker thread has a request to solve or is solving one
+        with self.condition:
+            return self.busy or not self.pending_request is None
+
+    def wait(self):
+        # blocks until the worker thread has nothing to do and publishes its results; solver state is only
+        # changed after that
+        with self.condition:
+            while self.busy or not self.pending_request is None:
+                self.condition.wait()
+
+        self.publish()
+
+    def solve(self, active_point, local = True, target = None):
+        # target: where active_point is dragged to, by default where it is; local = False solves the whole
+        # dragged component even in the local drag mode, e.g. when a drag ends
+        self.wait()
+        self.solve_now(active_point, local, target)
+
+    def update_substitution(self):
+        # coordinate classes and inactive constraints of the current topology
+        instrumentation = self.instrumentation
+
+        if self.topology_outdated():
+            self.structure_changed()
+            with instrumentation.stage('substitution'):
+                self.process_constraints_that_could_be_solved_by_substitution()
+            with instrumentation.stage('inactive_constraints'):
+                self.inactive_constraints = self.detect_inactive_constraints()
+
+    def update_layout(self):
+        instrumentation = self.instrumentation
+
+        self.update_substitution()
+
+        if self.layout_changed:
+            with instrumentation.stage('layout'):
+                self.build_variables_layout()
+                self.geometry_from_layout()
+            with instrumentation.stage('structural_analysis'):
+                self.structural_analysis = StructuralAnalysis(self)
+            with self.condition:
+                self.changed_entities = None
+
+        self.degrees_of_freedom = self.structural_analysis.degrees_of_freedom
+
+    def analyze(self):
+        # structural analysis of the current sketch without solving it
+        self.wait()
+        self.update_layout()
+        return self.structural_analysis
+
+    def find_dependent_constraints(self, constraints = None):
+        # redundant and conflicting constraints (all or only the given ones) at the current geometry, without solving
+        self.wait()
+        return DependencyAnalysis(self, constraints)
+
+    def report_changes(self, x_before):
+        # points and arcs whose variables moved in this solve, the dragged point always
+        changed = set() if self.active_point is None else {self.active_point}
+
+        for var in np.flatnonzero(np.abs(self.x - x_before) > CHANGE_TOLERANCE):
+            changed.update(self.var_to_points.get(var, ()))
+            if var in self.var_to_arc:
+                changed.add(self.var_to_arc[var])
+
+        with self.condition:
+            if not self.changed_entities is None:
+                self.changed_entities |= changed
+
+    def take_changed_entities(self):
+        # for the redraw: what moved since the last call, None if everything has to be redrawn
+        with self.condition:
+            changed, self.changed_entities = self.changed_entities, set()
+        return changed
+
+    def solve_now(self, active_point, local = True, target = None):
         if self.is_solving:
             return
 
         self.active_point = active_point
-        self.active_point_copy = copy(active_point)
+        if not active_point is None:
+            self.target = (active_point.x, active_point.y) if target is None else tuple(target)
 
-        self.process_constraints_that_could_be_solved_by_substitution()
-        self.inactive_constraints = self.detect_inactive_constraints()
+        instrumentation = self.instrumentation
 
-        self.constraints.inactive_constraints = len(self.inactive_constraints)
-        self.constraints.solved_by_substitution_constraints = len(list(filter(lambda i: i.type in (CONSTRAINT_TYPE.COINCIDENCE, CONSTRAINT_TYPE.VERTICALITY, CONSTRAINT_TYPE.HORIZONTALITY), self.constraints)))
-        self.constraints.fixed_constraints = len(list(filter(lambda i: i.type == CONSTRAINT_TYPE.FIXED, self.constraints)))
+        self.update_layout()
 
-        initial_guess = self.geometry_to_vars()
+        self.success, self.iterations, self.residual_norm = True, 0, 0.0
 
-        self.degrees_of_freedom = len(initial_guess)
+        x_before = self.x.copy()
 
-        if self.degrees_of_freedom == 0:
+        if self.number_of_variables == 0:
+            self.report_changes(x_before)
+            instrumentation.finish_solve()
             return
 
-        # print (f'initial_guess[{len(initial_guess)}]: {initial_guess}')
-
-        solution = None
+        self.set_active_point_values()
 
         self.is_solving = True
 
-        if self.solver_type == SOLVER_TYPE.SLSQP:
-            solution = minimize(self.f, initial_guess, method = 'SLSQP', constraints = {'type' : 'eq', 'fun': self.c}, options = {'eps' : 1e-05})
-            # print (solution)
-        elif self.solver_type == SOLVER_TYPE.IPOPT:
-            solution = casadi_minimize(self.f, initial_guess, constraints = {'type': 'eq', 'fun': self.c}, options = {'maxiter': 100, 'disp': False})
-            self.geometry_from_vars(solution.x)
+        # the dragged part and everything that is not in a solved state yet
+        active_component = self.get_active_component()
+
+        components = [] if active_component is None else [active_component]
+        components += [component for component in self.components if not component.solved and \
+            (active_component is None or not component in active_component.parts)]
+
+        try:
+            residuals = []
+
+            # a local drag keeps the dragged component solved as long as it was solved before
+            if not active_component is None and local and self.local_drag and all(part.solved for part in active_component.parts):
+                local_residuals = self.solve_local(active_component)
+                if not local_residuals is None:
+                    residuals.append(local_residuals)
+                    components.remove(active_component)
+            elif not active_component is None:
+                active_component.local_depth = LOCAL_DRAG_INITIAL_DEPTH
+
+            # what can be placed in closed form is placed, the optimizer gets the rest of every component
+            with instrumentation.stage('construction'):
+                constructed = [self.construct(component) for component in components]
+                originals, components = components, [component for component, _, _ in constructed]
+                solutions = [solution for _, solution, _ in constructed]
+
+            with instrumentation.stage('problem_construction'):
+                jobs = [(self.get_problem(component), self.x[component.vars], component.parameters(self.z_value)) for component in components]
+                keys = [component.solution_key(p) for component, (_, _, p) in zip(components, jobs)]
+
+            cached_solutions = 0
+
+            with instrumentation.stage('solution_cache'):
+                for i, (component, key) in enumerate(zip(components, keys)):
+                    if solutions[i] is None:
+                        jobs[i], solutions[i] = self.use_cached_solution(component, jobs[i], key)
+                        cached_solutions += not solutions[i] is None
+
+            instrumentation.add('cached_solutions', cached_solutions)
+
+            with instrumentation.stage('numeric'):
+                unsolved = [i for i, solution in enumerate(solutions) if solution is None]
+                for i, solution in zip(unsolved, self.solve_problems([jobs[i] for i in unsolved])):
+                    solutions[i] = solution
+
+                # a construction can take the root the rest of its component cannot live with, the whole
+                # component is solved from where it was then
+                for i, (component, solution) in enumerate(zip(originals, solutions)):
+                    if solution.success or not constructed[i][2]:
+                        continue
+                    self.x[component.vars] = x_before[component.vars]
+                    components[i] = component
+                    jobs[i] = (self.get_problem(component), self.x[component.vars], component.parameters(self.z_value))
+                    keys[i] = component.solution_key(jobs[i][2])
+                    solutions[i] = self.solve_problem(*jobs[i])
+
+            for (problem, _, p), component, solution, key in zip(jobs, components, solutions, keys):
+                with instrumentation.stage('write_back'):
+                    self.geometry_from_vars(component, solution.x)
+
+                if solution.success:
+                    self.solution_cache.put(key, solution.x)
+
+                for part in getattr(component, 'parts', [component]):
+                    part.solved = solution.success
+
+                self.success = self.success and bool(solution.success)
+                self.iterations += solution.get('nit', 0)
+                residuals.append(problem.constraints(solution.x, p))
+
+                instrumentation.add('f_evaluations', solution.get('nfev', 0))
+                instrumentation.add('c_evaluations', solution.get('ncev', 0))
+
+            self.residual_norm = float(np.linalg.norm(np.concatenate(residuals))) if residuals else 0.0
+        except Exception as e:
+            self.success = False
+            print (str(e))
 
         self.is_solving = False
 
-        self.geometry_changed_callback()
\ No newline at end of file
+        self.report_changes(x_before)
+
+        instrumentation.add('components', len(components))
+        instrumentation.add('iterations', self.iterations)
+        instrumentation.add('residual_norm', self.residual_norm)
+
+        with instrumentation.stage('callback'):
+            self.geometry_changed_callback()
+
+        instrumentation.finish_solve()
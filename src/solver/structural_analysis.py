@@ -0,0 +1,104 @@
+from collections import deque
+from enum import Enum, auto
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_bipartite_matching
+
+class CONSTRAINEDNESS(Enum):
+    UNDER   = auto()
+    WELL    = auto()
+    OVER    = auto()
+
+class StructuralAnalysis:
+    # Degrees of freedom from the structure of the problem only: equations (one per active constraint)
+    # against the solver variables they depend on. A maximum matching gives the structural rank, the
+    # Dulmage-Mendelsohn decomposition splits it into the over-determined part (reachable from unmatched
+    # equations), the under-determined part (reachable from unmatched variables) and the well-determined rest.
+    # Numeric degeneracies (e.g. a parallel constraint implied by two perpendicular ones) are not detected.
+    def __init__(self, solver):
+        self.solver = solver
+
+        n_vars = solver.number_of_variables
+        constraints = solver.active_constraints
+
+        equation_vars = [sorted(set(solver.entities_vars(constraint.entities))) for constraint in constraints]
+
+        rows = np.repeat(np.arange(len(constraints)), [len(vars) for vars in equation_vars]).astype(int)
+        columns = np.array([var for vars in equation_vars for var in vars], dtype = int)
+        graph = csr_matrix((np.ones(len(columns)), (rows, columns)), shape = (len(constraints), n_vars))
+
+        # equation -> matched var and var -> matched equation, -1 if unmatched
+        equation_match = maximum_bipartite_matching(graph, perm_type = 'column') if len(constraints) else np.zeros(0, dtype = int)
+        var_match = np.full(n_vars, -1)
+        for equation, var in enumerate(equation_match):
+            if var >= 0:
+                var_match[var] = equation
+
+        var_equations = [[] for _ in range(n_vars)]
+        for equation, vars in enumerate(equation_vars):
+            for var in vars:
+                var_equations[var].append(equation)
+
+        # over-determined: alternating paths from unmatched equations (any edge to a var, matched edge back)
+        over_equations = set(equation for equation, var in enumerate(equation_match) if var < 0)
+        over_vars = set()
+        queue = deque(over_equations)
+        while queue:
+            for var in equation_vars[queue.popleft()]:
+                if not var in over_vars:
+                    over_vars.add(var)
+                    equation = var_match[var]
+                    if equation >= 0 and not equation in over_equations:
+                        over_equations.add(equation)
+                        queue.append(equation)
+
+        # under-determined: alternating paths from unmatched vars
+        under_vars = set(var for var in range(n_vars) if var_match[var] < 0)
+        under_equations = set()
+        queue = deque(under_vars)
+        while queue:
+            for equation in var_equations[queue.popleft()]:
+                if not equation in under_equations:
+                    under_equations.add(equation)
+                    var = equation_match[equation]
+                    if var >= 0 and not var in under_vars:
+                        under_vars.add(var)
+                        queue.append(var)
+
+        self.rank = int(np.count_nonzero(equation_match >= 0))
+        self.degrees_of_freedom = n_vars - self.rank
+        self.redundant_equations = len(constraints) - self.rank
+
+        self.over_constrained_constraints = [constraints[equation] for equation in sorted(over_equations)]
+
+        self.var_status = {}
+        for var in range(n_vars):
+            self.var_status[var] = CONSTRAINEDNESS.OVER if var in over_vars else \
+                CONSTRAINEDNESS.UNDER if var in under_vars else CONSTRAINEDNESS.WELL
+
+        # per component: (component, remaining degrees of freedom, number of redundant equations)
+        self.components = []
+        for component in solver.components:
+            matched = np.count_nonzero(var_match[component.vars] >= 0)
+            equations = len(component.constraints)
+            self.components.append((component, len(component.vars) - matched, equations - matched))
+
+        # vars that no active constraint touches are free on their own
+        self.free_vars = sum(1 for vars in var_equations if not vars)
+
+        self.entity_status = {}
+        for entity in solver.entities:
+            for point in entity.points():
+                self.entity_status[point] = self.status(solver.entities_vars([point]))
+            self.entity_status[entity] = self.status(solver.entities_vars([entity]))
+
+    def status(self, vars):
+        # an entity is over-constrained if any of its vars is, under-constrained if any can still move
+        statuses = set(self.var_status[var] for var in vars)
+        for status in (CONSTRAINEDNESS.OVER, CONSTRAINEDNESS.UNDER):
+            if status in statuses:
+                return status
+        return CONSTRAINEDNESS.WELL
+
+    def is_well_constrained(self):
+        return self.degrees_of_freedom == 0 and self.redundant_equations == 0
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the sources are run from src/ (python src/main.py) and import each other relative to it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,60 @@
+import time
+import numpy as np
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import Solver
+
+def chain(count):
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    geometry.segments += [Segment(Point(100 * i, 0), Point(100 * (i + 1), 0)) for i in range(count)]
+    for s1, s2 in zip(geometry.segments, geometry.segments[1:]):
+        constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+    for segment in geometry.segments:
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, 100])
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [geometry.segments[0].p1])
+    return geometry, constraints
+
+def drain(solver):
+    while solver.in_flight():
+        time.sleep(0.001)
+
+def test_worker_leaves_the_geometry_to_publish():
+    geometry, constraints = chain(4)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    point = geometry.segments[-1].p2
+
+    for target in ((350, 50), (300, 150), (250, 200)):
+        data = geometry.store.data.copy()
+        solver.solve_async(point, *target)
+        drain(solver)
+
+        # nothing is written until the thread that owns the geometry publishes
+        assert np.array_equal(geometry.store.data, data)
+        assert solver.publish()
+        assert np.hypot(point.x - target[0], point.y - target[1]) < 1e-2
+
+    # the same drag solved on this thread ends in the same place
+    expected = geometry.store.data[:geometry.store.size].copy()
+    other, other_constraints = chain(4)
+    other_solver = Solver(other, lambda: None, other_constraints)
+    other_solver.solve(None)
+    for target in ((350, 50), (300, 150), (250, 200)):
+        other_solver.solve(other.segments[-1].p2, target = target)
+    assert np.allclose(other.store.data[:other.store.size], expected, atol = 1e-6)
+
+def test_latest_target_wins():
+    geometry, constraints = chain(3)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    point = geometry.segments[-1].p2
+
+    for i in range(20):
+        solver.solve_async(point, 250 - i, 20 + 5 * i)
+
+    # wait() publishes what the worker solved last
+    solver.wait()
+    assert np.hypot(point.x - 231, point.y - 115) < 1e-2
+    assert solver.success
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from batch_solve import solve_sketch
+from constraints.constraints import Constraints
+from examples.examples import Slot, generators
+from geometry import Geometry
+from sketch.sketch_file import SKETCH_BINARY_EXTENSION, save_sketch
+from solver.batched_problem import BatchedProblem
+from solver.solver import SOLVER_TYPE, Solver
+
+def slot_solver(solver_type, array_backed = True):
+    geometry, constraints = Geometry(array_backed = array_backed), Constraints()
+    Slot(geometry, constraints)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(solver_type)
+    return geometry, solver
+
+def residual_norm(solver):
+    return max(np.max(np.abs(BatchedProblem(component).constraints(solver.x[component.vars], component.parameters(solver.z_value))), initial = 0) \
+        for component in solver.components)
+
+def test_end_tangency_rows_do_not_vanish_when_satisfied():
+    # the segments of the slot end on the arcs, the distance form of the tangency has a zero gradient there
+    _, solver = slot_solver(SOLVER_TYPE.SLSQP)
+    solver.solve(None)
+
+    for component in solver.components:
+        problem = BatchedProblem(component)
+        x, p = solver.x[component.vars], component.parameters(solver.z_value)
+
+        assert np.max(np.abs(problem.constraints(x, p))) < 1e-9
+        assert np.all(np.linalg.norm(problem.constraints_jacobian(x, p), axis = 1) > 1e-3)
+
+@pytest.mark.parametrize('array_backed', [False, True])
+def test_slot_with_slsqp(array_backed):
+    geometry, solver = slot_solver(SOLVER_TYPE.SLSQP, array_backed)
+
+    solver.solve(None)
+    assert residual_norm(solver) < 1e-9
+
+    point = geometry.segments[0].p1
+    for _ in range(10):
+        point.x, point.y = point.x + 5, point.y + 3
+        solver.solve(point)
+        assert residual_norm(solver) < 1e-6
+
+@pytest.mark.parametrize('extension', ['.json', SKETCH_BINARY_EXTENSION])
+def test_batch_solve_slot_with_slsqp(tmp_path, extension):
+    geometry, constraints = Geometry(), Constraints()
+    Slot(geometry, constraints)
+    path = str(tmp_path / f'Slot{extension}')
+    save_sketch(path, geometry, constraints)
+
+    result = solve_sketch(path, SOLVER_TYPE.SLSQP, None, False)
+
+    assert result['success'], result
+    assert result['residual_norm'] < 1e-9
+
+@pytest.mark.parametrize('generator', generators, ids = lambda generator: generator.__name__)
+def test_batched_residuals_match_traced(generator):
+    geometry, constraints = Geometry(), Constraints()
+    generator(geometry, constraints, 4)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+
+    random = np.random.default_rng(0)
+
+    for component in solver.components:
+        problem = BatchedProblem(component)
+        x, p = solver.x[component.vars] + random.standard_normal(len(component.vars)), component.parameters(solver.z_value)
+
+        traced = np.array([float(value) for value in component.c(x, p)])
+        assert np.allclose(problem.constraints(x, p)[np.argsort(problem.row_constraints)], traced)
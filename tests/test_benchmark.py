@@ -0,0 +1,17 @@
+import pytest
+from benchmark import run_case
+from examples.examples import generators, mixed_profile, tangent_slots
+from solver.solver import SOLVER_TYPE
+
+CASES = [(generator, 5, solver_type) for generator in generators for solver_type in SOLVER_TYPE] + [
+    (mixed_profile, 20, SOLVER_TYPE.IPOPT),
+    (tangent_slots, 20, SOLVER_TYPE.SLSQP),
+]
+
+@pytest.mark.parametrize('generator, num, solver_type', CASES, ids = lambda value: getattr(value, '__name__', getattr(value, 'name', str(value))))
+def test_generated_sketches_solve_and_drag(generator, num, solver_type):
+    result = run_case(generator, num, solver_type)
+
+    assert result['first_solve_success']
+    assert result['drag']['failures'] == 0
+    assert result['dependency_check'] > 0
@@ -0,0 +1,50 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import Solver
+
+def sketch():
+    # two segments with a length each, nothing in common
+    geometry, constraints = Geometry(), Constraints()
+    geometry.segments += [Segment(Point(0, 0), Point(100, 0)), Segment(Point(0, 50), Point(100, 80))]
+    for segment in geometry.segments:
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, 80])
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def test_layout_rebuild_reports_everything():
+    geometry, constraints, solver = sketch()
+
+    solver.solve(None)
+
+    assert solver.take_changed_entities() is None
+    assert solver.take_changed_entities() == set()
+
+def test_drag_reports_the_moved_points_only():
+    geometry, constraints, solver = sketch()
+    s1, s2 = geometry.segments
+    solver.solve(None)
+    solver.take_changed_entities()
+
+    s1.p2.x, s1.p2.y = s1.p2.x + 10, s1.p2.y + 20
+    solver.solve(s1.p2)
+
+    changed = solver.take_changed_entities()
+    assert s1.p2 in changed
+    assert not set(s2.points()) & changed
+
+    # nothing moves in a solve of the solved sketch, the dragged point is reported anyway
+    solver.solve(s1.p2)
+    assert solver.take_changed_entities() == {s1.p2}
+
+def test_changes_accumulate_until_taken():
+    geometry, constraints, solver = sketch()
+    s1, s2 = geometry.segments
+    solver.solve(None)
+    solver.take_changed_entities()
+
+    for segment in geometry.segments:
+        segment.p2.x, segment.p2.y = segment.p2.x + 10, segment.p2.y - 10
+        solver.solve(segment.p2)
+
+    assert {s1.p2, s2.p2} <= solver.take_changed_entities()
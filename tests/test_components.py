@@ -0,0 +1,46 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import Solver
+
+def sketch():
+    # two segments with a length each, nothing in common
+    geometry, constraints = Geometry(), Constraints()
+    geometry.segments += [Segment(Point(0, 0), Point(100, 0)), Segment(Point(0, 50), Point(100, 80))]
+    for segment, length in zip(geometry.segments, (80, 60)):
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, length])
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def test_independent_parts_are_separate_components():
+    geometry, constraints, solver = sketch()
+    s1, s2 = geometry.segments
+
+    solver.solve(None)
+
+    assert abs(s1.length() - 80) < 1e-6 and abs(s2.length() - 60) < 1e-6
+    components = solver.find_components()
+    assert len(components) == 2
+    assert {tuple(constraint.entities[0] for constraint in component.constraints) for component in components} == {(s1,), (s2,)}
+
+def test_drag_leaves_other_components_alone():
+    geometry, constraints, solver = sketch()
+    s1, s2 = geometry.segments
+    solver.solve(None)
+    other = [(point.x, point.y) for point in s2.points()]
+
+    s1.p2.x, s1.p2.y = s1.p2.x + 10, s1.p2.y + 20
+    solver.solve(s1.p2)
+
+    assert abs(s1.length() - 80) < 1e-6
+    assert [(point.x, point.y) for point in s2.points()] == other
+
+def test_constraint_between_parts_joins_them():
+    geometry, constraints, solver = sketch()
+    s1, s2 = geometry.segments
+    constraints.add_constraint(CONSTRAINT_TYPE.PARALLELITY, [s1, s2])
+
+    solver.solve(None)
+
+    components = solver.find_components()
+    assert len(components) == 1 and len(components[0].constraints) == 3
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from examples.examples import rectangle_grid
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.batched_problem import BatchedProblem
+from solver.construction import Construction
+from solver.solver import Solver
+
+def triangle(apex, length):
+    # fixed base, the apex at the given length from both ends of it
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    geometry.segments += [Segment(Point(0, 0), Point(100, 0)), Segment(Point(0, 0), Point(*apex)), Segment(Point(100, 0), Point(*apex))]
+    base, left, right = geometry.segments
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [base.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [base.p2])
+    constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [base.p1, left.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [base.p2, right.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [left.p2, right.p2])
+    constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [left, length])
+    constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [right, length])
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def test_placement_satisfies_a_fully_constructible_sketch():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    rectangle_grid(geometry, constraints, 6)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.update_layout()
+
+    for component in solver.components:
+        construction = Construction(component)
+        assert sorted(construction.constructed) == list(range(len(component.vars)))
+        assert not construction.remaining
+
+        p = component.parameters(solver.z_value)
+        x = solver.x[component.vars] + np.random.default_rng(0).uniform(-3, 3, len(component.vars))
+        assert np.max(np.abs(BatchedProblem(component).constraints(construction.place(x, p), p))) <= 1e-9
+
+    solver.solve(None)
+    assert solver.success
+    assert sum(solver.instrumentation.samples['constructed_variables']) > 0
+
+@pytest.mark.parametrize('side', [1, -1])
+def test_the_root_closer_to_the_current_values_is_taken(side):
+    geometry, constraints, solver = triangle((40, 30 * side), 80)
+
+    solver.solve(None)
+
+    apex = geometry.segments[1].p2
+    assert solver.success
+    assert np.allclose((apex.x, apex.y), (50, side * np.sqrt(80 ** 2 - 50 ** 2)))
+
+def test_construction_without_a_real_solution_is_left_to_the_optimizer():
+    geometry, constraints, solver = triangle((40, 30), 40)
+    solver.update_layout()
+    component, = solver.components
+    construction = Construction(component)
+
+    assert [step[0] for step in construction.steps] == ['circle_circle']
+    assert construction.place(solver.x[component.vars], component.parameters(solver.z_value)) is None
+
+    solver.solve(None)
+    assert not solver.success
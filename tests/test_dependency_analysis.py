@@ -0,0 +1,127 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from examples.examples import rectangle_grid
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import Solver
+
+def sketch(*segments):
+    geometry, constraints = Geometry(), Constraints()
+    geometry.segments += [Segment(Point(*p1), Point(*p2)) for p1, p2 in segments]
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def add(solver, type, entities):
+    # what the GUI does: the solver is told about the constraints before they are checked
+    new_constraints = solver.constraints.add_constraint(type, entities)
+    solver.constraints_added(new_constraints)
+    return new_constraints, solver.find_dependent_constraints(new_constraints)
+
+def test_coincidence_of_fixed_points_apart_is_conflicting():
+    geometry, constraints, solver = sketch(((0, 0), (100, 0)), ((0, 50), (100, 50)))
+    p, q = geometry.segments[0].p1, geometry.segments[1].p1
+    fixed_p, _ = add(solver, CONSTRAINT_TYPE.FIXED, [p])
+    fixed_q, _ = add(solver, CONSTRAINT_TYPE.FIXED, [q])
+
+    (coincidence,), analysis = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [p, q])
+
+    assert analysis.conflicting_constraints == [coincidence]
+    assert set(analysis.dependent_set(coincidence)) == {coincidence, *fixed_p, *fixed_q}
+    # the fixed points are not moved by the analysis, nor by the solve after the rejection
+    assert (p.x, p.y, q.x, q.y) == (0, 0, 0, 50)
+    constraints.remove(coincidence)
+    solver.constraint_removed(coincidence)
+    solver.solve(None)
+    assert (p.x, p.y, q.x, q.y) == (0, 0, 0, 50)
+
+def test_coincidence_of_fixed_points_in_place_is_redundant():
+    geometry, constraints, solver = sketch(((0, 0), (100, 0)), ((0, 0), (100, 50)))
+    p, q = geometry.segments[0].p1, geometry.segments[1].p1
+    add(solver, CONSTRAINT_TYPE.FIXED, [p])
+    add(solver, CONSTRAINT_TYPE.FIXED, [q])
+
+    (coincidence,), analysis = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [p, q])
+
+    assert analysis.redundant_constraints == [coincidence]
+    assert not analysis.conflicting_constraints
+
+def test_coincidence_of_points_already_aligned_is_accepted():
+    geometry, constraints, solver = sketch(((0, 0), (0, 100)), ((0, 100), (100, 100)))
+    s1, s2 = geometry.segments
+    add(solver, CONSTRAINT_TYPE.VERTICALITY, [s1])
+
+    _, analysis = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+
+    assert not analysis.dependencies
+
+def test_horizontality_that_makes_parallelity_constant_is_redundant():
+    geometry, constraints, solver = sketch(((0, 0), (100, 10)), ((0, 50), (100, 70)))
+    s1, s2 = geometry.segments
+    (parallelity,), _ = add(solver, CONSTRAINT_TYPE.PARALLELITY, [s1, s2])
+    (horizontality1,), analysis = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s1])
+    assert not analysis.dependencies
+
+    (horizontality2,), analysis = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s2])
+
+    assert analysis.redundant_constraints == [horizontality2]
+    assert set(analysis.dependent_set(horizontality2)) == {horizontality2, parallelity, horizontality1}
+
+def test_parallelity_of_horizontal_segments_names_the_horizontalities():
+    geometry, constraints, solver = sketch(((0, 0), (100, 10)), ((0, 50), (100, 70)))
+    s1, s2 = geometry.segments
+    (horizontality1,), _ = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s1])
+    (horizontality2,), _ = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s2])
+
+    (parallelity,), analysis = add(solver, CONSTRAINT_TYPE.PARALLELITY, [s1, s2])
+
+    assert analysis.redundant_constraints == [parallelity]
+    assert analysis.dependent_set(parallelity) == [parallelity, horizontality1, horizontality2]
+
+def test_length_between_fixed_points_is_checked():
+    geometry, constraints, solver = sketch(((0, 0), (100, 0)))
+    segment, = geometry.segments
+    fixes = [add(solver, CONSTRAINT_TYPE.FIXED, [point])[0][0] for point in segment.points()]
+
+    (length,), analysis = add(solver, CONSTRAINT_TYPE.LENGTH, [segment, 80])
+
+    assert analysis.conflicting_constraints == [length]
+    assert analysis.dependent_set(length) == [length] + fixes
+
+def test_horizontality_closing_a_chain_is_redundant():
+    geometry, constraints, solver = sketch(((0, 0), (100, 0)), ((100, 0), (200, 0)), ((0, 0), (200, 0)))
+    s1, s2, s3 = geometry.segments
+    h1, _ = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s1])
+    h2, _ = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s2])
+    c1, _ = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+    c2, _ = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [s1.p1, s3.p1])
+    c3, _ = add(solver, CONSTRAINT_TYPE.COINCIDENCE, [s2.p2, s3.p2])
+
+    (horizontality,), analysis = add(solver, CONSTRAINT_TYPE.HORIZONTALITY, [s3])
+
+    assert analysis.redundant_constraints == [horizontality]
+    assert set(analysis.dependent_set(horizontality)) == {horizontality, *h1, *h2, *c1, *c2, *c3}
+
+def test_independent_constraints_are_accepted():
+    geometry, constraints, solver = sketch(((0, 0), (100, 10)), ((0, 50), (100, 70)))
+    s1, s2 = geometry.segments
+    for type, entities in ((CONSTRAINT_TYPE.HORIZONTALITY, [s1]), (CONSTRAINT_TYPE.PARALLELITY, [s1, s2]),
+                           (CONSTRAINT_TYPE.FIXED, [s1.p1]), (CONSTRAINT_TYPE.LENGTH, [s2, 50])):
+        _, analysis = add(solver, type, entities)
+        assert not analysis.dependencies
+
+def test_checked_constraints_agree_with_the_whole_sketch():
+    geometry, constraints = Geometry(), Constraints()
+    rectangle_grid(geometry, constraints, 4)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    s1, s2 = geometry.segments[0], geometry.segments[5]
+    checked = constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [s1, s1.length()]) + constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [s1, 37]) \
+        + constraints.add_constraint(CONSTRAINT_TYPE.PARALLELITY, [s1, s2]) + constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p1, s2.p2]) \
+        + constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [s1.p1])
+    solver.constraints_added(checked)
+
+    whole = solver.find_dependent_constraints()
+
+    assert whole.dependencies
+    for constraint in list(constraints) * 2:
+        # the second time round the factorizations kept with the components are reused
+        assert solver.find_dependent_constraints([constraint]).dependencies == [dependency for dependency in whole.dependencies if dependency[0] is constraint]
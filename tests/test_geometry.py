@@ -0,0 +1,88 @@
+import numpy as np
+from constraints.constraints import Constraints
+from examples.examples import CutSlot
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import CoordinateStore, Geometry
+from solver.solver import Solver
+
+def test_points_are_handles_into_the_store():
+    store = CoordinateStore(capacity = 4)
+    points = [Point(i, 10 * i) for i in range(5)]
+
+    # the store grows past its capacity, the points attached before follow the new array
+    indices = [store.attach(point, 2) for point in points]
+
+    assert indices == list(range(0, 10, 2))
+    assert all(point.buffer is store.data for point in points)
+    assert np.array_equal(store.data[:store.size], [coordinate for i in range(5) for coordinate in (i, 10 * i)])
+    assert store.attach(points[2], 2) == 4
+
+    points[3].y = -1
+    store.data[0] = 7
+    assert store.data[7] == -1 and points[0].x == 7
+
+def test_array_backed_geometry_solves_like_the_plain_one():
+    solutions = []
+    for array_backed in (False, True):
+        geometry, constraints = Geometry(array_backed = array_backed), Constraints()
+        CutSlot(geometry, constraints)
+        geometry.segments[1].p2.x += 7
+
+        solver = Solver(geometry, lambda: None, constraints)
+        solver.solve(None)
+
+        solutions.append([coordinate for entity in geometry.segments + geometry.arcs for point in entity.points() for coordinate in (point.x, point.y)] \
+            + [arc.d for arc in geometry.arcs])
+
+        if array_backed:
+            store = geometry.store
+            # every point and arc reads its values from the store the solver writes to
+            assert all(point.buffer is store.data for entity in geometry.segments + geometry.arcs for point in entity.points())
+            assert all(arc.buffer is store.data for arc in geometry.arcs)
+
+    assert np.allclose(solutions[0], solutions[1], atol = 1e-6)
+
+def test_entities_added_later_are_attached():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    geometry.segments.append(Segment(Point(0, 0), Point(100, 0)))
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+
+    segment = Segment(Point(0, 50), Point(100, 50))
+    geometry.segments.append(segment)
+    solver.entity_added(segment)
+    solver.solve(None)
+
+    assert segment.p1 in geometry.store and segment.p2 in geometry.store
+    assert (segment.p2.x, segment.p2.y) == (100, 50)
+
+def test_slots_of_removed_entities_are_reused():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    geometry.segments.append(Segment(Point(0, 0), Point(100, 0)))
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    size = geometry.store.size
+
+    # an add/delete session does not grow the store
+    for i in range(20):
+        segment = Segment(Point(0, i), Point(100, i))
+        geometry.segments.append(segment)
+        solver.entity_added(segment)
+        solver.solve(None)
+
+        geometry.remove_entity(segment)
+        solver.entity_removed(segment)
+        solver.solve(None)
+
+    assert geometry.store.size == size + 4
+
+    # a released point keeps its values, and comes back to its old slot
+    geometry.release()
+    assert not segment.p1 in geometry.store and (segment.p1.x, segment.p1.y) == (0, 19)
+    index = geometry.store.released[segment.p1]
+    assert geometry.store.owners[index:index + 2] == [None, None]
+    geometry.segments.append(segment)
+    solver.entity_added(segment)
+    assert geometry.store.handles[id(segment.p1)][1] == index and (segment.p1.x, segment.p1.y) == (0, 19)
+    assert geometry.store.owners[index:index + 2] == [segment.p1, segment.p1]
@@ -0,0 +1,93 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from sketch.history import History, OPERATION
+from solver.solver import Solver
+
+def polyline(count):
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    geometry.segments += [Segment(Point(100 * i, 10 * i), Point(100 * (i + 1), 10 * (i + 1))) for i in range(count)]
+    for s1, s2 in zip(geometry.segments, geometry.segments[1:]):
+        constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+    for segment in geometry.segments:
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, 100])
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    return geometry, constraints, solver, History(geometry, constraints, solver)
+
+def remove(geometry, constraints, solver, history, entities):
+    # what the GUI does on delete: removals are recorded before they are made
+    for constraint in constraints.get_useless_constraints([point for entity in entities for point in [entity] + entity.points()]):
+        history.record(OPERATION.REMOVE_CONSTRAINT, constraint)
+        constraints.remove(constraint)
+        solver.constraint_removed(constraint)
+    for entity in entities:
+        history.record(OPERATION.REMOVE_ENTITY, entity)
+        geometry.remove_entity(entity)
+        solver.entity_removed(entity)
+    history.commit()
+
+def test_undo_puts_removed_entities_and_constraints_back_in_place():
+    geometry, constraints, solver, history = polyline(5)
+    segments, sketch_constraints = list(geometry.segments), list(constraints)
+
+    remove(geometry, constraints, solver, history, [segments[1], segments[3]])
+    assert len(geometry.segments) == 3 and len(constraints) < len(sketch_constraints)
+    remaining = list(constraints)
+
+    for _ in range(2):
+        history.undo()
+        assert geometry.segments == segments
+        assert list(constraints) == sketch_constraints
+        assert constraints.constraints_of(segments[1]) == [constraint for constraint in sketch_constraints if segments[1] in constraint.entities]
+
+        history.redo()
+        assert geometry.segments == [segments[0], segments[2], segments[4]]
+        assert list(constraints) == remaining
+
+    history.undo()
+    solver.solve(None)
+    assert solver.success
+
+def test_undo_of_a_removed_constraint_keeps_the_order():
+    geometry, constraints, solver, history = polyline(3)
+    sketch_constraints = list(constraints)
+
+    for constraint in (sketch_constraints[0], sketch_constraints[3]):
+        history.record(OPERATION.REMOVE_CONSTRAINT, constraint)
+        constraints.remove(constraint)
+        solver.constraint_removed(constraint)
+    history.commit()
+
+    history.undo()
+
+    assert list(constraints) == sketch_constraints
+    assert constraints.constraints_of_type(CONSTRAINT_TYPE.LENGTH) == sketch_constraints[2:]
+
+def test_undo_across_reused_slots():
+    geometry, constraints, solver, history = polyline(3)
+    removed = geometry.segments[2]
+    values = (removed.p2.x, removed.p2.y)
+    remove(geometry, constraints, solver, history, [removed])
+
+    # the new segment takes the slots of the removed one
+    added = Segment(Point(0, 500), Point(100, 500))
+    geometry.segments.append(added)
+    history.record(OPERATION.ADD_ENTITY, added)
+    solver.entity_added(added)
+    solver.solve(None)
+    history.commit()
+    size = geometry.store.size
+    assert not removed.p2 in geometry.store
+
+    for _ in range(2):
+        history.undo()
+        history.undo()
+        assert geometry.segments[2] is removed and (removed.p2.x, removed.p2.y) == values
+
+        history.redo()
+        history.redo()
+        assert geometry.segments[2] is added and (added.p2.x, added.p2.y) == (100, 500)
+
+    assert geometry.store.size == size
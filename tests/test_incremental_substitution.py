@@ -0,0 +1,70 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import SPECIAL_LINK, Solver
+
+def state(solver):
+    # coordinate classes as sets of (point, 0 for x or 1 for y), the fixed ones, and the inactive constraints
+    classes = {}
+    for point, id in solver.point_to_id.items():
+        for offset in range(2):
+            classes.setdefault(solver.get_base_id(id + offset), set()).add((point, offset))
+    fixed = {frozenset(members) for base, members in classes.items() if solver.links[base] == SPECIAL_LINK.FIXED}
+    return {frozenset(members) for members in classes.values()}, fixed, set(solver.inactive_constraints)
+
+def fresh_state(geometry, constraints):
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.process_constraints_that_could_be_solved_by_substitution()
+    solver.inactive_constraints = solver.detect_inactive_constraints()
+    return state(solver)
+
+def test_incremental_updates_match_a_fresh_solver():
+    geometry, constraints = Geometry(), Constraints()
+    geometry.segments += [Segment(Point(0, 0), Point(100, 10)), Segment(Point(100, 0), Point(200, 30)), Segment(Point(0, 50), Point(100, 60))]
+    s1, s2, s3 = geometry.segments
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+
+    def added(type, entities):
+        new_constraints = constraints.add_constraint(type, entities)
+        solver.constraints_added(new_constraints)
+        return new_constraints
+
+    steps = [
+        lambda: added(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1]),
+        lambda: added(CONSTRAINT_TYPE.HORIZONTALITY, [s1]),
+        lambda: added(CONSTRAINT_TYPE.FIXED, [s1.p1]),
+        lambda: added(CONSTRAINT_TYPE.PERPENDICULARITY, [s1, s3]),
+        lambda: added(CONSTRAINT_TYPE.LENGTH, [s2, 100]),
+        lambda: added(CONSTRAINT_TYPE.VERTICALITY, [s3]),
+        lambda: added(CONSTRAINT_TYPE.COINCIDENCE, [s3.p1, s1.p1]),
+        # fix the other ends of s1 and s3 too, the PERPENDICULARITY becomes inactive
+        lambda: added(CONSTRAINT_TYPE.FIXED, [s2.p1]),
+        lambda: added(CONSTRAINT_TYPE.FIXED, [s3.p2]),
+    ]
+
+    for step in steps:
+        step()
+        assert not solver.rebuild_required
+        assert state(solver) == fresh_state(geometry, constraints)
+
+    perpendicularity, = [constraint for constraint in constraints if constraint.type == CONSTRAINT_TYPE.PERPENDICULARITY]
+    assert perpendicularity in solver.inactive_constraints
+
+    s4 = Segment(Point(200, 30), Point(300, 0))
+    geometry.segments.append(s4)
+    solver.entity_added(s4)
+    assert state(solver) == fresh_state(geometry, constraints)
+
+    added(CONSTRAINT_TYPE.PARALLELITY, [s1, s4])
+    assert state(solver) == fresh_state(geometry, constraints)
+
+    length, = [constraint for constraint in constraints if constraint.type == CONSTRAINT_TYPE.LENGTH]
+    constraints.remove(length)
+    solver.constraint_removed(length)
+    assert state(solver) == fresh_state(geometry, constraints)
+
+    # the incremental state is the one solved
+    solver.solve(None)
+    assert abs(s1.p2.y - s1.p1.y) < 1e-6 and abs(s4.p2.y - s4.p1.y) < 1e-6
@@ -0,0 +1,53 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import LOCAL_DRAG_INITIAL_DEPTH, LOCAL_DRAG_TARGET_TOLERANCE, Solver
+
+LINKS = 30
+
+def rope():
+    # slack zigzag of segments with a length each, joined by coincidences, the first end fixed
+    geometry, constraints = Geometry(), Constraints()
+    corners = [(10 * i, 8 * (i % 2)) for i in range(LINKS + 1)]
+    geometry.segments += [Segment(Point(*p1), Point(*p2)) for p1, p2 in zip(corners, corners[1:])]
+    for segment in geometry.segments:
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, segment.length()])
+    for s1, s2 in zip(geometry.segments, geometry.segments[1:]):
+        constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [geometry.segments[0].p1])
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.local_drag = True
+    solver.solve(None)
+    return geometry, constraints, solver
+
+def lengths_error(geometry, constraints):
+    return max(abs(constraint.entities[0].length() - constraint.entities[1]) for constraint in constraints if constraint.type == CONSTRAINT_TYPE.LENGTH)
+
+def test_local_drag_moves_only_the_links_near_the_point():
+    geometry, constraints, solver = rope()
+    end = geometry.segments[-1].p2
+    far = [(point.x, point.y) for segment in geometry.segments[:LINKS // 2] for point in segment.points()]
+
+    target = (end.x + 3, end.y + 4)
+    end.x, end.y = target
+    solver.solve(end)
+
+    assert abs(end.x - target[0]) <= LOCAL_DRAG_TARGET_TOLERANCE and abs(end.y - target[1]) <= LOCAL_DRAG_TARGET_TOLERANCE
+    assert lengths_error(geometry, constraints) < 1e-4
+    assert [(point.x, point.y) for segment in geometry.segments[:LINKS // 2] for point in segment.points()] == far
+
+def test_region_grows_until_the_target_is_reached():
+    geometry, constraints, solver = rope()
+    end = geometry.segments[-1].p2
+
+    # more than the slack of the links near the end
+    target = (end.x + 40, end.y)
+    end.x, end.y = target
+    solver.solve(end)
+
+    assert abs(end.x - target[0]) <= LOCAL_DRAG_TARGET_TOLERANCE and abs(end.y - target[1]) <= LOCAL_DRAG_TARGET_TOLERANCE
+    assert lengths_error(geometry, constraints) < 1e-4
+    # the depth that worked is where the next frame starts
+    depth = solver.get_active_component().local_depth
+    assert depth is None or depth > LOCAL_DRAG_INITIAL_DEPTH
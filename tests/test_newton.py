@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from examples.examples import chain, mixed_profile
+from geometry import Geometry
+from solver import newton
+from solver.batched_problem import BatchedProblem
+from solver.newton import NEWTON_TOLERANCE, newton_minimize
+from solver.solver import SOLVER_TYPE, Solver
+
+def disturbed_component(generator, num):
+    # the largest component of the sketch, its variables moved away from the solution
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    generator(geometry, constraints, num)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.update_layout()
+    component = max(solver.components, key = lambda component: len(component.constraints))
+    x = solver.x[component.vars] + np.random.default_rng(1).uniform(-3, 3, len(component.vars))
+    return BatchedProblem(component), x, component.parameters(solver.z_value)
+
+@pytest.mark.parametrize('generator', [chain, mixed_profile])
+def test_sparse_and_dense_steps_reach_the_same_solution(monkeypatch, generator):
+    problem, x0, p = disturbed_component(generator, 30)
+
+    solutions = []
+    for sparse_rows in (10 ** 9, 0):
+        monkeypatch.setattr(newton, 'NEWTON_SPARSE_ROWS', sparse_rows)
+        solution = newton_minimize(problem, x0, p)
+        assert solution.success
+        assert np.max(np.abs(problem.constraints(solution.x, p))) <= NEWTON_TOLERANCE
+        solutions.append(solution.x)
+
+    assert np.allclose(solutions[0], solutions[1], atol = 1e-6)
+
+def test_redundant_constraints_do_not_stop_the_step():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    chain(geometry, constraints, 4)
+    segment = geometry.segments[1]
+    constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, segment.length()])
+    segment.p2.x += 10
+
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(SOLVER_TYPE.NEWTON)
+    solver.solve(None)
+
+    assert solver.success
+    assert solver.residual_norm <= 1e-6
+
+def test_drag_keeps_the_dragged_point_on_its_target():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    chain(geometry, constraints, 6)
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(SOLVER_TYPE.NEWTON)
+    solver.solve(None)
+
+    point = geometry.segments[-1].p2
+    for _ in range(10):
+        point.x, point.y = point.x + 4, point.y - 3
+        target = (point.x, point.y)
+        solver.solve(point)
+        assert solver.success
+        assert np.hypot(point.x - target[0], point.y - target[1]) < 1e-2
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.batched_problem import BatchedProblem
+from solver.reparameterization import Reparameterization, ReducedProblem
+from solver.solver import SOLVER_TYPE, Solver
+
+def staircase(steps):
+    # a fixed polyline of alternately perpendicular segments, the first and the third one also parallel
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    corners = [(0, 0)]
+    for i in range(steps):
+        x, y = corners[-1]
+        corners.append((x + 100, y + 5) if i % 2 == 0 else (x + 5, y + 100))
+    geometry.segments += [Segment(Point(*p1), Point(*p2)) for p1, p2 in zip(corners, corners[1:])]
+    for s1, s2 in zip(geometry.segments, geometry.segments[1:]):
+        constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+        constraints.add_constraint(CONSTRAINT_TYPE.PERPENDICULARITY, [s1, s2])
+    constraints.add_constraint(CONSTRAINT_TYPE.PARALLELITY, [geometry.segments[0], geometry.segments[2]])
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [geometry.segments[0].p1])
+    for segment in geometry.segments:
+        constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, 100])
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def reparameterized(steps = 6):
+    geometry, constraints, solver = staircase(steps)
+    solver.update_layout()
+    component, = solver.components
+    return geometry, solver, component, Reparameterization(component)
+
+def directions(component, x, p):
+    # unit vectors of the segments of the component for full values x
+    def value(source):
+        is_var, index = source
+        return x[index] if is_var else p[index]
+    vectors = {}
+    for constraint in component.constraints:
+        for segment in constraint.entities:
+            if isinstance(segment, Segment):
+                p1, p2 = ([value(source) for source in component.point_source[point]] for point in segment.points())
+                vector = np.subtract(p2, p1)
+                vectors[segment] = vector / np.linalg.norm(vector)
+    return vectors
+
+def test_parallel_and_perpendicular_constraints_hold_for_any_reduced_values():
+    geometry, solver, component, reparameterization = reparameterized()
+    # one angle for the group, a length per placed segment, all of the perpendicularities and the parallelity go
+    assert reparameterization.n_reduced == 1 + len(geometry.segments)
+    assert len(reparameterization.removed) == len(geometry.segments)
+    assert {constraint.type for constraint in reparameterization.remaining} == {CONSTRAINT_TYPE.LENGTH}
+
+    p = component.parameters(solver.z_value)
+    for y in np.random.default_rng(0).uniform(-100, 100, (10, reparameterization.n_reduced)):
+        vectors = directions(component, reparameterization.expand(y, p), p)
+        for constraint in reparameterization.removed:
+            s1, s2 = constraint.entities
+            product = np.cross(vectors[s1], vectors[s2]) if constraint.type == CONSTRAINT_TYPE.PARALLELITY else np.dot(vectors[s1], vectors[s2])
+            assert abs(product) <= 1e-12
+
+def test_expand_inverts_reduce_on_a_solved_sketch():
+    geometry, solver, component, reparameterization = reparameterized()
+    solver.solve(None)
+    assert solver.success
+
+    x, p = solver.x[component.vars], component.parameters(solver.z_value)
+    assert np.allclose(reparameterization.expand(reparameterization.reduce(x, p), p), x)
+    assert np.allclose(reparameterization.expand_traced(reparameterization.reduce(x, p), p), x)
+
+def test_reduced_jacobian_matches_finite_differences():
+    geometry, solver, component, reparameterization = reparameterized()
+    problem = ReducedProblem(reparameterization, BatchedProblem(component))
+    p = component.parameters(solver.z_value)
+    y = reparameterization.reduce(solver.x[component.vars], p)
+
+    step = 1e-6
+    columns = [(problem.constraints(y + step * e, p) - problem.constraints(y - step * e, p)) / (2 * step) for e in np.eye(len(y))]
+
+    assert np.allclose(problem.constraints_jacobian(y, p), np.array(columns).T, atol = 1e-5)
+
+@pytest.mark.parametrize('solver_type', [SOLVER_TYPE.SLSQP, SOLVER_TYPE.IPOPT])
+def test_solves_in_the_reduced_variables(solver_type):
+    geometry, constraints, solver = staircase(6)
+    solver.set_solver_type(solver_type)
+
+    solver.solve(None)
+
+    assert solver.success
+    vectors = [(segment.p2.x - segment.p1.x, segment.p2.y - segment.p1.y) for segment in geometry.segments]
+    assert np.allclose(np.linalg.norm(vectors, axis = 1), 100, atol = 1e-5)
+    assert all(abs(np.dot(v1, v2)) <= 1e-3 for v1, v2 in zip(vectors, vectors[1:]))
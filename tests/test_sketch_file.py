@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from examples.examples import mixed_profile
+from geometry import Geometry
+from sketch.sketch_file import load_sketch, save_sketch, sketch_to_dict
+from solver.solver import Solver
+
+def profile(array_backed = True):
+    geometry, constraints = Geometry(array_backed = array_backed), Constraints()
+    mixed_profile(geometry, constraints, 6)
+    # a constraint on a point, besides the ones on segments, arcs and numbers
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [geometry.segments[0].p1])
+    return geometry, constraints
+
+@pytest.mark.parametrize('extension', ['.json', '.sketch'])
+@pytest.mark.parametrize('array_backed', [True, False])
+def test_round_trip(tmp_path, extension, array_backed):
+    geometry, constraints = profile()
+    path = str(tmp_path / f'profile{extension}')
+    save_sketch(path, geometry, constraints)
+
+    loaded_geometry, loaded_constraints = Geometry(array_backed = array_backed), Constraints()
+    load_sketch(path, loaded_geometry, loaded_constraints)
+
+    assert sketch_to_dict(loaded_geometry, loaded_constraints) == sketch_to_dict(geometry, constraints)
+    # shared points stay shared, the indices are built for the loaded constraints
+    assert len({id(point) for entity in loaded_geometry.segments + loaded_geometry.arcs for point in entity.points()}) \
+        == len({id(point) for entity in geometry.segments + geometry.arcs for point in entity.points()})
+    segment = loaded_geometry.segments[0]
+    assert loaded_constraints.constraints_of(segment) == [constraint for constraint in loaded_constraints if segment in constraint.entities]
+
+def test_binary_sketch_is_the_coordinate_store(tmp_path):
+    geometry, constraints = profile()
+    path = str(tmp_path / 'profile.sketch')
+    save_sketch(path, geometry, constraints)
+    saved = open(path, 'rb').read()
+
+    loaded_geometry, loaded_constraints = Geometry(array_backed = True), Constraints()
+    load_sketch(path, loaded_geometry, loaded_constraints)
+    store = loaded_geometry.store
+
+    # the mapped coordinates are the store, every point and arc is a handle into them
+    base = store.data
+    while not isinstance(base, np.memmap):
+        base = base.base
+    assert base.filename == path
+    assert all(point.buffer is store.data for segment in loaded_geometry.segments for point in segment.points())
+    assert all(arc.buffer is store.data for arc in loaded_geometry.arcs)
+
+    # edits and solves stay in memory, the file can be overwritten while it is mapped
+    point = loaded_geometry.segments[-1].p2
+    point.x += 5
+    solver = Solver(loaded_geometry, lambda: None, loaded_constraints)
+    solver.solve(None)
+    assert solver.success
+    assert open(path, 'rb').read() == saved
+
+    save_sketch(path, loaded_geometry, loaded_constraints)
+    assert open(path, 'rb').read() != saved
+    assert np.isfinite(store.data[:store.size]).all()
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solution_cache import SolutionCache
+from solver.solver import SOLVER_TYPE, Solver
+
+def free_triangle(geometry, constraints, x, y, length):
+    corners = [(x, y), (x + 100, y), (x + 50, y + 80)]
+    segments = [Segment(Point(*corners[i]), Point(*corners[(i + 1) % 3])) for i in range(3)]
+    geometry.segments += segments
+    for s1, s2 in zip(segments, segments[1:] + segments[:1]):
+        constraints.add_constraint(CONSTRAINT_TYPE.COINCIDENCE, [s1.p2, s2.p1])
+    return [constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, length]) for segment in segments], segments
+
+def coordinates(segments):
+    return np.array([(point.x, point.y) for segment in segments for point in segment.points()])
+
+def set_length(solver, constraints, lengths, segments, length):
+    # what the GUI does when a dimension is edited
+    for i, (constraint,) in enumerate(lengths):
+        constraints.remove(constraint)
+        solver.constraint_removed(constraint)
+        lengths[i] = constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segments[i], length])
+        solver.constraints_added(lengths[i])
+
+@pytest.mark.parametrize('solver_type', list(SOLVER_TYPE))
+def test_equal_components_do_not_share_solutions(solver_type):
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    first = free_triangle(geometry, constraints, 0, 0, 100)
+    second = free_triangle(geometry, constraints, 500, 300, 100)
+
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(solver_type)
+    solver.solve(None)
+    assert solver.success
+
+    # the triangles get the same new dimensions one after the other: same structure and parameters
+    for lengths, triangle in (second, first):
+        before = coordinates(triangle)
+        set_length(solver, constraints, lengths, triangle, 120)
+
+        solver.solve(None)
+
+        assert solver.success
+        assert np.max(np.abs(coordinates(triangle) - before)) < 50
+
+def test_re_entered_dimension_takes_the_cached_solution():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    lengths, triangle = free_triangle(geometry, constraints, 0, 0, 100)
+
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.set_solver_type(SOLVER_TYPE.SLSQP)
+    solver.solve(None)
+    solved = coordinates(triangle)
+
+    # the last side gets another length, then the old one back (at the same place in the constraints)
+    constraint = lengths[-1][0]
+    constraints.remove(constraint)
+    solver.constraint_removed(constraint)
+    other = constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [triangle[-1], 120])
+    solver.constraints_added(other)
+    solver.solve(None)
+    assert solver.success
+    assert not np.allclose(coordinates(triangle), solved, atol = 1)
+
+    constraints.remove(other[0])
+    solver.constraint_removed(other[0])
+    constraints.append(constraint)
+    solver.constraints_added([constraint])
+    hits = solver.solution_cache.hits
+    solver.solve(None)
+
+    assert solver.success
+    assert solver.solution_cache.hits > hits
+    assert solver.iterations == 0
+    assert np.allclose(coordinates(triangle), solved, atol = 1e-6)
+
+def test_keys_hold_ids_and_are_dropped_with_them():
+    geometry, constraints = Geometry(array_backed = True), Constraints()
+    lengths, triangle = free_triangle(geometry, constraints, 0, 0, 100)
+    free_triangle(geometry, constraints, 500, 300, 100)
+
+    solver = Solver(geometry, lambda: None, constraints)
+    solver.solve(None)
+    assert len(solver.solution_cache) == 2
+
+    def flatten(key):
+        return [value for part in key for value in flatten(part)] if isinstance(key, tuple) else [key]
+
+    # the cache does not keep removed entities alive
+    assert not any(isinstance(value, (Point, Segment)) for key in solver.solution_cache.entries for value in flatten(key))
+
+    # removing a coincidence renumbers the ids, the solutions stored under the old ones are gone
+    constraint = constraints.constraints_of_type(CONSTRAINT_TYPE.COINCIDENCE)[0]
+    constraints.remove(constraint)
+    solver.constraint_removed(constraint)
+    solver.update_layout()
+    assert len(solver.solution_cache) == 0
+
+def test_cache_drops_the_oldest_entries_over_budget():
+    cache = SolutionCache(budget = 1000)
+    for i in range(20):
+        cache.put((('structure',), (), (float(i),), ()), np.zeros(10))
+
+    assert cache.size <= 1000
+    assert cache.get((('structure',), (), (19.0,), ())) is not None
+    assert cache.get((('structure',), (), (0.0,), ())) is None
@@ -0,0 +1,58 @@
+import numpy as np
+from gui.spatial_index import SPATIAL_INDEX_MAX_CELLS, SpatialIndex
+
+CELL_SIZE = 10
+
+def overlapping(boxes, x, y, radius):
+    return [item for item, (x1, y1, x2, y2) in boxes.items() if x1 <= x + radius and x - radius <= x2 and y1 <= y + radius and y - radius <= y2]
+
+def random_boxes(random, count):
+    corners = random.uniform(-200, 200, (count, 2))
+    sizes = random.uniform(0, 30, (count, 2))
+    return {i: (x, y, x + w, y + h) for i, ((x, y), (w, h)) in enumerate(zip(corners, sizes))}
+
+def test_query_finds_every_overlapping_box_in_insertion_order():
+    random = np.random.default_rng(0)
+    boxes = random_boxes(random, 300)
+    index = SpatialIndex(CELL_SIZE)
+    for item, bbox in boxes.items():
+        index.insert(item, bbox)
+
+    for x, y in random.uniform(-220, 220, (100, 2)):
+        candidates = index.query(x, y, 5)
+        assert set(overlapping(boxes, x, y, 5)) <= set(candidates)
+        assert candidates == sorted(candidates)
+
+def test_moved_and_removed_items_follow():
+    random = np.random.default_rng(1)
+    boxes = random_boxes(random, 100)
+    index = SpatialIndex(CELL_SIZE)
+    for item, bbox in boxes.items():
+        index.insert(item, bbox)
+
+    for item in range(0, 100, 3):
+        x, y = random.uniform(-200, 200, 2)
+        boxes[item] = (x, y, x + 5, y + 5)
+        index.insert(item, boxes[item])
+    for item in range(1, 100, 5):
+        del boxes[item]
+        index.remove(item)
+
+    assert len(index) == len(boxes)
+    for x, y in random.uniform(-220, 220, (100, 2)):
+        candidates = index.query(x, y, 5)
+        assert set(overlapping(boxes, x, y, 5)) <= set(candidates) <= set(boxes)
+        # a moved item keeps its place in the order
+        assert candidates == sorted(candidates)
+
+def test_large_items_are_always_candidates():
+    index = SpatialIndex(CELL_SIZE)
+    size = CELL_SIZE * (SPATIAL_INDEX_MAX_CELLS + 1)
+    index.insert('large', (0, 0, size, size))
+    index.insert('small', (0, 0, 1, 1))
+
+    assert index.query(-1000, -1000, 1) == ['large']
+    assert index.query(0, 0, 1) == ['large', 'small']
+
+    index.remove('large')
+    assert index.query(-1000, -1000, 1) == []
@@ -0,0 +1,46 @@
+from constraints.constraints import CONSTRAINT_TYPE, Constraints
+from geometric_primitives.point import Point
+from geometric_primitives.segment import Segment
+from geometry import Geometry
+from solver.solver import Solver
+from solver.structural_analysis import CONSTRAINEDNESS
+
+def segments(*ends):
+    geometry, constraints = Geometry(), Constraints()
+    geometry.segments += [Segment(Point(*p1), Point(*p2)) for p1, p2 in ends]
+    return geometry, constraints, Solver(geometry, lambda: None, constraints)
+
+def test_free_segment_has_four_degrees_of_freedom():
+    geometry, constraints, solver = segments(((0, 0), (100, 0)))
+    analysis = solver.analyze()
+
+    assert analysis.degrees_of_freedom == 4 and analysis.redundant_equations == 0
+    assert analysis.entity_status[geometry.segments[0]] == CONSTRAINEDNESS.UNDER
+
+def test_fixed_horizontal_segment_with_a_length_is_well_constrained():
+    geometry, constraints, solver = segments(((0, 0), (100, 5)))
+    segment, = geometry.segments
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [segment.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.HORIZONTALITY, [segment])
+    constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [segment, 80])
+
+    analysis = solver.analyze()
+
+    assert analysis.is_well_constrained()
+    assert analysis.entity_status[segment] == CONSTRAINEDNESS.WELL
+
+def test_over_constrained_part_is_separated_from_the_free_rest():
+    geometry, constraints, solver = segments(((0, 0), (100, 0)), ((0, 50), (100, 50)))
+    s1, s2 = geometry.segments
+    constraints.add_constraint(CONSTRAINT_TYPE.FIXED, [s1.p1])
+    constraints.add_constraint(CONSTRAINT_TYPE.HORIZONTALITY, [s1])
+    lengths = constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [s1, 100]) + constraints.add_constraint(CONSTRAINT_TYPE.LENGTH, [s1, 100])
+
+    analysis = solver.analyze()
+
+    assert analysis.redundant_equations == 1
+    assert analysis.over_constrained_constraints == lengths
+    assert analysis.entity_status[s1] == CONSTRAINEDNESS.OVER
+    # the second segment is untouched by it, with all of its four degrees of freedom
+    assert analysis.entity_status[s2] == CONSTRAINEDNESS.UNDER
+    assert analysis.degrees_of_freedom == 4